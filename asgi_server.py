@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import socketio
+
+import server_new as cluster
+from docker_manager import on_warm_claim
+from storage import connect_storage, init_storage, close_storage
+
+# asyncio-native server mode: one event loop holds every HTTP and WebSocket
+# connection; anything that may block (locks, MySQL, Docker) runs in a
+# bounded executor. Run with `python asgi_server.py` or `uvicorn asgi_server:app`.
+ASGI_HOST = os.environ.get("ASGI_HOST", "0.0.0.0")
+ASGI_PORT = int(os.environ.get("ASGI_PORT", 5000))
+EXECUTOR_WORKERS = int(os.environ.get("ASGI_EXECUTOR_WORKERS", 16))
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="asgi-blocking")
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+loop = None
+tasks = []
+warm_waiters = {}  # standby token -> asyncio.Event of a long-poll waiting for its claim
+
+# Same routes as the Flask server, dispatched to the shared handlers
+ROUTES = {
+    ("POST", "/api/add_node"): cluster.handle_add_node,
+    ("POST", "/api/toggle_simulation"): cluster.handle_toggle_simulation,
+    ("POST", "/api/remove_node"): cluster.handle_remove_node,
+    ("POST", "/heartbeat"): cluster.handle_heartbeat,
+    ("POST", "/api/heartbeat"): cluster.handle_heartbeat,
+    ("POST", "/api/launch_pod"): cluster.handle_launch_pod,
+    ("POST", "/api/chaos_monkey"): cluster.handle_chaos_monkey,
+    ("GET", "/api/chaos_incidents"): cluster.handle_chaos_incidents,
+    ("GET", "/api/warm_pool"): cluster.handle_warm_pool,
+    ("GET", "/api/startup_metrics"): cluster.handle_startup_metrics,
+    ("GET", "/api/logs"): cluster.handle_logs,
+    ("GET", "/api/utilization_history"): cluster.handle_utilization_history,
+}
+WARM_ASSIGNMENT_PREFIX = "/api/warm_pool/assignment/"
+
+async def run_blocking(fn, *args):
+    """Run blocking work on the executor without stalling the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+@on_warm_claim
+def wake_warm_waiter(token, node_id):
+    """Claim listener: wake the long-poll of the claimed standby container (called from any thread)."""
+    if loop is not None:
+        loop.call_soon_threadsafe(lambda: warm_waiters[token].set() if token in warm_waiters else None)
+
+async def wait_warm_assignment(token, wait):
+    """Long-poll for a warm assignment on the loop itself, without holding an executor thread."""
+    payload, status = cluster.handle_warm_assignment(token)
+    if status == 404 and wait > 0:
+        # No await between the check and registering, so a claim in between still wakes us
+        claimed = warm_waiters[token] = asyncio.Event()
+        try:
+            await asyncio.wait_for(claimed.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            warm_waiters.pop(token, None)
+        payload, status = cluster.handle_warm_assignment(token)
+    return payload, status
+
+def emit_from_any_thread(event, data, to=None, skip_sid=None):
+    """Event emitter installed into server_new; safe to call from executor threads."""
+    if loop is not None:
+        asyncio.run_coroutine_threadsafe(sio.emit(event, data, to=to, skip_sid=skip_sid), loop)
+
+# ----------------------------------
+# HTTP
+# ----------------------------------
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+async def send_response(send, status, body, content_type="application/json", headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def send_json(send, status, payload):
+    await send_response(send, status, json.dumps(payload, default=str).encode())
+
+async def stream_report(send, args):
+    """Stream a report export; each chunk is produced on the executor."""
+    try:
+        chunks, mimetype, filename = cluster.export_report(cluster.snapshot, args)
+    except ValueError as e:
+        await send_json(send, 400, {"error": str(e)})
+        return
+    except cluster.ReportSourceError as e:
+        await send_json(send, 503, {"error": str(e)})
+        return
+    except RuntimeError as e:
+        await send_json(send, 501, {"error": str(e)})
+        return
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", mimetype.encode()),
+                    (b"content-disposition", f"attachment; filename={filename}".encode())],
+    })
+    # An error from here on propagates, so the server aborts the response instead of ending it cleanly
+    while True:
+        chunk = await run_blocking(next, chunks, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+async def api_app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    method, path = scope["method"], scope["path"]
+
+    # Snapshot reads are lock-free and served straight from the event loop; only
+    # encoding and indexing a new revision (a full-cluster dumps and sort) runs
+    # on the executor, once per revision
+    if method == "GET" and path == "/api/list_nodes":
+        args = dict(parse_qsl(scope["query_string"].decode()))
+        if_none_match = dict(scope["headers"]).get(b"if-none-match", b"").decode() or None
+        snap = cluster.snapshot
+        if not snap.prepared():
+            await run_blocking(snap.prepare)
+        body, status, headers = cluster.handle_list_nodes(args, if_none_match, snap)
+        await send_response(send, status, body.encode(),
+                            headers=[(k.lower().encode(), v.encode()) for k, v in headers.items()])
+        return
+    if method == "GET" and path == "/api/download_report":
+        await stream_report(send, dict(parse_qsl(scope["query_string"].decode())))
+        return
+    if method == "GET" and path.startswith(WARM_ASSIGNMENT_PREFIX):
+        wait = cluster.warm_assignment_wait(dict(parse_qsl(scope["query_string"].decode())))
+        payload, status = await wait_warm_assignment(path[len(WARM_ASSIGNMENT_PREFIX):], wait)
+        await send_json(send, status, payload)
+        return
+
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if method == "GET" and not path.startswith("/api/"):
+            # Dashboard routes fall back to the single-page app
+            with open(os.path.join(STATIC_DIR, "index.html"), "rb") as f:
+                await send_response(send, 200, f.read(), content_type="text/html")
+        else:
+            await send_json(send, 404, {"error": "Not found"})
+        return
+
+    body = await read_body(receive)
+    if method == "POST":
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            await send_json(send, 400, {"error": "Invalid JSON"})
+            return
+    else:
+        data = dict(parse_qsl(scope["query_string"].decode()))
+    payload, status = await run_blocking(handler, data or {})
+    await send_json(send, status, payload)
+
+# ----------------------------------
+# Socket.IO
+# ----------------------------------
+async def send_state(sid, client):
+    """Send the full state to one client in its format and scope."""
+    fmt, scope = client
+    state = await run_blocking(cluster.build_initial_state)
+    payload = await run_blocking(cluster.encode_state, cluster.state_slice(state, scope), fmt)
+    await sio.emit("state_update", payload, to=sid)
+
+@sio.event
+async def connect(sid, environ):
+    args = dict(parse_qsl(environ.get("QUERY_STRING", "")))
+    client = cluster.register_state_client(sid, args)
+    await sio.enter_room(sid, cluster.state_room(*client))
+    await send_state(sid, client)
+
+@sio.event
+async def subscribe(sid, data):
+    moved = cluster.subscribe_state_client(sid, data)
+    if moved is None:
+        return {"error": "Unknown client"}
+    old_room, new_room, fmt, scope = moved
+    await sio.leave_room(sid, old_room)
+    await sio.enter_room(sid, new_room)
+    await send_state(sid, (fmt, scope))
+    return {"scope": scope}
+
+@sio.event
+async def disconnect(sid, reason=None):
+    cluster.unregister_state_client(sid)
+
+# ----------------------------------
+# Background Tasks & Startup
+# ----------------------------------
+async def periodic(tick, interval, run_first=False):
+    """asyncio counterpart of server_new.run_periodically; the tick itself runs on the executor."""
+    if run_first:
+        await run_blocking(cluster.run_tick, tick)
+    while True:
+        await asyncio.sleep(interval)
+        await run_blocking(cluster.run_tick, tick)
+
+async def startup():
+    global loop
+    loop = asyncio.get_running_loop()
+    cluster.event_emitter = emit_from_any_thread
+    cluster.client_backlog = lambda sid: cluster.transport_backlog(sio, sid)
+    if not await run_blocking(cluster.timed_phase, "storage_connect", connect_storage):
+        raise RuntimeError("Failed to connect to storage")
+    if not await run_blocking(cluster.timed_phase, "storage_init", init_storage):
+        raise RuntimeError("Failed to initialize storage tables")
+    await run_blocking(cluster.timed_phase, "state_load", cluster.load_cluster_state)
+    started = time.perf_counter()
+    # Pre-warming is the first Docker use; it runs alongside the server rather than before it
+    tasks.append(asyncio.create_task(run_blocking(cluster.start_warm_pools)))
+    for tick, interval, run_first in cluster.BACKGROUND_TASKS:
+        tasks.append(asyncio.create_task(periodic(tick, interval, run_first)))
+    cluster.startup_metrics["thread_start"] = round(time.perf_counter() - started, 4)
+    cluster.report_startup()
+
+async def shutdown():
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await run_blocking(cluster.flush_events_tick)
+    await run_blocking(cluster.snapshot_tick)
+    await run_blocking(close_storage)
+
+app = socketio.ASGIApp(
+    sio,
+    other_asgi_app=api_app,
+    static_files={"/": STATIC_DIR + "/"},
+    on_startup=startup,
+    on_shutdown=shutdown,
+)
+
+if __name__ == '__main__':
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the cluster server on an asyncio event loop")
+    parser.add_argument("--no-docker", action="store_true", help="Simulation only: never import or contact Docker")
+    if parser.parse_args().no_docker:
+        cluster.disable_docker()
+    uvicorn.run(app, host=ASGI_HOST, port=ASGI_PORT)
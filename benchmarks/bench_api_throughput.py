@@ -0,0 +1,110 @@
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Thread
+
+import requests
+
+# Compares API throughput of running servers, e.g. the single-process server
+# against the multi-worker API tier:
+#
+#   python server_new.py                       # single process on :5000
+#   python multiworker.py --port 5010          # owner on :5010, workers on :5001
+#   python benchmarks/bench_api_throughput.py \
+#       --target single=http://localhost:5000 --target multi=http://localhost:5001
+#
+# Load is generated from several processes so the client is not the bottleneck.
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run_client_process(url, endpoint, node_ids, threads, duration):
+    """Drive one endpoint from `threads` keep-alive sessions; return (ok, errors, latencies)."""
+    results = []
+
+    def worker(index):
+        session = requests.Session()
+        ok = errors = 0
+        latencies = []
+        deadline = time.perf_counter() + duration
+        i = index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if endpoint == "list_nodes":
+                    r = session.get(f"{url}/api/list_nodes")
+                else:
+                    r = session.post(f"{url}/api/heartbeat", json={"node_id": node_ids[i % len(node_ids)]})
+                    i += threads
+                if r.status_code == 200:
+                    ok += 1
+                else:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        results.append((ok, errors, latencies))
+
+    pool = [Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return (
+        sum(r[0] for r in results),
+        sum(r[1] for r in results),
+        [lat for r in results for lat in r[2]],
+    )
+
+def bench(url, endpoint, processes, threads, duration):
+    node_ids = [n["node_id"] for n in requests.get(f"{url}/api/list_nodes").json()["nodes"]]
+    if endpoint == "heartbeat" and not node_ids:
+        raise SystemExit(f"{url} has no nodes to heartbeat; add some first")
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_client_process, url, endpoint, node_ids, threads, duration)
+                   for _ in range(processes)]
+        parts = [f.result() for f in futures]
+    ok = sum(p[0] for p in parts)
+    errors = sum(p[1] for p in parts)
+    latencies = [lat for p in parts for lat in p[2]]
+    return {
+        "endpoint": endpoint,
+        "requests_per_sec": round(ok / duration, 1),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API throughput benchmark")
+    parser.add_argument("--target", action="append", required=True, help="label=base_url, repeatable")
+    parser.add_argument("--endpoint", action="append", choices=["list_nodes", "heartbeat"],
+                        help="Endpoints to drive (default: both)")
+    parser.add_argument("--processes", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent sessions per process")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per endpoint")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for target in args.target:
+        label, url = target.split("=", 1)
+        results[label] = [
+            bench(url.rstrip("/"), endpoint, args.processes, args.threads, args.duration)
+            for endpoint in (args.endpoint or ["list_nodes", "heartbeat"])
+        ]
+
+    print(f"{'target':<12} {'endpoint':<12} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for label, rows in results.items():
+        for row in rows:
+            print(f"{label:<12} {row['endpoint']:<12} {row['requests_per_sec']:>10} "
+                  f"{row['p50_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
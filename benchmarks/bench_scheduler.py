@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the real scheduler in-process against throwaway in-memory state
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["STATE_DIR"] = ""
+os.environ["DOCKER_ENABLED"] = "0"
+
+import server_new as server
+
+# Placement throughput and quality of the scheduling algorithms on synthetic
+# clusters, calling schedule_pod directly (no HTTP, no database):
+#
+#   python benchmarks/bench_scheduler.py
+#   python benchmarks/bench_scheduler.py --nodes 100000 --algorithm best_fit --output after.json
+#   python benchmarks/bench_scheduler.py --output after.json --compare before.json
+#
+# Every case gets a fresh cluster and the same seeded pod stream, so runs on
+# different commits are comparable.
+NODE_TYPES = {  # node_type -> (cpu, memory)
+    "high_cpu": (16, 16),
+    "high_mem": (8, 32),
+    "balanced": (8, 16),
+}
+GROUPS = 8
+AFFINITY_SHARE = 0.25  # pods asking for a node_type
+FLUSH_EVERY = 1000  # placements between event flushes, as the background tick would do
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def build_cluster(node_count, rng):
+    """Replace the in-memory cluster with `node_count` nodes of mixed type and group."""
+    server.nodes.clear()
+    server.shards.clear()
+    types = list(NODE_TYPES)
+    for i in range(node_count):
+        node_type = rng.choice(types)
+        cpu, memory = NODE_TYPES[node_type]
+        server.add_node_to_cluster({
+            "node_id": f"node-{i:06d}", "cpu_total": cpu, "cpu_available": cpu,
+            "memory_total": memory, "memory_available": memory, "node_type": node_type,
+            "network_group": f"group_{i % GROUPS}", "pods": [], "last_heartbeat": time.time(),
+            "status": "active", "simulate_heartbeat": True,
+        })
+
+def pod_stream(count, rng):
+    types = list(NODE_TYPES)
+    for i in range(count):
+        pod = {"pod_id": f"pod_{i + 1}", "cpu": rng.randint(1, 4), "memory": rng.choice((1, 2, 4, 8)),
+               "network_group": f"group_{rng.randrange(GROUPS)}", "cpu_usage": 0, "node_id": None}
+        if rng.random() < AFFINITY_SHARE:
+            pod["node_affinity"] = rng.choice(types)
+        yield pod
+
+def utilization():
+    cpu_total = cpu_used = memory_total = memory_used = 0
+    for n in server.nodes.values():
+        cpu_total += n["cpu_total"]
+        cpu_used += n["cpu_total"] - n["cpu_available"]
+        memory_total += n["memory_total"]
+        memory_used += n["memory_total"] - n["memory_available"]
+    return cpu_used / cpu_total, memory_used / memory_total
+
+def run_case(node_count, algo, pod_count, seed):
+    build_cluster(node_count, random.Random(seed))
+    latencies = []
+    placed = 0
+    for pod in pod_stream(pod_count, random.Random(seed + 1)):
+        start = time.perf_counter()
+        ok, _ = server.schedule_pod(pod, algo)
+        latencies.append(time.perf_counter() - start)
+        placed += ok
+        if len(latencies) % FLUSH_EVERY == 0:
+            server.flush_events_tick()
+    server.flush_events_tick()
+    seconds = sum(latencies)
+    cpu, memory = utilization()
+    return {
+        "nodes": node_count, "algorithm": algo, "pods": pod_count, "placed": placed,
+        "placements_per_s": round(placed / seconds) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "cpu_utilization": round(cpu, 4), "memory_utilization": round(memory, 4),
+        "rejection_rate": round(1 - placed / pod_count, 4) if pod_count else 0.0,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    """Print placements/s and p99 changes against an earlier --output file."""
+    with open(baseline_path) as f:
+        baseline = {(r["nodes"], r["algorithm"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}")
+    print(f"{'nodes':>7} {'algorithm':<10} {'placements/s':>13} {'p99':>9}")
+    for row in results:
+        old = baseline.get((row["nodes"], row["algorithm"]))
+        if old is None or not old["placements_per_s"] or not old["p99_ms"]:
+            continue
+        rate = (row["placements_per_s"] or 0) / old["placements_per_s"] - 1
+        p99 = row["p99_ms"] / old["p99_ms"] - 1
+        print(f"{row['nodes']:>7} {row['algorithm']:<10} {rate:>+12.1%} {p99:>+8.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scheduler placement benchmark")
+    parser.add_argument("--nodes", type=int, action="append",
+                        help="Cluster sizes (repeatable, default 100, 1000, 10000 and 100000)")
+    parser.add_argument("--algorithm", action="append", choices=server.SCHEDULING_ALGORITHMS,
+                        help="Algorithms to run (repeatable, default all)")
+    parser.add_argument("--pods-per-node", type=float, default=3.0,
+                        help="Pods in the stream per node; about 3 fills the cluster")
+    parser.add_argument("--max-pods", type=int, default=5000,
+                        help="Cap on pods per case; large clusters are then only partly filled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'nodes':>7} {'algorithm':<10} {'pods':>6} {'placements/s':>13} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'cpu':>6} {'memory':>7} {'rejected':>9}")
+    for node_count in args.nodes or [100, 1000, 10000, 100000]:
+        pod_count = min(int(node_count * args.pods_per_node), args.max_pods)
+        for algo in args.algorithm or server.SCHEDULING_ALGORITHMS:
+            row = run_case(node_count, algo, pod_count, args.seed)
+            results.append(row)
+            print(f"{row['nodes']:>7} {algo:<10} {row['pods']:>6} {row['placements_per_s'] or '-':>13} "
+                  f"{row['p50_ms']:>8} {row['p99_ms']:>8} {row['cpu_utilization']:>6.1%} "
+                  f"{row['memory_utilization']:>7.1%} {row['rejection_rate']:>9.1%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "python": platform.python_version(), "seed": args.seed,
+                       "created": time.time(), "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state_codec
+
+# Compares the size and encode time of the state_update payload formats:
+#
+#   python benchmarks/bench_state_encoding.py --nodes 1000 --pods 8
+#
+# "json" is what a legacy client receives (the dict serialized by Socket.IO);
+# the binary rows are the frames produced by state_codec.encode_frame.
+
+def synthetic_state(node_count, pods_per_node, seed=0):
+    rng = random.Random(seed)
+    now = time.time()
+    nodes, pod_id = [], 0
+    for i in range(node_count):
+        pods = []
+        for _ in range(rng.randint(0, pods_per_node * 2)):
+            pod_id += 1
+            pod = {"pod_id": f"pod_{pod_id}", "cpu": rng.randint(1, 4), "memory": rng.randint(1, 8),
+                   "network_group": f"group_{i % 8}", "cpu_usage": 0}
+            if rng.random() < 0.3:
+                pod["node_affinity"] = rng.choice(["high_cpu", "high_mem", "balanced"])
+            pods.append(pod)
+        nodes.append({
+            "node_id": f"{i:08x}-0000-4000-8000-{rng.getrandbits(48):012x}",
+            "cpu_total": 8, "cpu_available": rng.randint(0, 8),
+            "memory_total": 16, "memory_available": rng.randint(0, 16),
+            "node_type": rng.choice(["high_cpu", "high_mem", "balanced"]),
+            "network_group": f"group_{i % 8}",
+            "last_heartbeat": now - rng.random() * 10,
+            "status": "active" if rng.random() < 0.95 else "failed",
+            "simulate_heartbeat": True, "pods": pods,
+            "container_id": None, "container_state": None,
+        })
+    logs = [f"[2024-01-01 00:00:{i:02d}] Pod pod_{i} scheduled on node {nodes[0]['node_id']}" for i in range(50)]
+    history = [{"timestamp": now - i * 10, "utilization": rng.random() * 100} for i in range(50)]
+    return {"nodes": nodes, "logs": logs, "history": history}
+
+def measure(encode, repeat):
+    times, data = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = encode()
+        times.append(time.perf_counter() - start)
+    return len(data), statistics.median(times)
+
+def run(state, repeat):
+    compact = lambda doc: json.dumps(doc, separators=(",", ":")).encode()
+    candidates = {
+        "json": lambda: json.dumps(state).encode(),
+        "json+deflate": lambda: zlib.compress(json.dumps(state).encode(), state_codec.COMPRESS_LEVEL),
+        "columnar-json": lambda: compact(state_codec.encode_columnar(state)),
+        "columnar-json+deflate": lambda: zlib.compress(compact(state_codec.encode_columnar(state)),
+                                                       state_codec.COMPRESS_LEVEL),
+        "binary": lambda: state_codec.encode_frame(state, compress=False),
+        "binary+deflate": lambda: state_codec.encode_frame(state, compress=True),
+    }
+    baseline = None
+    rows = []
+    for name, encode in candidates.items():
+        size, seconds = measure(encode, repeat)
+        baseline = baseline or size
+        rows.append({"format": name, "bytes": size, "ratio": round(size / baseline, 3),
+                     "encode_ms": round(seconds * 1000, 3)})
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="state_update encoding benchmark")
+    parser.add_argument("--nodes", type=int, action="append", help="Node counts to test (repeatable, default 100 and 1000)")
+    parser.add_argument("--pods", type=int, default=4, help="Average pods per node")
+    parser.add_argument("--repeat", type=int, default=20, help="Encodes per format; the median is reported")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"msgpack: {'available' if state_codec.msgpack else 'NOT installed (binary frames use JSON bodies)'}")
+    results = {}
+    for count in args.nodes or [100, 1000]:
+        results[count] = run(synthetic_state(count, args.pods), args.repeat)
+        print(f"\n{count} nodes")
+        print(f"{'format':<24} {'bytes':>10} {'ratio':>7} {'encode ms':>10}")
+        for row in results[count]:
+            print(f"{row['format']:<24} {row['bytes']:>10} {row['ratio']:>7} {row['encode_ms']:>10}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
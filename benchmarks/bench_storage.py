@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import BACKENDS
+
+# Write and read throughput of the storage backends under the simulator's
+# access pattern (one save per node mutation, batched event writes):
+#
+#   python benchmarks/bench_storage.py --ops 5000
+#   python benchmarks/bench_storage.py --backend mysql --backend sqlite   # MySQL must be a scratch database
+
+def make_node(i, cpu_available=8):
+    return {"node_id": f"node-{i:06d}", "cpu_total": 8, "cpu_available": cpu_available,
+            "memory_total": 16, "memory_available": 16, "node_type": "balanced",
+            "network_group": f"group_{i % 8}", "last_heartbeat": time.time(), "status": "active",
+            "simulate_heartbeat": True, "container_id": None}
+
+def make_event(i):
+    return {"timestamp": time.time(), "type": "pod_scheduled", "severity": "info",
+            "node_id": f"node-{i % 100:06d}", "pod_id": f"pod_{i}", "event": f"Pod pod_{i} scheduled"}
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {"operation": label, "ops": count, "seconds": round(seconds, 4),
+            "ops_per_s": round(count / seconds) if seconds else None}
+
+def run(store, node_count, ops):
+    results = [
+        timed("save_nodes (batch)", node_count, lambda: store.save_nodes([make_node(i) for i in range(node_count)])),
+        timed("save_node", ops, lambda: [store.save_node(make_node(i % node_count, i % 8)) for i in range(ops)]),
+        timed("save_pod", ops, lambda: [store.save_pod({"pod_id": f"pod_{i}", "node_id": make_node(i % node_count)["node_id"],
+                                                        "cpu": 1, "memory": 1, "network_group": "group_0"})
+                                        for i in range(ops)]),
+        timed("save_events (100/batch)", ops, lambda: [store.save_events([make_event(i + j) for j in range(100)])
+                                                       for i in range(0, ops, 100)]),
+        timed("record_utilization", ops, lambda: [store.record_utilization(50.0) for _ in range(ops)]),
+        timed("flush", 1, store.flush),
+        timed("get_nodes", 20, lambda: [store.get_nodes() for _ in range(20)]),
+        timed("get_logs", 200, lambda: [store.get_logs({"node_id": "node-000001"}) for _ in range(200)]),
+    ]
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Storage backend throughput benchmark")
+    parser.add_argument("--backend", action="append", choices=list(BACKENDS),
+                        help="Backends to test (repeatable, default memory and sqlite)")
+    parser.add_argument("--nodes", type=int, default=1000, help="Nodes in the simulated cluster")
+    parser.add_argument("--ops", type=int, default=2000, help="Operations per write benchmark")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.backend or ["memory", "sqlite"]:
+            store = BACKENDS[name](os.path.join(tmp, "bench.db")) if name == "sqlite" else BACKENDS[name]()
+            if not (store.connect() and store.init_tables()):
+                print(f"Skipping {name}: backend unavailable")
+                continue
+            results[name] = run(store, args.nodes, args.ops)
+            store.close()
+            print(f"\n{name}")
+            print(f"{'operation':<26} {'ops':>7} {'seconds':>9} {'ops/s':>10}")
+            for row in results[name]:
+                print(f"{row['operation']:<26} {row['ops']:>7} {row['seconds']:>9} {row['ops_per_s'] or '-':>10}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
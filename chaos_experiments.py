@@ -0,0 +1,233 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Experiments run the real scheduler against throwaway in-memory state
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["STATE_DIR"] = ""
+os.environ["DOCKER_ENABLED"] = "0"
+
+import server_new as server
+
+# Monte Carlo chaos experiments: thousands of randomized failure scenarios,
+# each run in simulated time against an in-process cluster using the
+# server's own schedule_pod and reschedule_failed_nodes, fanned out over a
+# process pool:
+#
+#   python chaos_experiments.py --trials 2000 --failure-rate 0.01:0.2 --recovery-delay 30:600
+#
+# In a trial, each node fails as a Poisson process at the node failure rate
+# and each network_group fails as a whole at the group failure rate. All the
+# nodes of a failure go down together and their pods are rescheduled in one
+# bulk pass; pods that do not fit anywhere are lost, as in the live server.
+# Failed nodes rejoin empty after the recovery delay, with a fresh failure
+# timer (each node has at most one pending).
+#
+# Trial i draws everything from seed + i, so results (apart from the measured
+# reschedule latencies) do not depend on the number of workers.
+NODE_TYPES = {  # node_type -> (cpu, memory)
+    "high_cpu": (16, 16),
+    "high_mem": (8, 32),
+    "balanced": (8, 16),
+}
+HOUR = 3600.0
+
+def parse_range(text):
+    """(low, high) from "low:high", or (x, x) from a single number."""
+    low, _, high = text.partition(":")
+    low = float(low)
+    high = float(high) if high else low
+    if high < low:
+        raise argparse.ArgumentTypeError(f"{text!r}: the upper bound is below the lower one")
+    return low, high
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def draw(rng, bounds):
+    return rng.uniform(*bounds)
+
+def make_node(nid, node_type, group):
+    cpu, memory = NODE_TYPES[node_type]
+    return {"node_id": nid, "cpu_total": cpu, "cpu_available": cpu, "memory_total": memory,
+            "memory_available": memory, "node_type": node_type, "network_group": group, "pods": [],
+            "last_heartbeat": time.time(), "status": "active", "simulate_heartbeat": True}
+
+def build_cluster(config, rng):
+    """Replace the in-memory cluster and fill it with pods up to config["fill"] of its CPU.
+
+    Returns ({node_id: (node_type, group)}, {pod_id: cpu}).
+    """
+    server.nodes.clear()
+    server.shards.clear()
+    layout = {}
+    for i in range(config["nodes"]):
+        nid = f"node-{i:05d}"
+        layout[nid] = (rng.choice(list(NODE_TYPES)), f"group_{i % config['groups']}")
+        server.add_node_to_cluster(make_node(nid, *layout[nid]))
+    capacity = sum(NODE_TYPES[t][0] for t, _ in layout.values())
+    pods, used, misses = {}, 0, 0
+    while used < capacity * config["fill"] and misses < 50:
+        pod = {"pod_id": f"pod_{len(pods) + misses + 1}", "cpu": rng.randint(1, 4), "memory": rng.choice((1, 2, 4)),
+               "network_group": f"group_{rng.randrange(config['groups'])}", "cpu_usage": 0, "node_id": None}
+        ok, _ = server.schedule_pod(pod, config["algorithm"])
+        if ok:
+            pods[pod["pod_id"]] = pod["cpu"]
+            used += pod["cpu"]
+        else:
+            misses += 1
+    return layout, pods
+
+def drain_events():
+    with server.event_log_lock:
+        batch = list(server.pending_events)
+        server.pending_events.clear()
+    return batch
+
+def fail_nodes(nids):
+    """Fail nodes together through the server's own bulk path. Returns (seconds, rescheduled, unschedulable pod ids)."""
+    for nid in nids:
+        with server.locked_node(nid) as node:
+            node["status"] = "failed"
+    drain_events()
+    start = time.perf_counter()
+    server.reschedule_failed_nodes(nids)
+    seconds = time.perf_counter() - start
+    events = drain_events()
+    rescheduled = sum(e["type"] == "pod_rescheduled" for e in events)
+    return seconds, rescheduled, [e["pod_id"] for e in events if e["type"] == "pod_unschedulable"]
+
+def run_trial(index, config):
+    rng = random.Random(config["seed"] + index)
+    params = {
+        "failure_rate": draw(rng, config["failure_rate"]),
+        "group_failure_rate": draw(rng, config["group_failure_rate"]),
+        "recovery_delay": draw(rng, config["recovery_delay"]),
+    }
+    layout, pods = build_cluster(config, rng)
+    capacity = sum(NODE_TYPES[t][0] for t, _ in layout.values())
+    groups = sorted({g for _, g in layout.values()})
+
+    # (simulated time, kind, target, timer version); node failures are drawn again
+    # after each recovery. A node's timer is versioned, so the one left pending
+    # when a group failure takes it down is skipped instead of firing as well.
+    queue = []
+    timers = dict.fromkeys(layout, 0)  # node_id -> version of its live failure timer
+    def schedule_failure(kind, target, now, rate):
+        if kind == "node":
+            timers[target] += 1
+        if rate > 0:
+            heapq.heappush(queue, (now + rng.expovariate(rate / HOUR), kind, target, timers.get(target, 0)))
+    for nid in layout:
+        schedule_failure("node", nid, 0.0, params["failure_rate"])
+    for group in groups:
+        schedule_failure("group", group, 0.0, params["group_failure_rate"])
+
+    latencies, lost = [], []
+    failures = rescheduled = down = peak_down = 0
+    while queue and queue[0][0] < config["horizon"]:
+        now, kind, target, version = heapq.heappop(queue)
+        if kind == "node" and version != timers[target]:
+            continue  # superseded by the timer drawn when the node recovered
+        if kind == "recover":
+            server.add_node_to_cluster(make_node(target, *layout[target]))
+            down -= 1
+            schedule_failure("node", target, now, params["failure_rate"])
+            continue
+        if kind == "group":
+            victims = sorted(nid for nid, n in server.nodes.items() if n["network_group"] == target)
+            schedule_failure("group", target, now, params["group_failure_rate"])
+        else:
+            victims = [target] if target in server.nodes else []
+        if victims:
+            seconds, moved, unschedulable = fail_nodes(victims)
+            latencies.append(seconds)
+            rescheduled += moved
+            lost += unschedulable
+            failures += len(victims)
+            down += len(victims)
+        for nid in victims:
+            timers[nid] += 1  # its pending failure timer dies with it
+            heapq.heappush(queue, (now + params["recovery_delay"], "recover", nid, 0))
+        peak_down = max(peak_down, down)
+
+    lost_cpu = sum(pods[pid] for pid in lost)
+    return {
+        "trial": index, **{k: round(v, 4) for k, v in params.items()},
+        "pods": len(pods), "failures": failures, "peak_nodes_down": peak_down,
+        "rescheduled": rescheduled, "pods_lost": len(lost),
+        "lost_fraction": round(len(lost) / len(pods), 4) if pods else 0.0,
+        # spare CPU, as a share of the cluster, that would have kept every displaced pod running
+        "headroom_needed": round(lost_cpu / capacity, 4),
+        "reschedule_ms": [round(s * 1000, 3) for s in latencies],
+    }
+
+def run_trials(indices, config):
+    return [run_trial(i, config) for i in indices]
+
+def summarize(trials):
+    """p50/p90/p99/max/mean of each per-trial metric, plus the latency of each bulk reschedule."""
+    summary = {}
+    for metric in ("failures", "peak_nodes_down", "pods_lost", "lost_fraction", "headroom_needed"):
+        values = [t[metric] for t in trials]
+        summary[metric] = {"p50": percentile(values, 50), "p90": percentile(values, 90),
+                           "p99": percentile(values, 99), "max": max(values, default=0),
+                           "mean": round(statistics.fmean(values), 4) if values else 0.0}
+    latencies = [ms for t in trials for ms in t["reschedule_ms"]]
+    summary["reschedule_ms"] = {"p50": percentile(latencies, 50), "p90": percentile(latencies, 90),
+                                "p99": percentile(latencies, 99), "max": max(latencies, default=0),
+                                "mean": round(statistics.fmean(latencies), 4) if latencies else 0.0}
+    summary["trials_with_loss"] = round(sum(t["pods_lost"] > 0 for t in trials) / len(trials), 4) if trials else 0.0
+    return summary
+
+def run_experiments(config, trials, workers=None, chunk=25):
+    """Run `trials` seeded trials over a process pool; returns the per-trial results in trial order."""
+    chunks = [range(start, min(start + chunk, trials)) for start in range(0, trials, chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(run_trials, chunks, [config] * len(chunks))
+        return [trial for part in results for trial in part]
+
+def print_summary(summary, trials, seconds):
+    print(f"{trials} trials in {seconds:.1f}s; {summary['trials_with_loss']:.1%} lost at least one pod")
+    print(f"{'metric':<18} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'mean':>9}")
+    for metric, stats in summary.items():
+        if isinstance(stats, dict):
+            print(f"{metric:<18} " + " ".join(f"{stats[k]:>9}" for k in ("p50", "p90", "p99", "max", "mean")))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo chaos experiments against the in-process scheduler")
+    parser.add_argument("--trials", type=int, default=1000)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--nodes", type=int, default=200, help="Nodes per simulated cluster")
+    parser.add_argument("--groups", type=int, default=4, help="Network groups the nodes are spread over")
+    parser.add_argument("--fill", type=float, default=0.7, help="Share of cluster CPU taken by pods before failures")
+    parser.add_argument("--algorithm", choices=server.SCHEDULING_ALGORITHMS, default="first_fit",
+                        help="Algorithm that places the initial pods")
+    parser.add_argument("--horizon", type=float, default=HOUR, help="Simulated seconds per trial")
+    parser.add_argument("--failure-rate", type=parse_range, default=(0.01, 0.2),
+                        help="Failures per node per hour, low:high sampled per trial")
+    parser.add_argument("--group-failure-rate", type=parse_range, default=(0.0, 0.5),
+                        help="Whole-group failures per group per hour, low:high")
+    parser.add_argument("--recovery-delay", type=parse_range, default=(30.0, 600.0),
+                        help="Seconds until a failed node rejoins, low:high")
+    parser.add_argument("--output", help="Write the summary and every trial as JSON to this file")
+    args = parser.parse_args()
+
+    config = {k: getattr(args, k) for k in ("seed", "nodes", "groups", "fill", "algorithm", "horizon",
+                                            "failure_rate", "group_failure_rate", "recovery_delay")}
+    start = time.perf_counter()
+    results = run_experiments(config, args.trials, args.workers)
+    summary = summarize(results)
+    print_summary(summary, args.trials, time.perf_counter() - start)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": config, "summary": summary, "trials": results}, f, indent=2)
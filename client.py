@@ -1,8 +1,11 @@
 import argparse
+import json
 import requests
 import sys
 import webbrowser
 
+from loadtest import DEFAULT_MIX, parse_mix, print_report, run_loadtest
+
 def add_node(server_url, cpu, memory, node_type, network_group):
     url = f"{server_url}/api/add_node"
     payload = {
@@ -39,29 +42,43 @@ def launch_pod(server_url, cpu_required, memory_required, scheduling_algorithm,
     else:
         print("Error launching pod:", response.json())
 
-def list_nodes(server_url):
+def list_nodes(server_url, filters=None, include_pods=True, page_size=500):
+    """Print nodes matching `filters`, fetching them page by page."""
     url = f"{server_url}/api/list_nodes"
-    response = requests.get(url)
-    if response.status_code == 200:
+    params = {k: v for k, v in (filters or {}).items() if v is not None}
+    params.update(limit=page_size, include_pods=str(include_pods).lower())
+    session = requests.Session()
+    while True:
+        response = session.get(url, params=params)
+        if response.status_code != 200:
+            print("Error listing nodes:", response.json())
+            return
         data = response.json()
         for node in data["nodes"]:
             print(f"Node ID: {node['node_id']}")
             print(f"   CPU Total: {node['cpu_total']}, CPU Available: {node['cpu_available']}")
             print(f"   Memory Total: {node['memory_total']}GB, Memory Available: {node['memory_available']}GB")
             print(f"   Status: {node['status']}")
-            print("   Pods:")
-            for pod in node["pods"]:
-                print(f"      {pod['pod_id']} | CPU Req: {pod['cpu']} | Mem Req: {pod['memory']} | Group: {pod.get('network_group','default')}")
+            if include_pods:
+                print("   Pods:")
+                for pod in node["pods"]:
+                    print(f"      {pod['pod_id']} | CPU Req: {pod['cpu']} | Mem Req: {pod['memory']} | Group: {pod.get('network_group','default')}")
             print("")
-    else:
-        print("Error listing nodes:", response.json())
+        if not data.get("next_cursor"):
+            return
+        params["cursor"] = data["next_cursor"]
 
-def chaos_monkey(server_url):
+def chaos_monkey(server_url, options=None):
     url = f"{server_url}/api/chaos_monkey"
-    response = requests.post(url)
+    payload = {k: v for k, v in (options or {}).items() if v is not None}
+    response = requests.post(url, json=payload)
     if response.status_code == 200:
         data = response.json()
         print(data["message"])
+        incident = data.get("incident")
+        if incident and incident["recovery_seconds"] is not None:
+            print(f"   {incident['rescheduled']} pods rescheduled, {incident['unschedulable']} unschedulable, "
+                  f"{incident['replacements']} replacement nodes; recovered in {incident['recovery_seconds']}s")
     else:
         print("Error triggering Chaos Monkey:", response.json())
 
@@ -88,9 +105,35 @@ if __name__ == "__main__":
     parser_pod.add_argument("--network_group", type=str, default="default", help="Network group")
     parser_pod.add_argument("--node_affinity", type=str, choices=["", "balanced", "high_cpu", "high_mem"], default="", help="Node affinity")
 
-    subparsers.add_parser("list_nodes", help="List all nodes in the cluster")
-    subparsers.add_parser("chaos_monkey", help="Trigger a Chaos Monkey event")
+    parser_list = subparsers.add_parser("list_nodes", help="List nodes in the cluster")
+    parser_list.add_argument("--status", type=str, choices=["active", "suspect", "failed"], help="Only nodes with this status")
+    parser_list.add_argument("--network_group", type=str, help="Only nodes in this network group")
+    parser_list.add_argument("--node_type", type=str, choices=["balanced", "high_cpu", "high_mem"], help="Only nodes of this type")
+    parser_list.add_argument("--min_cpu", type=float, help="Minimum available CPU cores")
+    parser_list.add_argument("--min_memory", type=float, help="Minimum available memory in GB")
+    parser_list.add_argument("--no_pods", action="store_true", help="Do not fetch or print pods")
+    parser_list.add_argument("--page_size", type=int, default=500, help="Nodes per request (default: 500)")
+    parser_chaos = subparsers.add_parser("chaos_monkey", help="Trigger a Chaos Monkey event")
+    parser_chaos.add_argument("--mode", choices=["node", "percent", "group", "partition"], default="node",
+                              help="Kill one node, a share of nodes, a whole network group, or partition a group")
+    parser_chaos.add_argument("--node_id", type=str, help="Node to kill in node mode (default: a random one)")
+    parser_chaos.add_argument("--percent", type=float, help="Share of active nodes to kill in percent mode")
+    parser_chaos.add_argument("--node_type", type=str, choices=["balanced", "high_cpu", "high_mem"],
+                              help="Only kill nodes of this type in percent mode")
+    parser_chaos.add_argument("--network_group", type=str, help="Group to kill or partition (or to kill a share of)")
+    parser_chaos.add_argument("--duration", type=float, help="Seconds a partition drops heartbeats")
     subparsers.add_parser("dashboard", help="Open the web dashboard in a browser")
+    parser_load = subparsers.add_parser("loadtest", help="Drive a mix of API calls and report throughput and latency")
+    parser_load.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                             help="Endpoint weights (default: heartbeat=60,list_nodes=20,launch_pod=10,add_node=1)")
+    parser_load.add_argument("--allow_destructive", action="store_true",
+                             help="Allow endpoints that kill nodes (chaos_monkey) in the mix")
+    parser_load.add_argument("--rate", type=float, help="Target requests per second (default: as fast as possible)")
+    parser_load.add_argument("--concurrency", type=int, default=32, help="Concurrent workers, one connection each (default: 32)")
+    parser_load.add_argument("--duration", type=float, default=10, help="Seconds to run (default: 10)")
+    parser_load.add_argument("--timeout", type=float, default=10, help="Per-request timeout in seconds (default: 10)")
+    parser_load.add_argument("--seed", type=int, help="Seed for the request mix")
+    parser_load.add_argument("--output", help="Write the report as JSON to this file")
 
     args = parser.parse_args()
     if args.command == "add_node":
@@ -98,10 +141,28 @@ if __name__ == "__main__":
     elif args.command == "launch_pod":
         launch_pod(args.server, args.cpu_required, args.memory_required, args.scheduling_algorithm, args.network_group, args.node_affinity)
     elif args.command == "list_nodes":
-        list_nodes(args.server)
+        filters = {
+            "status": args.status, "network_group": args.network_group, "node_type": args.node_type,
+            "min_cpu": args.min_cpu, "min_memory": args.min_memory
+        }
+        list_nodes(args.server, filters, include_pods=not args.no_pods, page_size=args.page_size)
     elif args.command == "chaos_monkey":
-        chaos_monkey(args.server)
+        chaos_monkey(args.server, {
+            "mode": args.mode, "node_id": args.node_id, "percent": args.percent, "node_type": args.node_type,
+            "network_group": args.network_group, "duration": args.duration
+        })
     elif args.command == "dashboard":
         open_dashboard(args.server)
+    elif args.command == "loadtest":
+        try:
+            report = run_loadtest(args.server, args.mix, args.rate, args.concurrency, args.duration, args.timeout, args.seed,
+                                  args.allow_destructive)
+        except (ValueError, RuntimeError, OSError) as e:
+            print("Error running load test:", e)
+            sys.exit(1)
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
     else:
         parser.print_help()
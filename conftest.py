@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+# Tests that import server_new run it against the memory backend, with no
+# Docker and no state journal, before any module reads these settings.
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["STATE_DIR"] = ""
+os.environ["DOCKER_ENABLED"] = "0"
+
+@pytest.fixture
+def cluster():
+    """server_new with no nodes, partitions or chaos incidents."""
+    import server_new
+    with server_new.topology_lock:
+        server_new.nodes.clear()
+        server_new.shards.clear()
+    with server_new.chaos_lock:
+        server_new.active_partitions.clear()
+        server_new.chaos_incidents.clear()
+    server_new.publish_snapshot()
+    return server_new
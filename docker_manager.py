@@ -0,0 +1,304 @@
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Lock
+
+# Docker configuration
+DOCKER_NODE_IMAGE = "node-simulator:latest"
+NODE_SERVER_URL = os.environ.get("NODE_SERVER_URL", "http://host.docker.internal:5000")
+CONTAINER_WORKERS = int(os.environ.get("CONTAINER_WORKERS", 4))
+CONTAINER_STOP_TIMEOUT = int(os.environ.get("CONTAINER_STOP_TIMEOUT", 10))
+WARM_POOL_SIZE = int(os.environ.get("WARM_POOL_SIZE", 2))  # idle containers per network group
+DOCKER_ENABLED = os.environ.get("DOCKER_ENABLED", "1") not in ("0", "false", "no")
+DOCKER_INIT_TIMEOUT = float(os.environ.get("DOCKER_INIT_TIMEOUT", 5))  # seconds
+
+# The Docker SDK is imported and the daemon contacted on first use, not at
+# import, so simulation-only runs (DOCKER_ENABLED=0 or --no-docker) never load
+# it and a missing daemon costs at most DOCKER_INIT_TIMEOUT, once.
+docker_client = None
+docker_status = {"state": "uninitialized", "init_seconds": None, "error": None}
+docker_init_lock = Lock()
+
+def disable_docker():
+    """Simulation only: never import or contact Docker."""
+    global DOCKER_ENABLED
+    DOCKER_ENABLED = False
+
+def get_docker_client():
+    """The Docker client, connecting on first call; None when Docker is disabled or unreachable."""
+    global docker_client
+    if docker_status["state"] != "uninitialized":
+        return docker_client
+    with docker_init_lock:
+        if docker_status["state"] != "uninitialized":
+            return docker_client
+        if not DOCKER_ENABLED:
+            docker_status["state"] = "disabled"
+            print("🔍 Docker disabled—simulation only")
+            return None
+        started = time.perf_counter()
+        try:
+            import docker
+            # The short timeout is only for this probe; the long-lived client keeps the
+            # SDK default so image pulls and container starts are not cut off
+            probe = docker.from_env(timeout=DOCKER_INIT_TIMEOUT)
+            try:
+                probe.ping()
+            finally:
+                probe.close()
+            docker_client = docker.from_env()
+            docker_status["state"] = "ready"
+        except Exception as e:  # ImportError, DockerException, or a timeout reaching the daemon
+            docker_status.update(state="unavailable", error=str(e))
+            print("⚠️ Docker not available—containers will NOT be launched.")
+        docker_status["init_seconds"] = round(time.perf_counter() - started, 4)
+        print("🔍 Docker client:", "OK" if docker_client else "NOT AVAILABLE")
+        return docker_client
+
+# Container lifecycle worker pool. Every Docker API call goes through here so
+# HTTP handlers and monitor threads never block on the daemon.
+lifecycle_pool = ThreadPoolExecutor(max_workers=CONTAINER_WORKERS, thread_name_prefix="container")
+event_listeners = []
+
+# Network handles are looked up once per group and reused
+network_cache = {}
+network_lock = Lock()
+
+# Warm pool: idle node containers per network group, waiting for a node_id
+warm_pool = {}  # network_group -> deque of {"container_id", "token"}
+warm_pending = {}  # network_group -> launches in flight
+# Claims stay until the node's first heartbeat proves its container got the node_id,
+# so a long-poll whose response is lost can simply ask again
+warm_assignments = {}  # standby token -> node_id
+warm_assigned_nodes = {}  # node_id -> standby token, the reverse of warm_assignments
+warm_spec = {"cpu": None, "memory": None, "heartbeat_interval": None}
+warm_lock = Lock()
+warm_claimed = Condition(warm_lock)  # notified whenever a warm container is claimed
+warm_claim_listeners = []
+
+def on_warm_claim(listener):
+    """Register a callback invoked with (token, node_id) whenever a warm container is claimed."""
+    warm_claim_listeners.append(listener)
+    return listener
+
+def ensure_network(group):
+    """Create or fetch a Docker bridge network named net_<group>."""
+    client = get_docker_client()
+    if not client:
+        return None
+    from docker.errors import NotFound
+
+    with network_lock:
+        net = network_cache.get(group)
+    if net is not None:
+        return net
+    net_name = f"net_{group}"
+    try:
+        net = client.networks.get(net_name)
+    except NotFound:
+        net = client.networks.create(net_name, driver="bridge")
+    with network_lock:
+        return network_cache.setdefault(group, net)
+
+def on_container_event(listener):
+    """Register a callback invoked with every container lifecycle event."""
+    event_listeners.append(listener)
+    return listener
+
+def emit_container_event(event):
+    """Deliver a lifecycle event to all registered listeners."""
+    for listener in event_listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"Error in container event listener: {e}")
+
+def _run_container(node_id, cpu, memory, network_group, heartbeat_interval, autoscaled):
+    event = {"action": "run", "node_id": node_id, "container_id": None}
+    try:
+        net = ensure_network(network_group)
+        labels = {"sim-node": node_id}
+        if autoscaled:
+            labels["autoscaled"] = "true"
+        container = get_docker_client().containers.run(
+            DOCKER_NODE_IMAGE,
+            command=[
+                "--server", NODE_SERVER_URL,
+                "--node_id", node_id,
+                "--interval", str(heartbeat_interval)
+            ],
+            # Unique per launch: a relaunch must not clash with the exited container it replaces
+            name=f"node_{node_id}_{uuid.uuid4().hex[:8]}",
+            detach=True,
+            network=net.name if net else None,
+            cpu_count=cpu,
+            mem_limit=f"{memory}g",
+            labels=labels,
+            auto_remove=False
+        )
+        event.update(status="ok", container_id=container.id)
+    except Exception as e:
+        event.update(status="error", error=str(e))
+    emit_container_event(event)
+    return event
+
+def _stop_container(container_id, node_id, remove):
+    from docker.errors import NotFound
+
+    event = {"action": "remove" if remove else "stop", "node_id": node_id, "container_id": container_id}
+    try:
+        container = get_docker_client().containers.get(container_id)
+        container.stop(timeout=CONTAINER_STOP_TIMEOUT)
+        if remove:
+            container.remove()
+        event["status"] = "ok"
+    except NotFound:
+        event["status"] = "ok"
+    except Exception as e:
+        # Anything else (timeouts, connection resets) must still reach the server as an event
+        event.update(status="error", error=str(e))
+    emit_container_event(event)
+    return event
+
+def run_node_container_async(node, heartbeat_interval, autoscaled=False):
+    """Queue a container launch for a node. Returns a Future, or None without Docker."""
+    if not get_docker_client():
+        return None
+    return lifecycle_pool.submit(
+        _run_container, node["node_id"], node["cpu_total"], node["memory_total"],
+        node["network_group"], heartbeat_interval, autoscaled
+    )
+
+def list_sim_containers():
+    """List every simulator container (running or not) in one API call, or None on error."""
+    client = get_docker_client()
+    if not client:
+        return None
+    from docker.errors import APIError, DockerException
+
+    try:
+        # sparse=True avoids one inspect call per container
+        containers = client.containers.list(all=True, sparse=True, filters={"label": "sim-node"})
+    except (APIError, DockerException) as e:
+        print(f"❌ Error listing containers: {e}")
+        return None
+    result = []
+    for c in containers:
+        labels = c.attrs.get("Labels") or {}
+        result.append({
+            "id": c.id,
+            "node_id": labels.get("sim-node") or None,
+            "pool": labels.get("sim-pool"),
+            "running": c.attrs.get("State") == "running"
+        })
+    return result
+
+def stop_container_async(container_id, node_id=None, remove=True):
+    """Queue a stop (and by default removal) of a container. Returns a Future, or None."""
+    if not container_id or not get_docker_client():
+        return None
+    return lifecycle_pool.submit(_stop_container, container_id, node_id, remove)
+
+# ----------------------------------
+# Warm Container Pool
+# ----------------------------------
+def _start_warm_container(group):
+    token = uuid.uuid4().hex
+    try:
+        net = ensure_network(group)
+        container = get_docker_client().containers.run(
+            DOCKER_NODE_IMAGE,
+            command=[
+                "--server", NODE_SERVER_URL,
+                "--standby_token", token,
+                "--interval", str(warm_spec["heartbeat_interval"])
+            ],
+            name=f"warm_{group}_{token[:12]}",
+            detach=True,
+            network=net.name if net else None,
+            cpu_count=warm_spec["cpu"],
+            mem_limit=f"{warm_spec['memory']}g",
+            labels={"sim-node": "", "sim-pool": group},
+            auto_remove=False
+        )
+        with warm_lock:
+            warm_pool.setdefault(group, deque()).append({"container_id": container.id, "token": token})
+        print(f"🔥 Warm container {container.id[:12]} ready for group '{group}'")
+    except Exception as e:
+        print(f"❌ Warm container launch error for group '{group}': {e}")
+    finally:
+        with warm_lock:
+            warm_pending[group] -= 1
+
+def fill_warm_pool(group):
+    """Queue launches until the group's pool (ready + pending) reaches WARM_POOL_SIZE."""
+    if not WARM_POOL_SIZE or warm_spec["cpu"] is None or not get_docker_client():
+        return 0
+    with warm_lock:
+        missing = WARM_POOL_SIZE - len(warm_pool.setdefault(group, deque())) - warm_pending.get(group, 0)
+        if missing <= 0:
+            return 0
+        warm_pending[group] = warm_pending.get(group, 0) + missing
+    for _ in range(missing):
+        lifecycle_pool.submit(_start_warm_container, group)
+    return missing
+
+def start_warm_pool(groups, cpu, memory, heartbeat_interval):
+    """Set the warm container size and pre-warm the given network groups."""
+    warm_spec.update(cpu=cpu, memory=memory, heartbeat_interval=heartbeat_interval)
+    for group in groups:
+        fill_warm_pool(group)
+
+def claim_warm_container(node):
+    """Bind an idle warm container to a node. Returns its container_id, or None."""
+    if warm_spec["cpu"] != node["cpu_total"] or warm_spec["memory"] != node["memory_total"]:
+        return None
+    group = node["network_group"]
+    with warm_lock:
+        pool = warm_pool.get(group)
+        entry = pool.popleft() if pool else None
+        if entry:
+            warm_assignments[entry["token"]] = node["node_id"]
+            warm_assigned_nodes[node["node_id"]] = entry["token"]
+            warm_claimed.notify_all()
+    if entry:
+        for listener in warm_claim_listeners:
+            try:
+                listener(entry["token"], node["node_id"])
+            except Exception as e:
+                print(f"Error in warm claim listener: {e}")
+    fill_warm_pool(group)
+    return entry["container_id"] if entry else None
+
+def get_warm_assignment(token, wait=0):
+    """Node id bound to a standby container's token, waiting up to `wait` seconds for a claim.
+
+    Repeated fetches return the same node until forget_warm_assignment() drops it.
+    """
+    with warm_claimed:
+        warm_claimed.wait_for(lambda: token in warm_assignments, wait)
+        return warm_assignments.get(token)
+
+def forget_warm_assignment(node_id):
+    """Drop a node's claim once its container heartbeats as it, or once the node is removed."""
+    if node_id not in warm_assigned_nodes:  # the common case, without taking the lock
+        return
+    with warm_lock:
+        token = warm_assigned_nodes.pop(node_id, None)
+        warm_assignments.pop(token, None)
+
+def warm_container_ids():
+    """Ids of idle warm containers, and whether any warm launches are still in flight."""
+    with warm_lock:
+        ids = {entry["container_id"] for pool in warm_pool.values() for entry in pool}
+        return ids, any(warm_pending.values())
+
+def warm_pool_status():
+    """Idle and pending warm containers per network group."""
+    with warm_lock:
+        return {
+            group: {"ready": len(pool), "pending": warm_pending.get(group, 0)}
+            for group, pool in warm_pool.items()
+        }
@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+# Phi-accrual failure detection (Hayashibara et al., as in Akka and Cassandra).
+#
+# Instead of a yes/no "heartbeat older than N seconds", each node gets a
+# suspicion level phi from how late its next heartbeat is compared with the
+# spacing of its recent ones: phi = -log10(P(a heartbeat arrives later than
+# now)), with the inter-arrival times taken as normally distributed. A node
+# that heartbeats like clockwork reaches a high phi soon after a missed
+# beat; a jittery one is given proportionally more slack, so it stops
+# flapping between failed and active.
+#
+# The last `window` inter-arrival times live in a float32 NumPy ring buffer
+# per node with running sums, so a heartbeat and a phi query are O(1) and a
+# node costs about 4 bytes per sample. Detectors are not thread-safe; the
+# server keeps one per shard and uses it under that shard's lock.
+
+class HeartbeatHistory:
+    """Inter-arrival times of one node's heartbeats in a fixed-size ring buffer."""
+
+    __slots__ = ("intervals", "count", "next", "total", "total_sq", "last")
+
+    def __init__(self, window, first_estimate):
+        self.intervals = np.zeros(window, dtype=np.float32)
+        self.count = self.next = 0
+        self.total = self.total_sq = 0.0
+        self.last = None  # arrival time of the latest heartbeat
+        # Seed with the expected interval (std of a quarter of it) until real samples replace it
+        for interval in (first_estimate * 0.75, first_estimate * 1.25):
+            self.add(interval)
+
+    def add(self, interval):
+        if self.count == len(self.intervals):
+            old = float(self.intervals[self.next])
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.intervals[self.next] = interval
+        interval = float(self.intervals[self.next])  # as stored, so the sums stay consistent
+        self.total += interval
+        self.total_sq += interval * interval
+        self.next = (self.next + 1) % len(self.intervals)
+
+    def mean_std(self):
+        mean = self.total / self.count
+        return mean, math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+class PhiAccrualDetector:
+    """Per-node heartbeat histories and their phi suspicion levels."""
+
+    def __init__(self, window=100, first_estimate=7.0, min_std_deviation=1.0, acceptable_pause=3.0):
+        self.window = window
+        self.first_estimate = first_estimate
+        self.min_std_deviation = min_std_deviation  # floor so clockwork heartbeats do not make phi explode
+        self.acceptable_pause = acceptable_pause  # extra seconds of silence tolerated on top of the mean
+        self.histories = {}  # node_id -> HeartbeatHistory
+
+    def history(self, node_id):
+        history = self.histories.get(node_id)
+        if history is None:
+            history = self.histories[node_id] = HeartbeatHistory(self.window, self.first_estimate)
+        return history
+
+    def heartbeat(self, node_id, now):
+        """Record a heartbeat arrival."""
+        history = self.history(node_id)
+        if history.last is not None and now > history.last:
+            history.add(now - history.last)
+        history.last = now
+
+    def phi(self, node_id, elapsed):
+        """Suspicion level of a node silent for `elapsed` seconds."""
+        mean, std = self.history(node_id).mean_std()
+        return phi(elapsed, mean + self.acceptable_pause, max(std, self.min_std_deviation))
+
+    def reset(self, node_id):
+        """Drop a node's history, e.g. when it rejoins after a failure."""
+        self.histories.pop(node_id, None)
+
+def phi(elapsed, mean, std):
+    """-log10 of the probability that a heartbeat is later than `elapsed`, for normal(mean, std) intervals.
+
+    Uses the logistic approximation of the normal CDF that Akka uses.
+    """
+    y = min(max((elapsed - mean) / std, -20.0), 20.0)  # keeps exp() finite
+    e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+    if elapsed > mean:
+        return -math.log10(e / (1.0 + e))
+    return -math.log10(1.0 - 1.0 / (1.0 + e))
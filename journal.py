@@ -0,0 +1,184 @@
+import json
+import mmap
+import os
+import re
+import struct
+from threading import Lock
+
+from state_codec import msgpack, to_columns, from_columns
+
+# Local snapshot + append-only journal of persisted cluster state, so a restart
+# rebuilds nodes and pods from disk instead of reading every row from the
+# database.
+#
+#   snapshot-<n>.bin   every node and pod row when journal n was started
+#   journal-<n>.bin    storage writes made after that, in order
+#
+# A snapshot is taken by rotating to a new journal first and capturing the
+# cluster second, so the capture covers everything in the older journals.
+# Records are full-row upserts and deletes, so replaying ones the capture
+# already includes is harmless. On load the newest snapshot is mmapped and
+# the journals from its number on are replayed.
+#
+# Files start with MAGIC and a format byte; journal records are a 4-byte
+# big-endian length followed by the encoded [op, args]. A torn last record
+# (crash mid-write) ends the replay.
+MAGIC = b"CSJ1"
+FORMAT_JSON, FORMAT_MSGPACK = 0, 1
+RECORD_HEADER = struct.Struct(">I")
+FILE_PATTERN = re.compile(r"^(snapshot|journal)-(\d+)\.bin$")
+
+def encode(doc, fmt):
+    return msgpack.packb(doc, use_bin_type=True) if fmt == FORMAT_MSGPACK else json.dumps(doc).encode()
+
+def decode(body, fmt):
+    return msgpack.unpackb(body, raw=False) if fmt == FORMAT_MSGPACK else json.loads(bytes(body))
+
+class StateJournal:
+    """Snapshot and journal files in one directory. Only the process that owns the cluster opens it."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.format = FORMAT_MSGPACK if msgpack is not None else FORMAT_JSON
+        self.lock = Lock()
+        self.file = None
+        self.number = 0
+        self.records = 0  # appended since the current journal was started
+        self.dirty = False  # changes not yet covered by a snapshot
+
+    def path(self, kind, number):
+        return os.path.join(self.directory, f"{kind}-{number:08d}.bin")
+
+    def numbers(self, kind):
+        found = []
+        for name in os.listdir(self.directory):
+            match = FILE_PATTERN.match(name)
+            if match and match.group(1) == kind:
+                found.append(int(match.group(2)))
+        return sorted(found)
+
+    def open(self):
+        """Create the directory if needed and start appending to a fresh journal."""
+        os.makedirs(self.directory, exist_ok=True)
+        existing = self.numbers("journal") + self.numbers("snapshot")
+        with self.lock:
+            self.start_journal(max(existing, default=0) + 1)
+            self.dirty = True  # fold whatever the last run left into a fresh snapshot
+
+    def start_journal(self, number):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+        self.number = number
+        self.records = 0
+        self.file = open(self.path("journal", number), "ab")
+        self.file.write(MAGIC + bytes([self.format]))
+
+    def append(self, op, args):
+        """Record one storage write. A no-op until open()."""
+        body = encode([op, args], self.format)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(RECORD_HEADER.pack(len(body)) + body)
+            self.records += 1
+            self.dirty = True
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+    def rotate(self):
+        """Start a new journal for a snapshot about to be captured. Returns its number."""
+        with self.lock:
+            self.start_journal(self.number + 1)
+            self.dirty = False
+            return self.number
+
+    def write_snapshot(self, number, node_rows, pod_rows, meta):
+        """Atomically write snapshot `number` and delete the files it supersedes."""
+        doc = {"meta": meta, "nodes": to_columns(node_rows), "pods": to_columns(pod_rows)}
+        path = self.path("snapshot", number)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + bytes([self.format]) + encode(doc, self.format))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        for kind in ("snapshot", "journal"):
+            for old in self.numbers(kind):
+                if old < number:
+                    os.remove(self.path(kind, old))
+
+    def discard_older(self):
+        """Delete every snapshot and journal before the current journal."""
+        with self.lock:
+            current = self.number if self.file is not None else float("inf")
+        for kind in ("snapshot", "journal"):
+            for old in self.numbers(kind):
+                if old < current:
+                    os.remove(self.path(kind, old))
+
+    def read_file(self, path):
+        """(format, mmapped contents) of a snapshot or journal, or None if it is empty or foreign."""
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= len(MAGIC):
+                return None
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC:
+            data.close()
+            return None
+        return data[len(MAGIC)], data
+
+    def load(self, apply):
+        """Replay persisted state: `apply(op, args)` for the snapshot rows, then every journal record.
+
+        The snapshot arrives as ("load_snapshot", [node rows, pod rows, meta]).
+        Returns the number of journal records replayed, or None when there is
+        no snapshot to start from.
+        """
+        snapshots = self.numbers("snapshot")
+        if not snapshots:
+            return None
+        number = snapshots[-1]
+        opened = self.read_file(self.path("snapshot", number))
+        if opened is None:
+            return None
+        fmt, data = opened
+        with data:
+            view = memoryview(data)
+            doc = decode(view[len(MAGIC) + 1:], fmt)
+            view.release()
+        apply("load_snapshot", [from_columns(doc["nodes"]), from_columns(doc["pods"]), doc["meta"]])
+        replayed = 0
+        for journal in self.numbers("journal"):
+            if journal < number:
+                continue
+            opened = self.read_file(self.path("journal", journal))
+            if opened is None:
+                continue
+            fmt, data = opened
+            with data:
+                view = memoryview(data)
+                offset = len(MAGIC) + 1
+                while offset + RECORD_HEADER.size <= len(data):
+                    (length,) = RECORD_HEADER.unpack_from(data, offset)
+                    start = offset + RECORD_HEADER.size
+                    if start + length > len(data):
+                        break  # torn write
+                    op, args = decode(view[start:start + length], fmt)
+                    apply(op, args)
+                    replayed += 1
+                    offset = start + length
+                view.release()
+        return replayed
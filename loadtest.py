@@ -0,0 +1,270 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode, urlsplit
+
+# HTTP load generator for the API (`python client.py loadtest`).
+#
+# Workers share one asyncio loop and each keeps its own HTTP/1.1 keep-alive
+# connection, so the pool holds as many connections as there are workers.
+# With a target rate, requests are scheduled open-loop at fixed intervals
+# and latency is measured from the scheduled time, so a slow server shows up
+# as latency rather than as a quietly lower request rate. Without one, every
+# worker sends back to back to find the server's limit.
+#
+# Endpoints that kill nodes are never in the default mix and are refused
+# unless the caller opts in with allow_destructive.
+ENDPOINTS = ("add_node", "launch_pod", "list_nodes", "heartbeat", "chaos_monkey")
+DESTRUCTIVE_ENDPOINTS = ("chaos_monkey",)
+DEFAULT_MIX = {"add_node": 1, "launch_pod": 10, "list_nodes": 20, "heartbeat": 60}
+NODE_TYPES = ("balanced", "high_cpu", "high_mem")
+ALGORITHMS = ("first_fit", "best_fit", "worst_fit")
+
+def parse_mix(text):
+    """{endpoint: weight} from "heartbeat=60,list_nodes=20,..."; unnamed endpoints get weight 0."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r}; expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one endpoint with a positive weight")
+    return mix
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened after errors or a server-side close."""
+
+    def __init__(self, host, port, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        """(status, body bytes). Raises OSError, asyncio.TimeoutError or ValueError on failure."""
+        try:
+            return await asyncio.wait_for(self.exchange(method, path, payload), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def exchange(self, method, path, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode() + body)
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            data = await self.read_chunked()
+        else:
+            data = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close" or status_line.startswith(b"HTTP/1.0"):
+            self.close()
+        return status, data
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.failures = 0  # connection errors and timeouts
+
+    def record(self, latency, status):
+        self.latencies.append(latency)
+        if status is None:
+            self.failures += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, seconds):
+        sent = len(self.latencies)
+        ok = sum(n for status, n in self.statuses.items() if status < 400)
+        return {
+            "requests": sent, "ok": ok,
+            "requests_per_s": round(sent / seconds, 1) if seconds else 0.0,
+            "error_rate": round(1 - ok / sent, 4) if sent else 0.0,
+            "failures": self.failures,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "p90_ms": round(percentile(self.latencies, 90) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+            "max_ms": round(max(self.latencies, default=0) * 1000, 2),
+        }
+
+class LoadTest:
+    def __init__(self, server_url, mix, rate=None, concurrency=32, duration=10.0, timeout=10.0, seed=None,
+                 allow_destructive=False):
+        parts = urlsplit(server_url)
+        if parts.scheme != "http":
+            raise ValueError("loadtest supports plain http:// servers only")
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+        destructive = [name for name in self.mix if name in DESTRUCTIVE_ENDPOINTS]
+        if destructive and not allow_destructive:
+            raise ValueError(f"{', '.join(destructive)} kills nodes; it is only sent with allow_destructive (--allow_destructive)")
+        self.rate, self.concurrency, self.duration, self.timeout = rate, concurrency, duration, timeout
+        self.rng = random.Random(seed)
+        self.node_ids = []
+        self.stats = {name: EndpointStats() for name in self.mix}
+        self.unsent = 0  # scheduled requests no worker got to before the deadline
+
+    def pick(self):
+        return self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+
+    def build_request(self, endpoint):
+        """(method, path, payload) for one call of `endpoint`."""
+        rng = self.rng
+        if endpoint == "add_node":
+            return "POST", "/api/add_node", {"cpu": 8, "memory": 16, "node_type": rng.choice(NODE_TYPES),
+                                             "network_group": "default"}
+        if endpoint == "launch_pod":
+            return "POST", "/api/launch_pod", {"cpu_required": rng.randint(1, 2), "memory_required": rng.randint(1, 4),
+                                               "scheduling_algorithm": rng.choice(ALGORITHMS),
+                                               "network_group": "default"}
+        if endpoint == "list_nodes":
+            return "GET", "/api/list_nodes?" + urlencode({"limit": 500, "include_pods": "false"}), None
+        if endpoint == "heartbeat":
+            return "POST", "/api/heartbeat", {"node_id": rng.choice(self.node_ids)}
+        return "POST", "/api/chaos_monkey", {}
+
+    async def fetch_node_ids(self, connection):
+        params = {"fields": "node_id", "include_pods": "false", "limit": 1000}
+        while True:
+            status, body = await connection.request("GET", "/api/list_nodes?" + urlencode(params))
+            if status != 200:
+                raise RuntimeError(f"list_nodes returned {status}")
+            page = json.loads(body)
+            self.node_ids += [n["node_id"] for n in page["nodes"]]
+            if not page.get("next_cursor"):
+                return
+            params["cursor"] = page["next_cursor"]
+
+    async def send(self, connection, endpoint, scheduled):
+        method, path, payload = self.build_request(endpoint)
+        try:
+            status, body = await connection.request(method, path, payload)
+        except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError):
+            status = body = None
+        self.stats[endpoint].record(time.perf_counter() - scheduled, status)
+        if endpoint == "add_node" and status == 200:
+            self.node_ids.append(json.loads(body)["node_id"])
+
+    async def produce(self, tickets, deadline):
+        """Queue (endpoint, scheduled time) at the target rate until the deadline."""
+        start = time.perf_counter()
+        sent = 0
+        while True:
+            due = start + sent / self.rate
+            if due >= deadline:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tickets.put_nowait((self.pick(), due))
+            sent += 1
+
+    async def work(self, tickets, deadline):
+        connection = Connection(self.host, self.port, self.timeout)
+        try:
+            while time.perf_counter() < deadline:
+                if tickets is None:
+                    await self.send(connection, self.pick(), time.perf_counter())
+                    continue
+                try:
+                    endpoint, scheduled = await asyncio.wait_for(tickets.get(), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break
+                await self.send(connection, endpoint, scheduled)
+        finally:
+            connection.close()
+
+    async def run(self):
+        setup = Connection(self.host, self.port, self.timeout)
+        try:
+            if "heartbeat" in self.mix:
+                await self.fetch_node_ids(setup)
+                if not self.node_ids:
+                    raise RuntimeError("The server has no nodes to heartbeat; add some first")
+        finally:
+            setup.close()
+        start = time.perf_counter()
+        deadline = start + self.duration
+        tickets = asyncio.Queue() if self.rate else None
+        tasks = [asyncio.ensure_future(self.work(tickets, deadline)) for _ in range(self.concurrency)]
+        if tickets is not None:
+            await self.produce(tickets, deadline)
+        await asyncio.gather(*tasks)
+        self.unsent = tickets.qsize() if tickets is not None else 0
+        return self.report(time.perf_counter() - start)
+
+    def report(self, seconds):
+        endpoints = {name: stats.summary(seconds) for name, stats in self.stats.items()}
+        latencies = [lat for stats in self.stats.values() for lat in stats.latencies]
+        sent = len(latencies)
+        ok = sum(e["ok"] for e in endpoints.values())
+        return {
+            "seconds": round(seconds, 2), "target_rate": self.rate, "concurrency": self.concurrency,
+            "total": {"requests": sent, "requests_per_s": round(sent / seconds, 1) if seconds else 0.0,
+                      "error_rate": round(1 - ok / sent, 4) if sent else 0.0, "unsent": self.unsent,
+                      "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                      "p99_ms": round(percentile(latencies, 99) * 1000, 2)},
+            "endpoints": endpoints,
+        }
+
+def run_loadtest(server_url, mix, rate=None, concurrency=32, duration=10.0, timeout=10.0, seed=None,
+                 allow_destructive=False):
+    """Run a load test and return its report dict."""
+    test = LoadTest(server_url, mix, rate, concurrency, duration, timeout, seed, allow_destructive)
+    return asyncio.run(test.run())
+
+def print_report(report):
+    total = report["total"]
+    target = f" (target {report['target_rate']}/s)" if report["target_rate"] else ""
+    print(f"{total['requests']} requests in {report['seconds']}s: {total['requests_per_s']}/s{target}, "
+          f"{total['error_rate']:.1%} errors, p50 {total['p50_ms']}ms, p99 {total['p99_ms']}ms")
+    if total["unsent"]:
+        print(f"⚠️  {total['unsent']} scheduled requests were never sent; raise --concurrency")
+    print(f"{'endpoint':<13} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8}  statuses")
+    for name, e in report["endpoints"].items():
+        statuses = " ".join(f"{s}×{n}" for s, n in e["statuses"].items())
+        if e["failures"]:
+            statuses += f" failed×{e['failures']}"
+        print(f"{name:<13} {e['requests']:>8} {e['requests_per_s']:>8} {e['error_rate']:>7.1%} {e['p50_ms']:>8} "
+              f"{e['p90_ms']:>8} {e['p99_ms']:>8} {e['max_ms']:>8}  {statuses}")
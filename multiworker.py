@@ -0,0 +1,392 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import struct
+import time
+from multiprocessing import get_context
+from multiprocessing.connection import Listener, Client
+from multiprocessing.shared_memory import SharedMemory
+from threading import Event, Thread, Lock
+
+from flask import Flask, Response, request, jsonify, send_from_directory
+from werkzeug.serving import make_server
+
+from node_query import NodeIndex, list_nodes_response
+
+# Multi-process API tier.
+#
+# The state owner is the regular server_new process: it alone schedules and
+# mutates cluster state, and keeps serving the dashboard and Socket.IO on
+# OWNER_PORT. N worker processes share API_PORT (SO_REUSEPORT) and
+#   - serve /api/list_nodes from the owner's latest snapshot in shared memory,
+#   - forward heartbeats to the owner in batches, answering each with the
+#     owner's result for it once its batch is applied,
+#   - forward every other API call to the owner over a local IPC channel, and
+#     proxy streamed report downloads to the owner's HTTP port.
+# server_new is only imported by the owner, so spawned workers stay light.
+OWNER_PORT = int(os.environ.get("OWNER_PORT", 5000))
+API_PORT = int(os.environ.get("API_PORT", 5001))
+API_WORKERS = int(os.environ.get("API_WORKERS", os.cpu_count() or 2))
+IPC_ADDRESS = ("127.0.0.1", int(os.environ.get("IPC_PORT", 5002)))
+SNAPSHOT_SHM_BYTES = int(os.environ.get("SNAPSHOT_SHM_BYTES", 64 * 1024 * 1024))
+HEARTBEAT_FLUSH_INTERVAL = 0.05  # seconds
+OWNER_TIMEOUT = 30  # seconds a worker waits on the owner before answering 503
+
+# Requests forwarded to the owner: route -> (IPC operation, HTTP method)
+FORWARDED_ROUTES = {
+    "/api/add_node": ("add_node", "POST"),
+    "/api/toggle_simulation": ("toggle_simulation", "POST"),
+    "/api/remove_node": ("remove_node", "POST"),
+    "/api/launch_pod": ("launch_pod", "POST"),
+    "/api/chaos_monkey": ("chaos_monkey", "POST"),
+    "/api/chaos_incidents": ("chaos_incidents", "GET"),
+    "/api/logs": ("logs", "GET"),
+    "/api/utilization_history": ("utilization_history", "GET"),
+    "/api/warm_pool": ("warm_pool", "GET"),
+    "/api/warm_pool/assignment/<token>": ("warm_assignment", "GET"),
+    "/api/startup_metrics": ("startup_metrics", "GET"),
+}
+
+# ----------------------------------
+# Shared-memory Snapshot
+# ----------------------------------
+HEADER = struct.Struct("<QQQ")  # sequence, revision, length
+
+class SharedSnapshot:
+    """Single-writer, many-reader buffer holding the latest snapshot JSON.
+
+    The writer bumps the sequence to an odd value before copying and to the
+    next even value after, so readers retry instead of seeing a torn write.
+    """
+
+    def __init__(self, name=None, size=SNAPSHOT_SHM_BYTES):
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        else:
+            self.shm = SharedMemory(name=name)
+        self.sequence = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, revision, data):
+        """Publish snapshot bytes. Only the owner process may call this."""
+        if HEADER.size + len(data) > self.shm.size:
+            print(f"❌ Snapshot revision {revision} ({len(data)} bytes) exceeds SNAPSHOT_SHM_BYTES; workers keep the previous one")
+            return False
+        buf = self.shm.buf
+        self.sequence += 1
+        HEADER.pack_into(buf, 0, self.sequence, revision, len(data))
+        buf[HEADER.size:HEADER.size + len(data)] = data
+        self.sequence += 1
+        HEADER.pack_into(buf, 0, self.sequence, revision, len(data))
+        return True
+
+    def revision(self):
+        return HEADER.unpack_from(self.shm.buf, 0)[1]
+
+    def read(self):
+        """Return (revision, bytes) of a consistent snapshot."""
+        buf = self.shm.buf
+        while True:
+            seq, revision, length = HEADER.unpack_from(buf, 0)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            data = bytes(buf[HEADER.size:HEADER.size + length])
+            if HEADER.unpack_from(buf, 0)[0] == seq:
+                return revision, data
+
+    def close(self):
+        self.shm.close()
+
+# ----------------------------------
+# Owner Side
+# ----------------------------------
+def serve_ipc(handlers, authkey):
+    """Accept worker connections and dispatch their requests to the owner's handlers."""
+    listener = Listener(IPC_ADDRESS, authkey=authkey)
+    while True:
+        conn = listener.accept()
+        Thread(target=serve_ipc_connection, args=(conn, handlers), daemon=True).start()
+
+def serve_ipc_connection(conn, handlers):
+    while True:
+        try:
+            op, data = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            return
+        handler = handlers.get(op)
+        try:
+            result = handler(data) if handler else ({"error": f"Unknown operation {op}"}, 404)
+        except Exception as e:
+            result = ({"error": str(e)}, 500)
+        conn.send(result)
+
+def owner_handlers(cluster):
+    def heartbeat_batch(node_ids):
+        rejected = {}  # node_id -> (body, status) of heartbeats the owner refused
+        for nid in node_ids:
+            body, status = cluster.handle_heartbeat({"node_id": nid})
+            if status != 200:
+                rejected[nid] = (body, status)
+        return {"applied": len(node_ids) - len(rejected), "rejected": rejected}, 200
+
+    return {
+        "add_node": cluster.handle_add_node,
+        "toggle_simulation": cluster.handle_toggle_simulation,
+        "remove_node": cluster.handle_remove_node,
+        "launch_pod": cluster.handle_launch_pod,
+        "chaos_monkey": cluster.handle_chaos_monkey,
+        "chaos_incidents": cluster.handle_chaos_incidents,
+        "logs": cluster.handle_logs,
+        "utilization_history": cluster.handle_utilization_history,
+        "warm_pool": cluster.handle_warm_pool,
+        "warm_assignment": lambda data: cluster.handle_warm_assignment(data.get("token"),
+                                                                       cluster.warm_assignment_wait(data)),
+        "startup_metrics": cluster.handle_startup_metrics,
+        "heartbeat_batch": heartbeat_batch,
+    }
+
+# ----------------------------------
+# Worker Side
+# ----------------------------------
+class OwnerClient:
+    """Pooled IPC connections from a worker to the state owner (one request per connection at a time)."""
+
+    def __init__(self, authkey):
+        self.authkey = authkey
+        self.pool = queue.LifoQueue()
+
+    def call(self, op, data):
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            conn = Client(IPC_ADDRESS, authkey=self.authkey)
+        try:
+            conn.send((op, data))
+            # A hung owner must not hold this worker thread forever; TimeoutError is an OSError,
+            # so callers answer it with 503 like a lost connection
+            if not conn.poll(OWNER_TIMEOUT):
+                raise TimeoutError(f"state owner did not answer {op} within {OWNER_TIMEOUT}s")
+            result = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            raise
+        self.pool.put(conn)
+        return result
+
+class SnapshotReader:
+    """Caches the decoded shared snapshot per revision."""
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.lock = Lock()
+        self.current = (None, b'{"nodes": []}', NodeIndex([]))  # revision, body, node index
+
+    def latest(self):
+        """Return (revision, JSON body, NodeIndex) of the newest snapshot."""
+        if self.shared.revision() != self.current[0]:
+            with self.lock:
+                if self.shared.revision() != self.current[0]:
+                    revision, data = self.shared.read()
+                    if data:
+                        self.current = (revision, data, NodeIndex(json.loads(data)["nodes"]))
+        return self.current
+
+class HeartbeatBatch:
+    def __init__(self):
+        self.node_ids = set()
+        self.done = Event()
+        self.rejected = {}  # node_id -> (body, status) from the owner
+        self.error = None  # set when the batch never reached the owner
+
+    def result(self, node_id):
+        """(body, status) the owner gave this node's heartbeat."""
+        if not self.done.wait(OWNER_TIMEOUT) or self.error:
+            return {"error": "State owner unavailable"}, 503
+        return self.rejected.get(node_id, ({"message": "OK"}, 200))
+
+class HeartbeatBatcher:
+    """Forwards heartbeats to the owner every HEARTBEAT_FLUSH_INTERVAL.
+
+    Each request waits for its batch, so it is answered with the owner's real
+    status (404 for a removed node, 503 while its group is partitioned).
+    """
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.lock = Lock()
+        self.batch = HeartbeatBatch()
+        Thread(target=self.run, daemon=True).start()
+
+    def submit(self, node_id):
+        """Queue a heartbeat and return the owner's (body, status) for it."""
+        with self.lock:
+            batch = self.batch
+            batch.node_ids.add(node_id)
+        return batch.result(node_id)
+
+    def run(self):
+        while True:
+            time.sleep(HEARTBEAT_FLUSH_INTERVAL)
+            with self.lock:
+                batch, self.batch = self.batch, HeartbeatBatch()
+            if not batch.node_ids:
+                continue
+            try:
+                body, _ = self.owner.call("heartbeat_batch", list(batch.node_ids))
+                batch.rejected = body.get("rejected", {})
+            except (EOFError, OSError) as e:
+                batch.error = e
+                print(f"❌ Heartbeat batch of {len(batch.node_ids)} lost: {e}")
+            batch.done.set()
+
+def proxy_to_owner(owner_port):
+    """View that streams the owner's HTTP response to the same GET request through, chunk by chunk."""
+    def view(**kwargs):
+        conn = http.client.HTTPConnection("127.0.0.1", owner_port, timeout=OWNER_TIMEOUT)
+        try:
+            conn.request("GET", request.full_path)
+            upstream = conn.getresponse()
+        except OSError:
+            conn.close()
+            return jsonify({"error": "State owner unavailable"}), 503
+        headers = {k: v for k, v in upstream.getheaders() if k.lower() in ("content-type", "content-disposition")}
+
+        def body():
+            # A failed or cut-off upstream raises here, so the worker aborts the transfer too
+            try:
+                while True:
+                    chunk = upstream.read1(64 * 1024)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                conn.close()
+        return Response(body(), status=upstream.status, headers=headers)
+    return view
+
+def create_worker_app(reader, owner, batcher, owner_port=OWNER_PORT):
+    app = Flask(__name__, static_folder="./static")
+
+    @app.route('/api/list_nodes', methods=['GET'])
+    def list_nodes_api():
+        revision, data, index = reader.latest()
+        # The shared memory block is unique to one owner run, so its name serves as the ETag epoch
+        body, status, headers = list_nodes_response(
+            reader.shared.name, revision, request.args, request.headers.get("If-None-Match"),
+            lambda: data, lambda: index
+        )
+        return Response(body, status=status, mimetype="application/json", headers=headers)
+
+    @app.route('/heartbeat', methods=['POST'])
+    @app.route('/api/heartbeat', methods=['POST'])
+    def heartbeat_api():
+        nid = (request.get_json(silent=True) or {}).get("node_id")
+        if nid not in reader.latest()[2]:
+            return jsonify({"error": "Unknown"}), 404
+        body, status = batcher.submit(nid)
+        return jsonify(body), status
+
+    def forward(op):
+        def view(**kwargs):
+            data = request.get_json(silent=True) if request.method == "POST" else request.args.to_dict()
+            data = dict(data or {}, **kwargs)  # plus URL parts such as a warm pool token
+            try:
+                body, status = owner.call(op, data)
+            except (EOFError, OSError):
+                return jsonify({"error": "State owner unavailable"}), 503
+            return jsonify(body), status
+        return view
+
+    for path, (op, method) in FORWARDED_ROUTES.items():
+        app.add_url_rule(path, op, forward(op), methods=[method])
+    app.add_url_rule('/api/download_report', 'download_report', proxy_to_owner(owner_port), methods=['GET'])
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if path.startswith("api/"):
+            return jsonify({"error": "Not found"}), 404
+        if path != "" and os.path.exists(app.static_folder + '/' + path):
+            return send_from_directory(app.static_folder, path)
+        return send_from_directory(app.static_folder, 'index.html')
+
+    return app
+
+def reuseport_socket(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("0.0.0.0", port))
+    sock.listen(1024)
+    return sock
+
+def run_api_worker(index, shm_name, authkey, port, owner_port):
+    shared = SharedSnapshot(shm_name)
+    owner = OwnerClient(authkey)
+    app = create_worker_app(SnapshotReader(shared), owner, HeartbeatBatcher(owner), owner_port)
+    sock = reuseport_socket(port)
+    server = make_server("0.0.0.0", port, app, threaded=True, fd=sock.fileno())
+    print(f"🧵 API worker {index} (pid {os.getpid()}) serving on :{port}")
+    server.serve_forever()
+
+# ----------------------------------
+# Startup
+# ----------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Run the cluster server with a multi-process API tier")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Number of API worker processes")
+    parser.add_argument("--api_port", type=int, default=API_PORT, help="Port shared by the API workers")
+    parser.add_argument("--port", type=int, default=OWNER_PORT, help="Port of the state owner (dashboard, Socket.IO)")
+    parser.add_argument("--no-docker", action="store_true", help="Simulation only: never import or contact Docker")
+    args = parser.parse_args()
+
+    import server_new as cluster
+    from storage import connect_storage, init_storage, close_storage
+
+    if args.no_docker:
+        cluster.disable_docker()
+    if not (cluster.timed_phase("storage_connect", connect_storage)
+            and cluster.timed_phase("storage_init", init_storage)):
+        print("Failed to initialize storage. Exiting.")
+        return
+    cluster.timed_phase("state_load", cluster.load_cluster_state)
+
+    shared = SharedSnapshot()
+    cluster.snapshot_listeners.append(lambda snap: shared.write(snap.revision, snap.nodes_json().encode()))
+    shared.write(cluster.snapshot.revision, cluster.snapshot.nodes_json().encode())
+
+    authkey = os.urandom(32)
+    Thread(target=serve_ipc, args=(owner_handlers(cluster), authkey), daemon=True).start()
+
+    ctx = get_context("spawn")
+    workers = [
+        ctx.Process(target=run_api_worker, args=(i, shared.name, authkey, args.api_port, args.port), daemon=True)
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    cluster.timed_phase("thread_start", cluster.background_tasks)
+    cluster.report_startup()
+    try:
+        cluster.socketio.run(cluster.app, host="0.0.0.0", port=args.port, allow_unsafe_werkzeug=True)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        shared.close()
+        shared.shm.unlink()
+        cluster.flush_events_tick()
+        cluster.snapshot_tick()
+        close_storage()
+
+if __name__ == '__main__':
+    main()
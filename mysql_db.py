@@ -1,5 +1,7 @@
 import os
 import time
+import uuid
+from threading import RLock
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
@@ -15,46 +17,127 @@ DB_CONFIG = {
     'database': os.environ.get('MYSQL_DATABASE', 'cluster_sim')
 }
 
-# Global connection object
+RETENTION_BATCH_SIZE = 1000  # rows per DELETE; keeps each statement's locks short
+
+# Global connection object, shared by every thread. db_lock is held for each
+# whole query or transaction (and check-then-write pair), so no other thread's
+# statement, commit or rollback can land in the middle of one.
 db_connection = None
 db_cursor = None
+db_lock = RLock()
 
 def connect_to_mysql():
     """Connect to MySQL database."""
     global db_connection, db_cursor
-    try:
-        db_connection = mysql.connector.connect(**DB_CONFIG)
-        db_cursor = db_connection.cursor(dictionary=True)
-        print("✅ Successfully connected to MySQL database")
-        return True
-    except Error as e:
-        print(f"❌ Failed to connect to MySQL database: {e}")
-        return False
+    with db_lock:
+        try:
+            db_connection = mysql.connector.connect(**DB_CONFIG)
+            db_cursor = db_connection.cursor(dictionary=True)
+            print("✅ Successfully connected to MySQL database")
+            return True
+        except Error as e:
+            print(f"❌ Failed to connect to MySQL database: {e}")
+            return False
 
 def execute_query(query, params=None, fetch=True):
     """Execute a query and optionally fetch results."""
     global db_connection, db_cursor
     
-    # Reconnect if connection is closed
-    if db_connection is None or not db_connection.is_connected():
-        if not connect_to_mysql():
-            return None if fetch else False
+    with db_lock:
+        # Reconnect if connection is closed
+        if db_connection is None or not db_connection.is_connected():
+            if not connect_to_mysql():
+                return None if fetch else False
     
-    try:
-        db_cursor.execute(query, params or ())
-        if fetch:
-            result = db_cursor.fetchall()
-            return result
-        else:
+        try:
+            db_cursor.execute(query, params or ())
+            if fetch:
+                result = db_cursor.fetchall()
+                return result
+            else:
+                db_connection.commit()
+                return True
+        except Error as e:
+            print(f"Error executing query: {e}")
+            print(f"Query: {query}")
+            print(f"Params: {params}")
+            if not fetch:
+                db_connection.rollback()
+            return None if fetch else False
+
+def execute_many(query, params_list):
+    """Execute a statement for every parameter tuple in a single transaction."""
+    global db_connection, db_cursor
+
+    if not params_list:
+        return True
+    with db_lock:
+        if db_connection is None or not db_connection.is_connected():
+            if not connect_to_mysql():
+                return False
+
+        try:
+            db_cursor.executemany(query, params_list)
             db_connection.commit()
             return True
-    except Error as e:
-        print(f"Error executing query: {e}")
-        print(f"Query: {query}")
-        print(f"Params: {params}")
-        if not fetch:
+        except Error as e:
+            print(f"Error executing batch: {e}")
+            print(f"Query: {query}")
             db_connection.rollback()
-        return None if fetch else False
+            return False
+
+def execute_transaction(statements):
+    """Execute [(query, params_list)] as one transaction; nothing is kept if any statement fails."""
+    global db_connection, db_cursor
+
+    statements = [(query, params_list) for query, params_list in statements if params_list]
+    if not statements:
+        return True
+    with db_lock:
+        if db_connection is None or not db_connection.is_connected():
+            if not connect_to_mysql():
+                return False
+
+        try:
+            for query, params_list in statements:
+                db_cursor.executemany(query, params_list)
+            db_connection.commit()
+            return True
+        except Error as e:
+            print(f"Error executing transaction: {e}")
+            print(f"Query: {query}")
+            db_connection.rollback()
+            return False
+
+def iter_query(query, params=None, batch_size=1000):
+    """Stream query results in batches over a dedicated connection with an unbuffered cursor.
+
+    The connection is opened and the query run before this returns, so those
+    failures raise mysql.connector.Error here; errors while fetching raise from
+    the iterator. Either way a stream never just ends early.
+    """
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        # Unbuffered: rows stay on the server until fetched, so memory is bounded by batch_size
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params or ())
+    except Error:
+        connection.close()
+        raise
+    return fetch_rows(connection, cursor, batch_size)
+
+def fetch_rows(connection, cursor, batch_size):
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        try:
+            connection.close()
+        except Error:
+            pass
 
 def init_mysql_tables():
     """Create MySQL tables if they don't exist."""
@@ -83,7 +166,9 @@ def init_mysql_tables():
         cpu INT NOT NULL,
         memory INT NOT NULL,
         network_group VARCHAR(50) NOT NULL,
-        node_affinity VARCHAR(20)
+        node_affinity VARCHAR(20),
+        scheduling_algorithm VARCHAR(20),
+        INDEX idx_pods_node (node_id)
     )
     """
     
@@ -91,8 +176,15 @@ def init_mysql_tables():
     event_logs_table_query = """
     CREATE TABLE IF NOT EXISTS event_logs (
         id INT AUTO_INCREMENT PRIMARY KEY,
-        timestamp FLOAT NOT NULL,
-        event TEXT NOT NULL
+        timestamp DOUBLE NOT NULL,
+        type VARCHAR(30) NOT NULL DEFAULT 'info',
+        severity VARCHAR(10) NOT NULL DEFAULT 'info',
+        node_id VARCHAR(50),
+        pod_id VARCHAR(50),
+        event TEXT NOT NULL,
+        INDEX idx_event_logs_timestamp (timestamp),
+        INDEX idx_event_logs_type (type, timestamp),
+        INDEX idx_event_logs_node (node_id, timestamp)
     )
     """
     
@@ -100,12 +192,61 @@ def init_mysql_tables():
     utilization_table_query = """
     CREATE TABLE IF NOT EXISTS utilization_history (
         id INT AUTO_INCREMENT PRIMARY KEY,
-        timestamp FLOAT NOT NULL,
-        utilization FLOAT NOT NULL
+        timestamp DOUBLE NOT NULL,
+        utilization FLOAT NOT NULL,
+        INDEX idx_utilization_history_timestamp (timestamp)
+    )
+    """
+    
+    # Create utilization_rollups table (per-minute / per-hour series from timeseries.py)
+    utilization_rollups_table_query = """
+    CREATE TABLE IF NOT EXISTS utilization_rollups (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        resolution VARCHAR(4) NOT NULL,
+        scope VARCHAR(10) NOT NULL,
+        scope_id VARCHAR(50) NOT NULL,
+        timestamp DOUBLE NOT NULL,
+        cpu_min FLOAT NOT NULL,
+        cpu_max FLOAT NOT NULL,
+        cpu_avg FLOAT NOT NULL,
+        cpu_p95 FLOAT NOT NULL,
+        memory_min FLOAT NOT NULL,
+        memory_max FLOAT NOT NULL,
+        memory_avg FLOAT NOT NULL,
+        memory_p95 FLOAT NOT NULL,
+        samples INT NOT NULL,
+        INDEX idx_rollups_series (resolution, scope, scope_id, timestamp),
+        INDEX idx_rollups_retention (resolution, timestamp)
+    )
+    """
+    
+    # Create schema_version table (one row: the last migration applied)
+    schema_version_table_query = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        id TINYINT PRIMARY KEY,
+        version INT NOT NULL,
+        applied_at DOUBLE NOT NULL
+    )
+    """
+    
+    # Create storage_instance table (one row: a random id created with the database)
+    storage_instance_table_query = """
+    CREATE TABLE IF NOT EXISTS storage_instance (
+        id TINYINT PRIMARY KEY,
+        instance_id VARCHAR(36) NOT NULL
     )
     """
     
     # Execute queries
+    if not execute_query(schema_version_table_query, fetch=False):
+        return False
+    # Refuse to touch a database migrated by a newer version of the simulator
+    version = get_schema_version()
+    if version is None:
+        return False
+    if version > SCHEMA_VERSION:
+        print(f"❌ Database schema version {version} is newer than this code supports ({SCHEMA_VERSION})")
+        return False
     if not execute_query(nodes_table_query, fetch=False):
         return False
     if not execute_query(pods_table_query, fetch=False):
@@ -114,9 +255,152 @@ def init_mysql_tables():
         return False
     if not execute_query(utilization_table_query, fetch=False):
         return False
+    if not execute_query(utilization_rollups_table_query, fetch=False):
+        return False
+    if not execute_query(storage_instance_table_query, fetch=False):
+        return False
     
+    return migrate_schema(version)
+
+def get_instance_id():
+    """The database's random instance id, created on first use, so a recreated database is told apart; None on error."""
+    query = "INSERT IGNORE INTO storage_instance (id, instance_id) VALUES (1, %s)"
+    if not execute_query(query, (uuid.uuid4().hex,), fetch=False):
+        return None
+    rows = execute_query("SELECT instance_id FROM storage_instance WHERE id = 1")
+    return rows[0]['instance_id'] if rows else None
+
+def column_names(table):
+    """Columns of a table in the current database."""
+    query = "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    return {row['COLUMN_NAME'] for row in execute_query(query, (table,)) or []}
+
+def column_type(table, column):
+    """Lower-case data type of a column, or None if it does not exist."""
+    query = ("SELECT DATA_TYPE FROM information_schema.COLUMNS "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s")
+    rows = execute_query(query, (table, column))
+    return rows[0]['DATA_TYPE'].lower() if rows else None
+
+def index_names(table):
+    """Indexes of a table in the current database."""
+    query = "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    return {row['INDEX_NAME'] for row in execute_query(query, (table,)) or []}
+
+def add_missing_indexes(table, indexes):
+    """CREATE INDEX statements for the (name, columns) pairs a table lacks."""
+    existing = index_names(table)
+    return [f"CREATE INDEX {name} ON {table} ({cols})" for name, cols in indexes if name not in existing]
+
+def migrate_structured_events():
+    """event_logs: structured columns, DOUBLE timestamp and query indexes."""
+    statements = []
+    if 'type' not in column_names('event_logs'):
+        statements.append(
+            "ALTER TABLE event_logs MODIFY timestamp DOUBLE NOT NULL, "
+            "ADD COLUMN type VARCHAR(30) NOT NULL DEFAULT 'info', "
+            "ADD COLUMN severity VARCHAR(10) NOT NULL DEFAULT 'info', "
+            "ADD COLUMN node_id VARCHAR(50), ADD COLUMN pod_id VARCHAR(50)"
+        )
+    statements += add_missing_indexes('event_logs', (("idx_event_logs_timestamp", "timestamp"),
+                                                     ("idx_event_logs_type", "type, timestamp"),
+                                                     ("idx_event_logs_node", "node_id, timestamp")))
+    return statements
+
+def migrate_pods_node_index():
+    """pods: index on node_id for the joined startup load and node deletes."""
+    return add_missing_indexes('pods', (("idx_pods_node", "node_id"),))
+
+def migrate_pods_scheduling_algorithm():
+    """pods: scheduling_algorithm, so rescheduling can reuse the algorithm a pod was launched with."""
+    if 'scheduling_algorithm' in column_names('pods'):
+        return []
+    return ["ALTER TABLE pods ADD COLUMN scheduling_algorithm VARCHAR(20)"]
+
+def migrate_utilization_indexes():
+    """utilization tables: DOUBLE history timestamps and indexes for range queries and retention."""
+    statements = []
+    # FLOAT keeps ~7 significant digits, i.e. epoch timestamps rounded to minutes
+    if column_type('utilization_history', 'timestamp') != 'double':
+        statements.append("ALTER TABLE utilization_history MODIFY timestamp DOUBLE NOT NULL")
+    statements += add_missing_indexes('utilization_history', (("idx_utilization_history_timestamp", "timestamp"),))
+    statements += add_missing_indexes('utilization_rollups', (("idx_rollups_retention", "resolution, timestamp"),))
+    return statements
+
+# Schema migrations, applied in order by init_mysql_tables. Each returns the
+# statements still needed, so it is a no-op on tables created at the latest
+# layout. Append new migrations; never reorder or remove them.
+MIGRATIONS = [
+    (1, migrate_structured_events),
+    (2, migrate_utilization_indexes),
+    (3, migrate_pods_node_index),
+    (4, migrate_pods_scheduling_algorithm),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version():
+    """The schema version recorded in the database (0 before any migration), or None on error."""
+    rows = execute_query("SELECT version FROM schema_version WHERE id = 1")
+    if rows is None:
+        return None
+    return rows[0]['version'] if rows else 0
+
+def migrate_schema(version):
+    """Apply the migrations after `version`, recording each one as it completes."""
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        print(f"🔧 Migrating schema to version {target}: {migration.__doc__}")
+        if not all(execute_query(statement, fetch=False) for statement in migration()):
+            print(f"❌ Schema migration to version {target} failed")
+            return False
+        query = "REPLACE INTO schema_version (id, version, applied_at) VALUES (1, %s, %s)"
+        if not execute_query(query, (target, time.time()), fetch=False):
+            return False
     return True
 
+def delete_in_batches(table, condition, params, batch_size=RETENTION_BATCH_SIZE, pause=0.05):
+    """Delete matching rows a batch at a time over a dedicated connection. Returns rows deleted.
+
+    Each batch is its own short transaction, oldest rows first along the
+    timestamp index, so pruning never holds locks that stall the writers.
+    """
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"❌ Failed to open retention connection: {e}")
+        return 0
+    query = f"DELETE FROM {table} WHERE {condition} ORDER BY timestamp LIMIT %s"
+    deleted = 0
+    try:
+        cursor = connection.cursor()
+        while True:
+            cursor.execute(query, (*params, batch_size))
+            connection.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+            time.sleep(pause)
+    except Error as e:
+        print(f"Error pruning {table}: {e}")
+    finally:
+        try:
+            connection.close()
+        except Error:
+            pass
+    return deleted
+
+def prune_expired_rows(policies):
+    """Delete rows older than each (table, rollup resolution or None, cutoff) policy. Returns {table: rows}."""
+    deleted = {}
+    for table, resolution, cutoff in policies:
+        if resolution:
+            condition, params = "resolution = %s AND timestamp < %s", (resolution, cutoff)
+        else:
+            condition, params = "timestamp < %s", (cutoff,)
+        deleted[table] = deleted.get(table, 0) + delete_in_batches(table, condition, params)
+    return deleted
+
 def get_nodes():
     """Retrieve all nodes from MySQL."""
     query = "SELECT * FROM nodes"
@@ -127,128 +411,160 @@ def get_pods():
     query = "SELECT * FROM pods"
     return execute_query(query) or []
 
-def get_logs():
-    """Retrieve event logs from MySQL."""
-    query = "SELECT * FROM event_logs ORDER BY timestamp DESC LIMIT 50"
-    return execute_query(query) or []
+EVENT_FILTER_COLUMNS = ("type", "severity", "node_id", "pod_id")
+
+def get_logs(filters=None, since=None, before=None, limit=50):
+    """Retrieve event logs from MySQL, newest first, optionally filtered by column and time range."""
+    conditions, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in EVENT_FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter event logs by {column}")
+        conditions.append(f"{column} = %s")
+        params.append(value)
+    if since is not None:
+        conditions.append("timestamp >= %s")
+        params.append(since)
+    if before is not None:
+        conditions.append("timestamp < %s")
+        params.append(before)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT timestamp, type, severity, node_id, pod_id, event FROM event_logs{where} ORDER BY timestamp DESC LIMIT %s"
+    return execute_query(query, (*params, limit)) or []
 
 def get_utilization_history():
     """Retrieve utilization history from MySQL."""
     query = "SELECT * FROM utilization_history ORDER BY timestamp DESC LIMIT 50"
     return execute_query(query) or []
 
-def save_node(node):
-    """Save or update a node in MySQL."""
-    try:
-        # Check if node exists
-        check_query = "SELECT 1 FROM nodes WHERE node_id = %s"
-        result = execute_query(check_query, (node['node_id'],))
-        
-        if result:
-            # Update existing node
-            update_query = """
-            UPDATE nodes 
-            SET cpu_total = %s, cpu_available = %s, memory_total = %s, memory_available = %s,
-                node_type = %s, network_group = %s, last_heartbeat = %s, status = %s,
-                simulate_heartbeat = %s, container_id = %s
-            WHERE node_id = %s
-            """
-            params = (
-                node['cpu_total'], node['cpu_available'], node['memory_total'], node['memory_available'],
-                node['node_type'], node['network_group'], node.get('last_heartbeat'), node['status'],
-                node['simulate_heartbeat'], node.get('container_id'), node['node_id']
-            )
-            success = execute_query(update_query, params, fetch=False)
-        else:
-            # Insert new node
-            insert_query = """
-            INSERT INTO nodes (node_id, cpu_total, cpu_available, memory_total, memory_available,
-                            node_type, network_group, last_heartbeat, status, simulate_heartbeat, container_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            params = (
-                node['node_id'], node['cpu_total'], node['cpu_available'], node['memory_total'], node['memory_available'],
-                node['node_type'], node['network_group'], node.get('last_heartbeat'), node['status'],
-                node['simulate_heartbeat'], node.get('container_id')
-            )
-            success = execute_query(insert_query, params, fetch=False)
-        
-        print(f"[DEBUG-DB] {'Updated' if result else 'Inserted'} node {node['node_id']} with status={node['status']}")
-        return success
-    except Exception as e:
-        print(f"Error saving node: {e}")
-        return False
+def iter_pods():
+    """Stream every pod from MySQL, ordered by pod_id."""
+    query = ("SELECT pod_id, node_id, cpu, memory, network_group, node_affinity, scheduling_algorithm "
+             "FROM pods ORDER BY pod_id")
+    return iter_query(query)
 
-def delete_node(node_id):
-    """Delete a node and its associated pods from MySQL."""
-    try:
-        # Delete pods associated with this node
-        delete_pods_query = "DELETE FROM pods WHERE node_id = %s"
-        execute_query(delete_pods_query, (node_id,), fetch=False)
-        
-        # Delete the node
-        delete_node_query = "DELETE FROM nodes WHERE node_id = %s"
-        success = execute_query(delete_node_query, (node_id,), fetch=False)
-        
-        return success
-    except Exception as e:
-        print(f"Error deleting node: {e}")
-        return False
+def iter_nodes_with_pods(batch_size=1000):
+    """Stream every node joined with its pods (one row per pod, or one pod-less row), ordered by node_id."""
+    query = """
+    SELECT n.node_id, n.cpu_total, n.cpu_available, n.memory_total, n.memory_available,
+           n.node_type, n.network_group, n.last_heartbeat, n.status, n.simulate_heartbeat, n.container_id,
+           p.pod_id, p.cpu, p.memory, p.network_group AS pod_network_group, p.node_affinity,
+           p.scheduling_algorithm
+    FROM nodes n LEFT JOIN pods p ON p.node_id = n.node_id
+    ORDER BY n.node_id, p.pod_id
+    """
+    return iter_query(query, batch_size=batch_size)
 
-def save_pod(pod):
-    """Save or update a pod in MySQL."""
-    try:
-        # Check if pod exists
-        check_query = "SELECT 1 FROM pods WHERE pod_id = %s"
-        result = execute_query(check_query, (pod['pod_id'],))
+def iter_utilization_history(since=None, until=None):
+    """Stream utilization records from MySQL in time order, optionally bounded by timestamps."""
+    query = "SELECT timestamp, utilization FROM utilization_history WHERE timestamp >= %s AND timestamp <= %s ORDER BY timestamp"
+    return iter_query(query, (since or 0, until or time.time()))
+
+def save_node(node):
+    """Save or update a node in MySQL."""
+    with db_lock:
+        try:
+            # Check if node exists
+            check_query = "SELECT 1 FROM nodes WHERE node_id = %s"
+            result = execute_query(check_query, (node['node_id'],))
         
-        if result:
-            # Update existing pod
-            if 'node_affinity' in pod:
-                update_query = """
-                UPDATE pods 
-                SET node_id = %s, cpu = %s, memory = %s, network_group = %s, node_affinity = %s
-                WHERE pod_id = %s
-                """
-                params = (
-                    pod['node_id'], pod['cpu'], pod['memory'], pod['network_group'], 
-                    pod['node_affinity'], pod['pod_id']
-                )
-            else:
+            if result:
+                # Update existing node
                 update_query = """
-                UPDATE pods 
-                SET node_id = %s, cpu = %s, memory = %s, network_group = %s
-                WHERE pod_id = %s
-                """
-                params = (
-                    pod['node_id'], pod['cpu'], pod['memory'], pod['network_group'], pod['pod_id']
-                )
-            success = execute_query(update_query, params, fetch=False)
-        else:
-            # Insert new pod
-            if 'node_affinity' in pod:
-                insert_query = """
-                INSERT INTO pods (pod_id, node_id, cpu, memory, network_group, node_affinity)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                UPDATE nodes 
+                SET cpu_total = %s, cpu_available = %s, memory_total = %s, memory_available = %s,
+                    node_type = %s, network_group = %s, last_heartbeat = %s, status = %s,
+                    simulate_heartbeat = %s, container_id = %s
+                WHERE node_id = %s
                 """
                 params = (
-                    pod['pod_id'], pod['node_id'], pod['cpu'], pod['memory'], 
-                    pod['network_group'], pod['node_affinity']
+                    node['cpu_total'], node['cpu_available'], node['memory_total'], node['memory_available'],
+                    node['node_type'], node['network_group'], node.get('last_heartbeat'), node['status'],
+                    node['simulate_heartbeat'], node.get('container_id'), node['node_id']
                 )
+                success = execute_query(update_query, params, fetch=False)
             else:
+                # Insert new node
                 insert_query = """
-                INSERT INTO pods (pod_id, node_id, cpu, memory, network_group)
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO nodes (node_id, cpu_total, cpu_available, memory_total, memory_available,
+                                node_type, network_group, last_heartbeat, status, simulate_heartbeat, container_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 params = (
-                    pod['pod_id'], pod['node_id'], pod['cpu'], pod['memory'], pod['network_group']
+                    node['node_id'], node['cpu_total'], node['cpu_available'], node['memory_total'], node['memory_available'],
+                    node['node_type'], node['network_group'], node.get('last_heartbeat'), node['status'],
+                    node['simulate_heartbeat'], node.get('container_id')
                 )
-            success = execute_query(insert_query, params, fetch=False)
+                success = execute_query(insert_query, params, fetch=False)
         
-        return success
-    except Exception as e:
-        print(f"Error saving pod: {e}")
-        return False
+            print(f"[DEBUG-DB] {'Updated' if result else 'Inserted'} node {node['node_id']} with status={node['status']}")
+            return success
+        except Exception as e:
+            print(f"Error saving node: {e}")
+            return False
+
+UPSERT_NODES_QUERY = """
+INSERT INTO nodes (node_id, cpu_total, cpu_available, memory_total, memory_available,
+                node_type, network_group, last_heartbeat, status, simulate_heartbeat, container_id)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    cpu_total = VALUES(cpu_total), cpu_available = VALUES(cpu_available),
+    memory_total = VALUES(memory_total), memory_available = VALUES(memory_available),
+    node_type = VALUES(node_type), network_group = VALUES(network_group),
+    last_heartbeat = VALUES(last_heartbeat), status = VALUES(status),
+    simulate_heartbeat = VALUES(simulate_heartbeat), container_id = VALUES(container_id)
+"""
+
+def node_params(node):
+    return (
+        node['node_id'], node['cpu_total'], node['cpu_available'], node['memory_total'], node['memory_available'],
+        node['node_type'], node['network_group'], node.get('last_heartbeat'), node['status'],
+        node['simulate_heartbeat'], node.get('container_id')
+    )
+
+def save_nodes(nodes):
+    """Insert or update many nodes in one transaction."""
+    return execute_many(UPSERT_NODES_QUERY, [node_params(node) for node in nodes])
+
+def delete_node(node_id):
+    """Delete a node and its associated pods from MySQL."""
+    with db_lock:
+        try:
+            # Delete pods associated with this node
+            delete_pods_query = "DELETE FROM pods WHERE node_id = %s"
+            execute_query(delete_pods_query, (node_id,), fetch=False)
+        
+            # Delete the node
+            delete_node_query = "DELETE FROM nodes WHERE node_id = %s"
+            success = execute_query(delete_node_query, (node_id,), fetch=False)
+        
+            return success
+        except Exception as e:
+            print(f"Error deleting node: {e}")
+            return False
+
+def save_pod(pod):
+    """Save or update a pod in MySQL. An update without node_affinity or scheduling_algorithm keeps the stored one."""
+    with db_lock:
+        try:
+            # Check if pod exists
+            check_query = "SELECT 1 FROM pods WHERE pod_id = %s"
+            result = execute_query(check_query, (pod['pod_id'],))
+            optional = [c for c in ('node_affinity', 'scheduling_algorithm') if c in pod]
+        
+            if result:
+                # Update existing pod
+                columns = ['node_id', 'cpu', 'memory', 'network_group'] + optional
+                query = f"UPDATE pods SET {', '.join(f'{c} = %s' for c in columns)} WHERE pod_id = %s"
+                params = tuple(pod[c] for c in columns) + (pod['pod_id'],)
+            else:
+                # Insert new pod
+                columns = ['pod_id', 'node_id', 'cpu', 'memory', 'network_group'] + optional
+                query = f"INSERT INTO pods ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+                params = tuple(pod[c] for c in columns)
+            return execute_query(query, params, fetch=False)
+        except Exception as e:
+            print(f"Error saving pod: {e}")
+            return False
 
 def update_pod_node(pod_id, new_node_id):
     """Update the node assignment for a pod."""
@@ -260,6 +576,16 @@ def update_pod_node(pod_id, new_node_id):
         print(f"Error updating pod node: {e}")
         return False
 
+def save_reschedule(removed_node_ids, moves, nodes):
+    """Persist a bulk reschedule in one transaction: pod moves, removed nodes (and pods left on them), updated nodes."""
+    removed = [(node_id,) for node_id in removed_node_ids]
+    return execute_transaction([
+        ("UPDATE pods SET node_id = %s WHERE pod_id = %s", [(node_id, pod_id) for pod_id, node_id in moves]),
+        ("DELETE FROM pods WHERE node_id = %s", removed),
+        ("DELETE FROM nodes WHERE node_id = %s", removed),
+        (UPSERT_NODES_QUERY, [node_params(node) for node in nodes]),
+    ])
+
 def log_event(event):
     """Log an event to MySQL."""
     try:
@@ -270,6 +596,18 @@ def log_event(event):
         print(f"Error logging event: {e}")
         return False
 
+def save_events(events):
+    """Insert structured events in one batch."""
+    query = """
+    INSERT INTO event_logs (timestamp, type, severity, node_id, pod_id, event)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    params_list = [
+        (e['timestamp'], e['type'], e['severity'], e['node_id'], e['pod_id'], e['event'])
+        for e in events
+    ]
+    return execute_many(query, params_list)
+
 def record_utilization(utilization):
     """Record cluster utilization to MySQL."""
     try:
@@ -280,11 +618,42 @@ def record_utilization(utilization):
         print(f"Error recording utilization: {e}")
         return False
 
+def save_utilization_rollups(rollups):
+    """Insert closed utilization rollups in one batch."""
+    query = """
+    INSERT INTO utilization_rollups (resolution, scope, scope_id, timestamp,
+                                     cpu_min, cpu_max, cpu_avg, cpu_p95,
+                                     memory_min, memory_max, memory_avg, memory_p95, samples)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    params_list = [
+        (
+            r['resolution'], r['scope'], r['scope_id'], r['timestamp'],
+            r['cpu_min'], r['cpu_max'], r['cpu_avg'], r['cpu_p95'],
+            r['memory_min'], r['memory_max'], r['memory_avg'], r['memory_p95'], int(r['samples'])
+        )
+        for r in rollups
+    ]
+    return execute_many(query, params_list)
+
+def get_utilization_rollups(resolution, scope, scope_id, start, end):
+    """Retrieve persisted utilization rollups of one series with start <= timestamp < end."""
+    query = """
+    SELECT timestamp, cpu_min, cpu_max, cpu_avg, cpu_p95,
+           memory_min, memory_max, memory_avg, memory_p95, samples
+    FROM utilization_rollups
+    WHERE resolution = %s AND scope = %s AND scope_id = %s AND timestamp >= %s AND timestamp < %s
+    ORDER BY timestamp
+    """
+    return execute_query(query, (resolution, scope, scope_id, start, end)) or []
+
 def close_connection():
     """Close the MySQL connection."""
     global db_connection, db_cursor
-    if db_cursor:
-        db_cursor.close()
-    if db_connection and db_connection.is_connected():
-        db_connection.close()
-        print("MySQL connection closed")
\ No newline at end of file
+    with db_lock:
+        if db_cursor:
+            db_cursor.close()
+        if db_connection and db_connection.is_connected():
+            db_connection.close()
+            print("MySQL connection closed")
+        db_connection = db_cursor = None
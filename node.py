@@ -15,10 +15,35 @@ def send_heartbeat(server_url, node_id, heartbeat_interval):
             print(f"[{time.ctime()}] Exception during heartbeat: {e}")
         time.sleep(heartbeat_interval)
 
+def wait_for_assignment(server_url, standby_token, long_poll=20, retry_interval=2):
+    """Idle in the warm pool until the server binds this container to a node_id.
+
+    Each request long-polls: the server holds it for up to `long_poll` seconds
+    and answers as soon as the container is claimed.
+    """
+    url = f"{server_url}/api/warm_pool/assignment/{standby_token}"
+    print(f"[{time.ctime()}] Standing by as warm container {standby_token[:12]}")
+    while True:
+        try:
+            response = requests.get(url, params={"wait": long_poll}, timeout=long_poll + 10)
+            if response.status_code == 200:
+                node_id = response.json()["node_id"]
+                print(f"[{time.ctime()}] Claimed as node {node_id}")
+                return node_id
+            if response.status_code == 404:
+                continue  # long-poll expired unclaimed; ask again right away
+        except Exception as e:
+            print(f"[{time.ctime()}] Exception while waiting for assignment: {e}")
+        time.sleep(retry_interval)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Node simulator for Cluster Simulation Framework")
     parser.add_argument("--server", default="http://localhost:5000", help="API server base URL")
-    parser.add_argument("--node_id", required=True, help="Unique node_id assigned by the API server")
+    parser.add_argument("--node_id", help="Unique node_id assigned by the API server")
+    parser.add_argument("--standby_token", help="Start as a warm pool container and wait to be claimed")
     parser.add_argument("--interval", type=int, default=7, help="Heartbeat interval (seconds)")
     args = parser.parse_args()
-    send_heartbeat(args.server, args.node_id, args.interval)
+    if not args.node_id and not args.standby_token:
+        parser.error("one of --node_id or --standby_token is required")
+    node_id = args.node_id or wait_for_assignment(args.server, args.standby_token)
+    send_heartbeat(args.server, node_id, args.interval)
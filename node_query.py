@@ -0,0 +1,102 @@
+import bisect
+import json
+
+# Query support for /api/list_nodes, shared by every server mode.
+#
+#   status, network_group, node_type   exact-match filters
+#   min_cpu, min_memory                minimum cpu_available / memory_available
+#   fields=a,b,c                       return only these node fields (node_id always)
+#   include_pods=false                 omit the embedded pods
+#   limit, cursor                      page by node_id; pass back `next_cursor`
+#
+# Responses carry an ETag built from the cluster revision, so pollers sending
+# If-None-Match get an empty 304 until the cluster changes.
+MAX_PAGE_SIZE = 1000
+NODE_FILTERS = ("status", "network_group", "node_type")
+QUERY_ARGS = NODE_FILTERS + ("min_cpu", "min_memory", "fields", "include_pods", "limit", "cursor")
+
+class NodeIndex:
+    """The nodes of one snapshot sorted by node_id, for cursor pagination."""
+
+    def __init__(self, nodes):
+        self.nodes = sorted(nodes, key=lambda n: n["node_id"])
+        self.keys = [n["node_id"] for n in self.nodes]
+
+    def __contains__(self, node_id):
+        if not isinstance(node_id, str):
+            return False
+        i = bisect.bisect_left(self.keys, node_id)
+        return i < len(self.keys) and self.keys[i] == node_id
+
+def parse_query(args):
+    """Validate list_nodes query args into a query dict. Raises ValueError on bad input."""
+    query = {f: args[f] for f in NODE_FILTERS if args.get(f)}
+    for arg, field in (("min_cpu", "cpu_available"), ("min_memory", "memory_available")):
+        if args.get(arg):
+            query[field] = float(args[arg])
+    limit = int(args["limit"]) if args.get("limit") else None
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be positive")
+    query["limit"] = min(limit, MAX_PAGE_SIZE) if limit else None
+    query["cursor"] = args.get("cursor") or None
+    fields = args.get("fields")
+    query["fields"] = {"node_id", *fields.split(",")} if fields else None
+    query["include_pods"] = str(args.get("include_pods", "true")).lower() not in ("0", "false", "no")
+    return query
+
+def matches(node, query):
+    return (all(node[f] == query[f] for f in NODE_FILTERS if f in query)
+            and node["cpu_available"] >= query.get("cpu_available", float("-inf"))
+            and node["memory_available"] >= query.get("memory_available", float("-inf")))
+
+def project(node, query):
+    fields, include_pods = query["fields"], query["include_pods"]
+    if fields is None and include_pods:
+        return node
+    return {k: v for k, v in node.items()
+            if (fields is None or k in fields) and (include_pods or k != "pods")}
+
+def select_nodes(index, query):
+    """One page of matching, projected nodes and the cursor of the next page (None when done)."""
+    start = bisect.bisect_right(index.keys, query["cursor"]) if query["cursor"] else 0
+    limit = query["limit"]
+    page, next_cursor = [], None
+    for i in range(start, len(index.nodes)):
+        node = index.nodes[i]
+        if not matches(node, query):
+            continue
+        if limit is not None and len(page) == limit:
+            next_cursor = page[-1]["node_id"]
+            break
+        page.append(project(node, query))
+    return {"nodes": page, "next_cursor": next_cursor}
+
+def revision_etag(epoch, revision):
+    """ETag for a cluster revision; the epoch tells server restarts apart."""
+    return f'"{epoch}-{revision}"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+def list_nodes_response(epoch, revision, args, if_none_match, full_body, node_index):
+    """(body, status, headers) for /api/list_nodes.
+
+    `full_body` and `node_index` are callables returning the snapshot's cached
+    whole-cluster JSON and its NodeIndex, so plain requests reuse the cached body.
+    """
+    etag = revision_etag(epoch, revision)
+    headers = {"ETag": etag, "X-Cluster-Revision": str(revision)}
+    if etag_matches(if_none_match, etag):
+        return "", 304, headers
+    if not any(arg in args for arg in QUERY_ARGS):
+        return full_body(), 200, headers
+    try:
+        query = parse_query(args)
+    except ValueError as e:
+        return json.dumps({"error": f"Invalid query: {e}"}), 400, headers
+    payload = select_nodes(node_index(), query)
+    payload["revision"] = revision
+    return json.dumps(payload), 200, headers
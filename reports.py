@@ -0,0 +1,181 @@
+import csv
+import importlib.util
+import io
+
+from storage import iter_pods, iter_utilization_history
+
+# Report exports, streamed chunk by chunk so no report is ever held in memory
+# whole. The node report comes from a cluster snapshot (no locks held while it
+# is written); pod and utilization reports stream from storage (unbuffered
+# cursors on MySQL). Every report exports as CSV, and as Parquet or Arrow IPC when
+# pyarrow is installed; it is imported on the first columnar export, not at startup.
+#
+# A storage-backed report runs its query before the response starts, so a
+# database failure becomes an error status. Failures once streaming has begun
+# propagate and abort the transfer rather than ending it like a complete file.
+CHUNK_ROWS = 1000  # rows per CSV chunk / Arrow record batch
+
+FORMATS = {
+    # format -> (mimetype, file extension)
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+class ReportSourceError(Exception):
+    """The storage query behind a report could not be started."""
+
+class Report:
+    """A report type: typed columns plus a row source.
+
+    `rows(snapshot, args)` returns an iterator of tuples in column order and
+    raises ValueError for bad args. `csv_header` and `csv_row` override the
+    CSV layout when it differs from the columns.
+    """
+
+    def __init__(self, name, columns, rows, csv_header=None, csv_row=None):
+        self.name = name
+        self.columns = columns  # [(name, arrow type name)]
+        self.rows = rows
+        self.csv_header = csv_header or [c for c, _ in columns]
+        self.csv_row = csv_row or (lambda row: row)
+
+def node_rows(snapshot, args):
+    for n in snapshot.nodes:
+        yield (
+            n["node_id"], n["cpu_total"], n["cpu_available"], n["memory_total"], n["memory_available"],
+            n["status"], n["node_type"], n["network_group"],
+            ";".join(p["pod_id"] for p in n["pods"]) or "None"
+        )
+
+def node_csv_row(row):
+    node_id, cpu_total, cpu_available, memory_total, memory_available, status, node_type, group, pods = row
+    return [node_id, f"{cpu_total}/{cpu_available}", f"{memory_total}/{memory_available}",
+            status, node_type, group, pods]
+
+def pod_rows(snapshot, args):
+    pods = iter_pods()  # runs the query now, not on the first chunk
+    return ((p["pod_id"], p["node_id"], p["cpu"], p["memory"], p["network_group"], p["node_affinity"])
+            for p in pods)
+
+def utilization_rows(snapshot, args):
+    # Parsed before streaming starts so bad bounds fail the request, not the download
+    since = float(args["since"]) if args.get("since") else None
+    until = float(args["until"]) if args.get("until") else None
+    records = iter_utilization_history(since, until)
+    return ((r["timestamp"], r["utilization"]) for r in records)
+
+REPORTS = {
+    "nodes": Report(
+        "nodes",
+        [("node_id", "string"), ("cpu_total", "int64"), ("cpu_available", "int64"),
+         ("memory_total", "int64"), ("memory_available", "int64"), ("status", "string"),
+         ("node_type", "string"), ("network_group", "string"), ("pods", "string")],
+        node_rows,
+        csv_header=["Node", "CPU tot/avail", "Mem tot/avail", "Status", "Type", "Group", "Pods"],
+        csv_row=node_csv_row,
+    ),
+    "pods": Report(
+        "pods",
+        [("pod_id", "string"), ("node_id", "string"), ("cpu", "int64"), ("memory", "int64"),
+         ("network_group", "string"), ("node_affinity", "string")],
+        pod_rows,
+    ),
+    "utilization": Report(
+        "utilization",
+        [("timestamp", "float64"), ("utilization", "float64")],
+        utilization_rows,
+    ),
+}
+
+def chunked(rows, size=CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def stream_csv(report, rows):
+    out = io.StringIO()
+    w = csv.writer(out)
+    w.writerow(report.csv_header)
+    for chunk in chunked(rows):
+        w.writerows(report.csv_row(row) for row in chunk)
+        yield out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands whatever pyarrow wrote to the streaming generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def stream_columnar(report, rows, fmt):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in report.columns])
+    sink = ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_table
+        to_batch = lambda columns: pa.Table.from_pydict(columns, schema=schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+        to_batch = lambda columns: pa.RecordBatch.from_pydict(columns, schema=schema)
+    for chunk in chunked(rows):
+        write(to_batch({name: list(col) for name, col in zip(schema.names, zip(*chunk))}))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+def export_report(snapshot, args):
+    """Validate a download_report request.
+
+    Returns (chunk iterator, mimetype, filename), or raises ValueError for an
+    unknown report type or format, RuntimeError when pyarrow is missing and
+    ReportSourceError when the storage query fails.
+    """
+    report = REPORTS.get(args.get("type", "nodes"))
+    if report is None:
+        raise ValueError(f"Unknown report type; expected one of {', '.join(REPORTS)}")
+    fmt = args.get("format", "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format; expected one of {', '.join(FORMATS)}")
+    if fmt != "csv" and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError(f"{fmt} export requires pyarrow")
+    mimetype, extension = FORMATS[fmt]
+    try:
+        rows = report.rows(snapshot, args)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ReportSourceError(f"Could not read the {report.name} report from storage: {e}") from e
+    chunks = stream_csv(report, rows) if fmt == "csv" else stream_columnar(report, rows, fmt)
+    filename = "cluster_report.csv" if report.name == "nodes" and fmt == "csv" else f"{report.name}_report.{extension}"
+    return chunks, mimetype, filename
@@ -1,52 +1,133 @@
 import time
+IMPORT_STARTED = time.perf_counter()  # start of the "imports" startup phase
+import argparse
 import uuid
 import random
-import csv
-import io
 import os
-from flask import Flask, request, jsonify, render_template, send_file, send_from_directory
-from flask_socketio import SocketIO, emit
+import json
+from collections import deque
+from itertools import count, islice
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
+from flask_socketio import SocketIO, join_room, leave_room
 from flask_cors import CORS
-from threading import Thread, RLock
-from mysql_db import (
-    init_mysql_tables, connect_to_mysql, close_connection,
-    get_nodes, get_pods, get_logs, get_utilization_history, 
-    save_node, delete_node, save_pod, update_pod_node, 
-    log_event, record_utilization
+from contextlib import contextmanager
+from threading import Thread, RLock, Event
+from storage import (
+    init_storage, connect_storage, close_storage, flush_storage,
+    load_journaled_state, snapshot_state, node_row,
+    iter_nodes_with_pods, get_logs, get_utilization_history, prune_expired_rows,
+    save_node, save_nodes, save_pod, save_reschedule,
+    save_events, record_utilization, save_utilization_rollups, get_utilization_rollups
 )
 
 # ---- Docker SDK & Network-Policy Setup ----
-import docker
-from docker.errors import NotFound, DockerException
+from docker_manager import (
+    disable_docker, docker_status, on_container_event, run_node_container_async, stop_container_async,
+    start_warm_pool, claim_warm_container, get_warm_assignment, forget_warm_assignment, warm_pool_status,
+    list_sim_containers, warm_container_ids
+)
+from state_codec import FORMATS, negotiate_format, encode_state
+from node_query import NodeIndex, list_nodes_response
+from reports import ReportSourceError, export_report
+from failure_detector import PhiAccrualDetector
+from timeseries import RAW, UtilizationStore, utilization_samples, pick_resolution
 
-DOCKER_NODE_IMAGE = "node-simulator:latest"
 NODE_HEARTBEAT_INTERVAL = 7  # seconds
-try:
-    docker_client = docker.from_env()
-except DockerException:
-    docker_client = None
-    print("⚠️ Docker not available—containers will NOT be launched.")
-print("🔍 Docker client:", "OK" if docker_client else "NOT AVAILABLE")
-
-def ensure_network(group):
-    """Create or fetch a Docker bridge network named net_<group>."""
-    if not docker_client:
-        return None
-    net_name = f"net_{group}"
-    try:
-        return docker_client.networks.get(net_name)
-    except NotFound:
-        return docker_client.networks.create(net_name, driver="bridge")
+WARM_ASSIGNMENT_MAX_WAIT = 25  # seconds a standby container's long-poll may hang
 
 # ----------------------------------
 # Global Data & Locks
 # ----------------------------------
-nodes = {}  # In-memory cache of nodes
-event_log = []  # In-memory cache of recent events
+# Node state is sharded by network_group: scheduling never crosses groups, so
+# heartbeats, health checks and placements in different groups run in parallel.
+#
+# Lock ordering (acquire top to bottom, never the reverse):
+#   0. snapshot_lock  - serializes publish_snapshot(); never call it while
+#                       holding any of the locks below
+#   1. topology_lock  - membership of `nodes` and `shards` (adding/removing nodes)
+#   2. shard.lock     - fields and pods of the nodes in one network_group; when
+#                       several are needed, take them through locked_shards(),
+#                       which acquires them sorted by group name
+#   3. event_log_lock, utilization_lock, pod_id_lock, state_clients_lock,
+#      utilization_store.lock, chaos_lock - leaf locks, nothing else is
+#                       acquired while holding them (chaos_lock is reentrant,
+#                       so partition_of() may run under it)
+class NodeShard:
+    """The nodes of one network_group and the lock guarding them."""
+
+    def __init__(self, group):
+        self.group = group
+        self.lock = RLock()
+        self.nodes = {}  # node_id -> node
+        self.dirty = True  # nodes changed since `view` was built
+        self.view = ()  # immutable copy of the nodes, rebuilt on publish when dirty
+        self.detector = PhiAccrualDetector(PHI_WINDOW, NODE_HEARTBEAT_INTERVAL,
+                                           PHI_MIN_STD_DEVIATION, PHI_ACCEPTABLE_PAUSE)
+
+class ClusterSnapshot:
+    """Immutable, revisioned copy of every node. Readers use it without taking any lock."""
+
+    def __init__(self, revision, nodes):
+        self.revision = revision
+        self.nodes = nodes  # tuple of node dicts; treat as read-only
+        self.created = time.time()
+        self._json = None
+        self._index = None
+
+    def nodes_json(self):
+        """The {"nodes": [...]} body, encoded once per revision and shared by all readers."""
+        if self._json is None:
+            self._json = json.dumps({"nodes": self.nodes})
+        return self._json
+
+    def node_index(self):
+        """The nodes sorted by node_id for paged queries, built once per revision."""
+        if self._index is None:
+            self._index = NodeIndex(self.nodes)
+        return self._index
+
+    def prepared(self):
+        """True once the JSON body and the node index are built, so serving from it is cheap."""
+        return self._json is not None and self._index is not None
+
+    def prepare(self):
+        """Build the JSON body and the node index now, e.g. off the asyncio event loop."""
+        self.nodes_json()
+        self.node_index()
+        return self
+
+nodes = {}  # In-memory cache of nodes (node_id -> node index across all shards)
+shards = {}  # network_group -> NodeShard
+EVENT_LOG_SIZE = 1000  # structured events kept in memory
+EVENT_FLUSH_INTERVAL = 1  # seconds between batched event writes
+EVENT_QUERY_MAX_LIMIT = 1000
+EVENT_FILTERS = ("type", "severity", "node_id", "pod_id")
+
+event_log = deque(maxlen=EVENT_LOG_SIZE)  # recent structured events, oldest first
+pending_events = []  # logged but not yet written to storage
+event_log_seq = 0  # events logged since startup; changes whenever event_log does
 utilization_history = []  # In-memory cache of utilization history
-nodes_lock = RLock()
+utilization_store = UtilizationStore()  # per-node/group/cluster series with rollups
+snapshot = ClusterSnapshot(0, ())  # latest published snapshot
+snapshot_lock = RLock()
+snapshot_listeners = []  # called with each newly published snapshot, in revision order
+topology_lock = RLock()
+event_log_lock = RLock()
+utilization_lock = RLock()
 pod_id_lock = RLock()
 pod_id_counter = 0
+chaos_incidents = deque(maxlen=50)  # recent chaos runs with their recovery timings, oldest first
+chaos_incident_ids = count(1)
+active_partitions = {}  # network_group -> incident of the partition dropping its heartbeats
+chaos_lock = RLock()  # guards chaos_incidents, active_partitions and incident fields
+load_stats = {}  # source, counts and timings of the last load_cluster_state
+startup_metrics = {}  # startup phase -> seconds, in the order the phases ran
+BOOT_ID = uuid.uuid4().hex[:8]  # distinguishes revisions (and ETags) across restarts
+state_clients = {}  # Socket.IO sid -> (state format, subscription scope)
+lagging_clients = set()  # sids that missed a state frame while their transport was backed up
+state_clients_lock = RLock()
+broadcast_wakeup = Event()  # set when anything a state_update carries has changed
+last_broadcast = {"time": 0, "key": None}  # touched only by the broadcaster
 
 DEFAULT_NODE_CPU = 8
 DEFAULT_NODE_MEMORY = 16
@@ -55,14 +136,43 @@ DEFAULT_POD_MEMORY = 4
 AUTO_SCALE_THRESHOLD = 0.8
 last_auto_scale_time = 0
 AUTO_SCALE_COOLDOWN = 60
-HEARTBEAT_THRESHOLD = 15
+# Phi-accrual failure detection (failure_detector.py): a node whose heartbeat is
+# overdue becomes "suspect" (no new pods, nothing moved) and only fails, with
+# its pods rescheduled and a replacement auto-scaled, at the higher threshold.
+PHI_SUSPECT_THRESHOLD = float(os.environ.get("PHI_SUSPECT_THRESHOLD", 5))
+PHI_FAIL_THRESHOLD = float(os.environ.get("PHI_FAIL_THRESHOLD", 12))
+PHI_WINDOW = int(os.environ.get("PHI_WINDOW", 100))  # heartbeat intervals kept per node
+PHI_MIN_STD_DEVIATION = float(os.environ.get("PHI_MIN_STD_DEVIATION", 1.0))  # seconds
+PHI_ACCEPTABLE_PAUSE = float(os.environ.get("PHI_ACCEPTABLE_PAUSE", 3.0))  # seconds of extra silence tolerated
 HEALTH_CHECK_INTERVAL = 5
+AUTO_SCALE_CHECK_INTERVAL = 20
+UTILIZATION_RECORD_INTERVAL = 10
+BROADCAST_INTERVAL = 3  # idle check: publish pending heartbeats, catch up lagging clients
+BROADCAST_MIN_INTERVAL = float(os.environ.get("BROADCAST_MIN_INTERVAL", 0.5))  # coalescing window
+MAX_CLIENT_BACKLOG = int(os.environ.get("MAX_CLIENT_BACKLOG", 8))  # queued packets before frames are dropped
+RECONCILE_INTERVAL = 30
+RETENTION_INTERVAL = 3600  # seconds between pruning passes over event and utilization history
+LOAD_PROGRESS_EVERY = 10000  # nodes between startup load progress lines
+STATE_SNAPSHOT_INTERVAL = float(os.environ.get("STATE_SNAPSHOT_INTERVAL", 60))  # seconds between local snapshots
 
 SCHEDULING_ALGORITHMS = ['first_fit', 'best_fit', 'worst_fit']
 
 app = Flask(__name__, static_folder="./static")
 CORS(app)  # Enable CORS for all routes
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+event_emitter = socketio.emit  # replaced by the asyncio server mode
+
+def emit_event(event, data, to=None, skip_sid=None):
+    """Broadcast a Socket.IO event (or send it to one sid/room) through whichever server is running."""
+    event_emitter(event, data, to=to, skip_sid=skip_sid)
+
+def transport_backlog(server, sid):
+    """Packets queued for a client that its transport has not written out yet."""
+    eio_sid = server.manager.eio_sid_from_sid(sid, "/")
+    sock = server.eio.sockets.get(eio_sid) if eio_sid else None
+    return sock.queue.qsize() if sock else 0
+
+client_backlog = lambda sid: transport_backlog(socketio.server, sid)  # replaced by the asyncio server mode
 
 # ----------------------------------
 # Utility Functions
@@ -70,62 +180,205 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
 def get_current_timestamp():
     return time.time()
 
-def log_event_func(event):
-    ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(get_current_timestamp()))
-    entry = f"[{ts}] {event}"
-    with nodes_lock:
+def log_event_func(event, event_type="info", severity="info", node_id=None, pod_id=None):
+    """Record a structured event. It is persisted by the next flush_events_tick."""
+    entry = {
+        "timestamp": get_current_timestamp(), "type": event_type, "severity": severity,
+        "node_id": node_id, "pod_id": pod_id, "event": event
+    }
+    global event_log_seq
+    with event_log_lock:
         event_log.append(entry)
-        if len(event_log) > 50:
-            event_log.pop(0)
-    # Log to Supabase
-    log_event(event)
+        pending_events.append(entry)
+        event_log_seq += 1
+    request_broadcast()
 
-def load_cluster_state():
-    """Load cluster state from Supabase."""
-    global nodes, pod_id_counter
+def log_events(events):
+    """Record many (event, type, severity, node_id, pod_id) tuples under one lock acquisition."""
+    if not events:
+        return
+    global event_log_seq
+    now = get_current_timestamp()
+    entries = [{"timestamp": now, "type": event_type, "severity": severity,
+                "node_id": node_id, "pod_id": pod_id, "event": event}
+               for event, event_type, severity, node_id, pod_id in events]
+    with event_log_lock:
+        event_log.extend(entries)
+        pending_events.extend(entries)
+        event_log_seq += len(entries)
+    request_broadcast()
 
-    # Get nodes from Supabase
-    supabase_nodes = get_nodes()
+def format_event(entry):
+    ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["timestamp"]))
+    return f"[{ts}] {entry['event']}"
 
-    # Get pods from Supabase
-    supabase_pods = get_pods()
+def recent_logs(count=50):
+    """The newest events as dashboard log lines, oldest first."""
+    with event_log_lock:
+        tail = list(islice(reversed(event_log), count))
+    return [format_event(entry) for entry in reversed(tail)]
 
-    # Process nodes
-    with nodes_lock:
-        nodes.clear()
-        for node_data in supabase_nodes:
-            node_id = node_data["node_id"]
-            nodes[node_id] = {
-                "node_id": node_id,
-                "cpu_total": node_data["cpu_total"],
-                "cpu_available": node_data["cpu_available"],
-                "memory_total": node_data["memory_total"],
-                "memory_available": node_data["memory_available"],
-                "node_type": node_data["node_type"],
-                "network_group": node_data["network_group"],
-                "last_heartbeat": node_data["last_heartbeat"],
-                "status": node_data["status"],
-                "simulate_heartbeat": bool(node_data["simulate_heartbeat"]),
-                "pods": [],
-                "container_id": node_data.get("container_id")
-            }
+def flush_events_tick():
+    """Write events logged since the last flush in one batch, then commit buffered storage writes."""
+    global pending_events
+    with event_log_lock:
+        batch, pending_events = pending_events, []
+    if batch and not save_events(batch):
+        # Keep them for the next flush, but never more than the in-memory log holds
+        with event_log_lock:
+            pending_events = (batch + pending_events)[-EVENT_LOG_SIZE:]
+    flush_storage()
 
-        # Process pods
-        max_pod_id = 0
-        for pod_data in supabase_pods:
-            pod_id = pod_data["pod_id"]
-            node_id = pod_data["node_id"]
+# ----------------------------------
+# Shard Access
+# ----------------------------------
+def get_shard(group, create=False):
+    """Return the shard for a network_group, optionally creating it."""
+    shard = shards.get(group)
+    if shard is None and create:
+        with topology_lock:
+            shard = shards.setdefault(group, NodeShard(group))
+    return shard
+
+def iter_shards():
+    """Stable list of the current shards."""
+    with topology_lock:
+        return list(shards.values())
+
+@contextmanager
+def locked_node(nid):
+    """Hold the lock of the shard owning a node and yield the node (None if unknown)."""
+    n = nodes.get(nid)
+    shard = shards.get(n["network_group"]) if n else None
+    if shard is None:
+        yield None
+        return
+    with shard.lock:
+        # The node may have been removed while we waited for the lock
+        yield shard.nodes.get(nid)
+
+@contextmanager
+def locked_shards():
+    """Hold every shard lock, acquired in group-name order, for a consistent cluster view."""
+    held = sorted(iter_shards(), key=lambda sh: sh.group)
+    for shard in held:
+        shard.lock.acquire()
+    try:
+        yield held
+    finally:
+        for shard in reversed(held):
+            shard.lock.release()
 
-            # Extract numeric part of pod_id to update pod_id_counter
-            if pod_id.startswith("pod_"):
-                try:
-                    pod_num = int(pod_id.split("_")[1])
-                    max_pod_id = max(max_pod_id, pod_num)
-                except:
-                    pass
+def add_node_to_cluster(node):
+    with topology_lock:
+        shard = get_shard(node["network_group"], create=True)
+        with shard.lock:
+            shard.nodes[node["node_id"]] = node
+            nodes[node["node_id"]] = node
+            shard.dirty = True
 
+def remove_node_from_cluster(nid):
+    """Detach a node from its shard and the index. Returns the node or None."""
+    with topology_lock:
+        n = nodes.get(nid)
+        if n is None:
+            return None
+        shard = shards[n["network_group"]]
+        with shard.lock:
+            shard.nodes.pop(nid, None)
+            shard.detector.reset(nid)
+            shard.dirty = True
+            removed = nodes.pop(nid, None)
+    forget_warm_assignment(nid)
+    return removed
+
+def mark_dirty(node):
+    """Flag a node's shard for the next snapshot. Call with that shard's lock held."""
+    shard = shards.get(node["network_group"])
+    if shard is not None:
+        shard.dirty = True
+
+def publish_snapshot():
+    """Publish a new snapshot if any shard changed. Writers call this after each batch of mutations."""
+    global snapshot
+    with snapshot_lock:
+        views, changed = [], False
+        for shard in iter_shards():
+            with shard.lock:
+                if shard.dirty:
+                    # Copy-on-write: only shards touched since the last publish are re-copied
+                    shard.view = tuple(
+                        dict(n, pods=tuple(dict(p) for p in n["pods"])) for n in shard.nodes.values()
+                    )
+                    shard.dirty = False
+                    changed = True
+                views.append(shard.view)
+        if changed:
+            snapshot = ClusterSnapshot(snapshot.revision + 1, tuple(n for view in views for n in view))
+            for listener in snapshot_listeners:
+                listener(snapshot)
+            request_broadcast()
+        return snapshot
+
+def count_nodes():
+    """Return (total, active, suspect) node counts."""
+    total = active = suspect = 0
+    for shard in iter_shards():
+        with shard.lock:
+            total += len(shard.nodes)
+            active += sum(1 for n in shard.nodes.values() if n["status"] == "active")
+            suspect += sum(1 for n in shard.nodes.values() if n["status"] == "suspect")
+    return total, active, suspect
+
+def pod_number(pod_id):
+    """Numeric part of a generated pod_N id (0 for any other id)."""
+    if pod_id.startswith("pod_"):
+        try:
+            return int(pod_id.split("_")[1])
+        except ValueError:
+            pass
+    return 0
+
+def load_cluster_state():
+    """Load cluster state from the local snapshot and journal, or stream it from storage when there is none.
+
+    Nodes arrive with their pods in node_id order and are built one at a time,
+    so the rows are never held in memory alongside the cluster.
+    """
+    global nodes, pod_id_counter
+    started = time.time()
+
+    journaled = load_journaled_state()
+    if journaled is not None:
+        stream, meta, tail_pod_ids = journaled
+        # The snapshot records the counter; only pods saved after it need parsing
+        max_pod_id = max([meta.get("pod_id_counter", 0)] + [pod_number(p) for p in tail_pod_ids])
+        source = f"snapshot + {len(tail_pod_ids)} journaled pods"
+    else:
+        stream, max_pod_id, source = iter_nodes_with_pods(), 0, "storage"
+
+    loaded, pod_count, first_row = {}, 0, None
+    for node_data, pod_rows in stream:
+        if first_row is None:
+            first_row = time.time()
+        node = {
+            "node_id": node_data["node_id"],
+            "cpu_total": node_data["cpu_total"],
+            "cpu_available": node_data["cpu_available"],
+            "memory_total": node_data["memory_total"],
+            "memory_available": node_data["memory_available"],
+            "node_type": node_data["node_type"],
+            "network_group": node_data["network_group"],
+            "last_heartbeat": node_data["last_heartbeat"],
+            "status": node_data["status"],
+            "simulate_heartbeat": bool(node_data["simulate_heartbeat"]),
+            "pods": [],
+            "container_id": node_data.get("container_id"),
+            "container_state": "unknown" if node_data.get("container_id") else None
+        }
+        for pod_data in pod_rows:
             pod = {
-                "pod_id": pod_id,
+                "pod_id": pod_data["pod_id"],
                 "cpu": pod_data["cpu"],
                 "memory": pod_data["memory"],
                 "network_group": pod_data["network_group"],
@@ -133,170 +386,448 @@ def load_cluster_state():
             }
             if pod_data.get("node_affinity"):
                 pod["node_affinity"] = pod_data["node_affinity"]
+            if pod_data.get("scheduling_algorithm"):
+                pod["scheduling_algorithm"] = pod_data["scheduling_algorithm"]
+            node["pods"].append(pod)
+            if journaled is None:
+                max_pod_id = max(max_pod_id, pod_number(pod["pod_id"]))
+        loaded[node["node_id"]] = node
+        pod_count += len(pod_rows)
+        if len(loaded) % LOAD_PROGRESS_EVERY == 0:
+            elapsed = time.time() - started
+            print(f"⏳ Loading cluster: {len(loaded)} nodes, {pod_count} pods ({len(loaded) / elapsed:.0f} nodes/s)")
+    built = time.time()
 
-            if node_id in nodes:
-                nodes[node_id]["pods"].append(pod)
+    with topology_lock:
+        nodes.clear()
+        shards.clear()
+        for node in loaded.values():
+            add_node_to_cluster(node)
+    publish_snapshot()
 
-        # Update pod_id_counter
+    # Update pod_id_counter
+    with pod_id_lock:
         pod_id_counter = max_pod_id
 
+    finished = time.time()
+    load_stats.update({
+        "source": source, "nodes": len(loaded), "pods": pod_count,
+        "first_row_seconds": round((first_row or built) - started, 4),
+        "build_seconds": round(built - started, 4),
+        "publish_seconds": round(finished - built, 4),
+        "total_seconds": round(finished - started, 4),
+    })
+    print(f"📦 Loaded {len(loaded)} nodes and {pod_count} pods from {source} in {finished - started:.2f}s "
+          f"(first row {load_stats['first_row_seconds']:.2f}s, publish {load_stats['publish_seconds']:.2f}s)")
+
+def capture_persisted_state():
+    """Node and pod rows of the current cluster, as storage holds them, for a local snapshot."""
+    snap = publish_snapshot()
+    node_rows = [node_row(n) for n in snap.nodes]
+    pod_rows = [
+        {"pod_id": p["pod_id"], "node_id": n["node_id"], "cpu": p["cpu"], "memory": p["memory"],
+         "network_group": p["network_group"], "node_affinity": p.get("node_affinity"),
+         "scheduling_algorithm": p.get("scheduling_algorithm")}
+        for n in snap.nodes for p in n["pods"]
+    ]
+    # Read after the capture so it covers every pod in it
+    with pod_id_lock:
+        counter = pod_id_counter
+    return node_rows, pod_rows, {"pod_id_counter": counter, "taken_at": time.time()}
+
+def snapshot_tick():
+    if snapshot_state(capture_persisted_state):
+        print("💾 Wrote cluster state snapshot")
+
+def build_initial_state():
+    """Full state sent to a dashboard when it connects."""
+    return {
+        "nodes": snapshot.nodes,
+        "logs": recent_logs(),
+        "history": [{"timestamp": record["timestamp"], "utilization": record["utilization"]}
+                    for record in get_utilization_history()]
+    }
+
+# ----------------------------------
+# State Streaming
+# ----------------------------------
+# Each client negotiates a state format on connect (see state_codec) and
+# subscribes to a scope: the whole cluster, one network_group, node_type or
+# node, or logs only. A client sits in one room per (format, scope); every
+# broadcast slices the state once per scope and encodes it once per room.
+SUBSCRIPTION_FIELDS = ("network_group", "node_type", "node_id")
+
+def subscription_scope(data):
+    """Scope for subscription args: "all", "logs", or "<field>=<value>"."""
+    if str(data.get("logs_only", "")).lower() in ("1", "true"):
+        return "logs"
+    for field in SUBSCRIPTION_FIELDS:
+        if data.get(field):
+            return f"{field}={data[field]}"
+    return "all"
+
+def state_room(fmt, scope):
+    return f"state:{fmt}:{scope}"
+
+def state_slice(state, scope):
+    """The part of a state a scope's subscribers receive."""
+    if scope == "all":
+        return state
+    if scope == "logs":
+        return dict(state, nodes=())
+    field, value = scope.split("=", 1)
+    return dict(state, nodes=tuple(n for n in state["nodes"] if n[field] == value))
+
+def register_state_client(sid, args):
+    """Record a connecting client's format and initial subscription. Returns (format, scope)."""
+    client = (negotiate_format(args.get("encoding"), args.get("compression")), subscription_scope(args))
+    with state_clients_lock:
+        state_clients[sid] = client
+    return client
+
+def subscribe_state_client(sid, data):
+    """Move a client to a new scope. Returns (old room, new room, format, scope), or None if unknown."""
+    scope = subscription_scope(data or {})
+    with state_clients_lock:
+        if sid not in state_clients:
+            return None
+        fmt, old_scope = state_clients[sid]
+        state_clients[sid] = (fmt, scope)
+    return state_room(fmt, old_scope), state_room(fmt, scope), fmt, scope
+
+def unregister_state_client(sid):
+    with state_clients_lock:
+        state_clients.pop(sid, None)
+        lagging_clients.discard(sid)
+
+def emit_state(state, client=None, to=None):
+    """Send a state_update to one (format, scope) client, or to every room in use.
+
+    Clients whose transport still holds more than MAX_CLIENT_BACKLOG packets are
+    skipped rather than queued further; they are marked lagging and get the
+    latest state once they have drained (see catch_up_lagging_clients).
+    """
+    if client is not None:
+        fmt, scope = client
+        emit_event("state_update", encode_state(state_slice(state, scope), fmt), to=to)
+        return
+    with state_clients_lock:
+        clients = dict(state_clients)
+    backed_up = {sid for sid in clients if client_backlog(sid) > MAX_CLIENT_BACKLOG}
+    rooms = {}
+    for sid, client in clients.items():
+        rooms.setdefault(client, []).append(sid)
+    for scope in {scope for _, scope in rooms}:
+        sliced = state_slice(state, scope)
+        for fmt in FORMATS:
+            members = rooms.get((fmt, scope))
+            skip = [sid for sid in members or () if sid in backed_up]
+            if members and len(skip) < len(members):
+                emit_event("state_update", encode_state(sliced, fmt), to=state_room(fmt, scope),
+                           skip_sid=skip or None)
+    with state_clients_lock:
+        lagging_clients.difference_update(clients)
+        lagging_clients.update(sid for sid in backed_up if sid in state_clients)
+    if backed_up:
+        print(f"⏳ Dropped state frame for {len(backed_up)} backed-up client(s)")
+
+def catch_up_lagging_clients(state):
+    """Send the latest state to lagging clients whose transport has drained."""
+    with state_clients_lock:
+        drained = [(sid, state_clients[sid]) for sid in lagging_clients
+                   if sid in state_clients and client_backlog(sid) <= MAX_CLIENT_BACKLOG]
+        lagging_clients.difference_update(sid for sid, _ in drained)
+    for sid, client in drained:
+        emit_state(state, client, to=sid)
+
 @socketio.on('connect')
 def on_connect():
-    with nodes_lock:
-        state = {
-            "nodes": list(nodes.values()),
-            "logs": event_log[-50:],
-            "history": [{"timestamp": record["timestamp"], "utilization": record["utilization"]}
-                        for record in get_utilization_history()]
-        }
-    emit('state_update', state)
+    client = register_state_client(request.sid, request.args)
+    join_room(state_room(*client))
+    emit_state(build_initial_state(), client, to=request.sid)
 
-def record_utilization_thread():
-    while True:
-        time.sleep(10)
-        util = get_cluster_utilization() * 100
-        ts = get_current_timestamp()
-        with nodes_lock:
-            utilization_history.append((ts, util))
-            if len(utilization_history) > 50:
-                utilization_history.pop(0)
-        # Save to Supabase
-        record_utilization(util)
+@socketio.on('subscribe')
+def on_subscribe(data):
+    moved = subscribe_state_client(request.sid, data)
+    if moved is None:
+        return {"error": "Unknown client"}
+    old_room, new_room, fmt, scope = moved
+    leave_room(old_room)
+    join_room(new_room)
+    emit_state(build_initial_state(), (fmt, scope), to=request.sid)
+    return {"scope": scope}
 
-def get_cluster_utilization():
-    with nodes_lock:
-        active_nodes = [n for n in nodes.values() if n["status"] == "active"]
-        if not active_nodes:
-            return 1.0  # Trigger auto-scaling when no active nodes
+@socketio.on('disconnect')
+def on_disconnect(reason=None):
+    unregister_state_client(request.sid)
+
+def record_utilization_tick():
+    util = get_cluster_utilization() * 100
+    ts = get_current_timestamp()
+    with utilization_lock:
+        utilization_history.append((ts, util))
+        if len(utilization_history) > 50:
+            utilization_history.pop(0)
+    request_broadcast()
+    # Save to Supabase
+    record_utilization(util)
+    # Detailed series; minute/hour rollups closed by this sample are persisted in one batch
+    rollups = utilization_store.record(ts, utilization_samples(publish_snapshot().nodes))
+    if rollups:
+        save_utilization_rollups(rollups)
 
-        total_cpu = sum(n["cpu_total"] for n in active_nodes)
-        used_cpu = sum(n["cpu_total"] - n["cpu_available"] for n in active_nodes)
+def get_cluster_utilization():
+    # Suspect nodes still run their pods, so they count until they fail
+    total_cpu = used_cpu = live_count = 0
+    for shard in iter_shards():
+        with shard.lock:
+            live_nodes = [n for n in shard.nodes.values() if n["status"] != "failed"]
+            live_count += len(live_nodes)
+            total_cpu += sum(n["cpu_total"] for n in live_nodes)
+            used_cpu += sum(n["cpu_total"] - n["cpu_available"] for n in live_nodes)
+    if not live_count:
+        return 1.0  # Trigger auto-scaling when no live nodes
 
-        return used_cpu / total_cpu if total_cpu > 0 else 0
+    return used_cpu / total_cpu if total_cpu > 0 else 0
 
 # ----------------------------------
 # Scheduling & Pod Persistence
 # ----------------------------------
+def pick_node(candidates, pod, algo):
+    """The node `algo` places `pod` on among `candidates`, or None if none fits."""
+    affinity = pod.get("node_affinity")
+    eligible = (
+        n for n in candidates
+        if n["status"] == "active"
+           and n["cpu_available"] >= pod["cpu"]
+           and n["memory_available"] >= pod["memory"]
+           and (not affinity or n["node_type"] == affinity)
+    )
+    if algo == "first_fit":
+        return next(eligible, None)
+    if algo == "best_fit":
+        return min(eligible, key=lambda n: (n["cpu_available"] - pod["cpu"]) + (n["memory_available"] - pod["memory"]),
+                   default=None)
+    # worst_fit
+    return max(eligible, key=lambda n: n["cpu_available"] + n["memory_available"], default=None)
+
+def assign_pod(node, pod):
+    """Put a pod on a node. Call with the node's shard lock held."""
+    node["pods"].append(pod)
+    node["cpu_available"] -= pod["cpu"]
+    node["memory_available"] -= pod["memory"]
+    mark_dirty(node)
+
 def schedule_pod(pod, algo):
-    with nodes_lock:
-        eligible = [
-            n for n in nodes.values()
-            if n["status"] == "active"
-               and n["cpu_available"] >= pod["cpu"]
-               and n["memory_available"] >= pod["memory"]
-               and n["network_group"] == pod["network_group"]
-        ]
-        if "node_affinity" in pod:
-            eligible = [n for n in eligible if n["node_type"] == pod["node_affinity"]]
-        if not eligible:
+    # Pods only land in their own network_group, so one shard lock suffices
+    shard = get_shard(pod["network_group"])
+    if shard is None:
+        return False, None
+    with shard.lock:
+        cand = pick_node(shard.nodes.values(), pod, algo)
+        if cand is None:
             return False, None
-        if algo == "first_fit":
-            cand = eligible[0]
-        elif algo == "best_fit":
-            cand = min(eligible, key=lambda n: (n["cpu_available"] - pod["cpu"]) + (n["memory_available"] - pod["memory"]))
-        else:  # worst_fit
-            cand = max(eligible, key=lambda n: n["cpu_available"] + n["memory_available"])
-        cand["pods"].append(pod)
-        cand["cpu_available"] -= pod["cpu"]
-        cand["memory_available"] -= pod["memory"]
+        assign_pod(cand, pod)
         save_node(cand)
-        log_event_func(f"Pod {pod['pod_id']} scheduled on node {cand['node_id']} via {algo}")
+        log_event_func(f"Pod {pod['pod_id']} scheduled on node {cand['node_id']} via {algo}",
+                       "pod_scheduled", node_id=cand["node_id"], pod_id=pod["pod_id"])
         return True, cand["node_id"]
 
-def reschedule_pods_from_failed_node(nid):
-    with nodes_lock:
-        failed = nodes.pop(nid, None)
+def placement_order(pod):
+    """Bulk placement order: pods with an affinity first (fewer nodes fit them), then largest first."""
+    return (not pod.get("node_affinity"), -(pod["cpu"] + pod["memory"]))
+
+def place_pods(pods):
+    """Place displaced pods in bulk, each with the algorithm it was launched with (first_fit if unknown).
+
+    Pods are grouped by network_group and sorted with placement_order, and each
+    group is packed under a single shard lock against a candidate list built
+    once. Returns ([(pod, node_id)] placed, [pods] unplaced, {node_id: node} changed).
+    """
+    placed, unplaced, changed = [], [], {}
+    by_group = {}
+    for pod in pods:
+        by_group.setdefault(pod["network_group"], []).append(pod)
+    for group in sorted(by_group):
+        shard = get_shard(group)
+        if shard is None:
+            unplaced += by_group[group]
+            continue
+        with shard.lock:
+            candidates = [n for n in shard.nodes.values() if n["status"] == "active"]
+            for pod in sorted(by_group[group], key=placement_order):
+                node = pick_node(candidates, pod, pod.get("scheduling_algorithm") or "first_fit")
+                if node is None:
+                    unplaced.append(pod)
+                    continue
+                assign_pod(node, pod)
+                pod["node_id"] = node["node_id"]
+                changed[node["node_id"]] = node
+                placed.append((pod, node["node_id"]))
+    return placed, unplaced, changed
+
+def reschedule_failed_nodes(nids):
+    """Detach failed nodes and move all of their pods in one bulk placement.
+
+    The moves, the removed nodes and the nodes that took pods are persisted in
+    one storage transaction. Returns (placed, unplaced) as from place_pods.
+    """
+    failed = [n for n in map(remove_node_from_cluster, nids) if n is not None]
     if not failed:
-        return
-    delete_node(nid)
-    for pod in failed["pods"]:
-        ok, new_nid = schedule_pod(pod, "first_fit")
-        if ok:
-            update_pod_node(pod["pod_id"], new_nid)
-            log_event_func(f"Rescheduled pod {pod['pod_id']} → {new_nid}")
-        else:
-            log_event_func(f"Failed to reschedule pod {pod['pod_id']}")
+        return [], []
+    placed, unplaced, changed = place_pods([pod for n in failed for pod in n["pods"]])
+    save_reschedule([n["node_id"] for n in failed], [(pod["pod_id"], nid) for pod, nid in placed],
+                    list(changed.values()))
+    origin = {pod["pod_id"]: n["node_id"] for n in failed for pod in n["pods"]}
+    log_events(
+        [(f"Rescheduled pod {pod['pod_id']} → {nid} via {pod.get('scheduling_algorithm') or 'first_fit'}",
+          "pod_rescheduled", "info", nid, pod["pod_id"]) for pod, nid in placed]
+        + [(f"Failed to reschedule pod {pod['pod_id']}", "pod_unschedulable", "warning",
+            origin[pod["pod_id"]], pod["pod_id"]) for pod in unplaced]
+    )
+    return placed, unplaced
+
+def reschedule_pods_from_failed_node(nid):
+    return reschedule_failed_nodes([nid])
 
 # ----------------------------------
 # Health Monitor & Heartbeats
 # ----------------------------------
-def health_monitor():
-    while True:
-        time.sleep(HEALTH_CHECK_INTERVAL)
-        now = get_current_timestamp()
-        to_fail = []
-        
-        with nodes_lock:
-            # Count active nodes for reporting
-            active_nodes = sum(1 for n in nodes.values() if n["status"] == "active")
-            print(f"[HEALTH] Monitoring {len(nodes)} nodes ({active_nodes} active)")
-            
-            # Check each node
-            for nid, n in list(nodes.items()):
+def health_check_tick():
+    """Grade each live node's silence by its phi: suspect it, clear it, or fail it."""
+    now = get_current_timestamp()
+    to_fail = []
+    
+    # Count active nodes for reporting
+    total_nodes, active_nodes, suspect_nodes = count_nodes()
+    print(f"[HEALTH] Monitoring {total_nodes} nodes ({active_nodes} active, {suspect_nodes} suspect)")
+
+    # Check each node, one shard at a time
+    partitioned = {}  # incident id -> (partition incident, node ids it failed)
+    for shard in iter_shards():
+        incident = partition_of(shard.group)
+        with shard.lock:
+            for nid, n in shard.nodes.items():
                 # Skip already failed nodes
-                if n["status"] != "active":
+                if n["status"] == "failed":
                     continue
-                    
-                # Check heartbeat age
+
                 heartbeat_age = now - n["last_heartbeat"]
-                
-                # Only fail nodes if heartbeat is too old
-                if heartbeat_age > HEARTBEAT_THRESHOLD:
-                    print(f"[HEALTH] 🚨 Node {nid} failed - Last heartbeat: {heartbeat_age:.1f}s ago (threshold: {HEARTBEAT_THRESHOLD}s)")
-                    n["status"] = "failed"
-                    save_node(n)
-                    log_event_func(f"Node {nid} marked FAILED - No heartbeat for {heartbeat_age:.1f}s")
+                phi = shard.detector.phi(nid, heartbeat_age)
+                if phi < PHI_SUSPECT_THRESHOLD:
+                    if n["status"] == "suspect":
+                        n["status"] = "active"
+                        shard.dirty = True
+                        save_node(n)
+                        log_event_func(f"Node {nid} no longer suspected - phi {phi:.1f}", "node_trusted", node_id=nid)
+                    continue
+                if phi < PHI_FAIL_THRESHOLD:
+                    if n["status"] == "active":
+                        print(f"[HEALTH] ⚠️ Node {nid} suspect - Last heartbeat: {heartbeat_age:.1f}s ago (phi {phi:.1f})")
+                        n["status"] = "suspect"
+                        shard.dirty = True
+                        save_node(n)
+                        log_event_func(f"Node {nid} marked SUSPECT - No heartbeat for {heartbeat_age:.1f}s, phi {phi:.1f}",
+                                       "node_suspect", "warning", node_id=nid)
+                    continue
+
+                print(f"[HEALTH] 🚨 Node {nid} failed - Last heartbeat: {heartbeat_age:.1f}s ago (phi {phi:.1f})")
+                n["status"] = "failed"
+                shard.dirty = True
+                save_node(n)
+                log_event_func(f"Node {nid} marked FAILED - No heartbeat for {heartbeat_age:.1f}s, phi {phi:.1f}",
+                               "node_failed", "error", node_id=nid)
+                if incident is None:
                     to_fail.append(nid)
-        
-        # Handle failed nodes
-        for nid in to_fail:
-            print(f"[HEALTH] 🔄 Rescheduling pods from failed node {nid}")
-            socketio.emit("alert", {"msg": f"Node {nid} failed"})
-            reschedule_pods_from_failed_node(nid)
-            
+                else:
+                    partitioned.setdefault(incident["id"], (incident, []))[1].append(nid)
+    
+    publish_snapshot()
+    handle_failed_nodes(to_fail, "heartbeat timeout")
+    for incident, nids in partitioned.values():
+        with chaos_lock:
+            if incident["detect_seconds"] is None:
+                incident["detect_seconds"] = round(now - incident["started"], 4)
+        handle_failed_nodes(nids, "network partition", incident)
+
+def handle_failed_nodes(to_fail, cause, incident=None, replace=True):
+    """Reschedule pods off freshly failed nodes in one bulk pass and auto-scale replacements.
+
+    With a chaos incident, the counts and the reschedule and autoscale times are added to it.
+    """
+    if not to_fail:
+        return
+    started = time.time()
+    print(f"[HEALTH] 🔄 Rescheduling pods from {len(to_fail)} failed node(s)")
+    placed, unplaced = reschedule_failed_nodes(to_fail)
+    rescheduled = time.time()
+    for nid in to_fail:
+        emit_event("alert", {"msg": f"Node {nid} failed"})
+        if replace:
             # Auto-scale to replace the failed node
             print(f"[HEALTH] 🆙 Triggering auto-scaling due to node {nid} failure")
-            trigger_auto_scaling(f"Node {nid} failed due to heartbeat timeout")
+            trigger_auto_scaling(f"Node {nid} failed due to {cause}", publish=False)
+    publish_snapshot()
+    if incident is not None:
+        finished = time.time()
+        with chaos_lock:
+            incident["failed_nodes"] += len(to_fail)
+            incident["displaced_pods"] += len(placed) + len(unplaced)
+            incident["rescheduled"] += len(placed)
+            incident["unschedulable"] += len(unplaced)
+            incident["replacements"] += len(to_fail) if replace else 0
+            incident["reschedule_seconds"] = round(incident["reschedule_seconds"] + rescheduled - started, 4)
+            incident["autoscale_seconds"] = round(incident["autoscale_seconds"] + finished - rescheduled, 4)
+            incident["recovery_seconds"] = round(finished - incident["started"], 4)
+            if incident["status"] == "failing":
+                incident["status"] = "recovered"
 
-def simulate_heartbeat_thread():
-    while True:
-        time.sleep(NODE_HEARTBEAT_INTERVAL)
-        print(f"[HEARTBEAT] Updating simulated heartbeats")
-        with nodes_lock:
-            for nid, n in list(nodes.items()):
-                if n["simulate_heartbeat"] and n["status"] == "active":
+def simulate_heartbeats_tick():
+    print(f"[HEARTBEAT] Updating simulated heartbeats")
+    for shard in iter_shards():
+        if partition_of(shard.group) is not None:
+            continue  # partitioned: its heartbeats are dropped
+        with shard.lock:
+            for n in shard.nodes.values():
+                if n["simulate_heartbeat"] and n["status"] != "failed":
                     n["last_heartbeat"] = get_current_timestamp()
+                    shard.detector.heartbeat(n["node_id"], n["last_heartbeat"])
+                    if n["status"] == "suspect":
+                        n["status"] = "active"
+                        log_event_func(f"Node {n['node_id']} no longer suspected - heartbeat received",
+                                       "node_trusted", node_id=n["node_id"])
+                    shard.dirty = True
                     save_node(n)
+    publish_snapshot()
 
 # ----------------------------------
 # Auto‐scaling with Docker & Persistence
 # ----------------------------------
-def trigger_auto_scaling(reason):
-    """Trigger auto-scaling on demand, creating a new node to replace a failed one."""
+def trigger_auto_scaling(reason, publish=True):
+    """Trigger auto-scaling on demand, creating a new node to replace a failed one.
+
+    Callers adding many nodes pass publish=False and publish once at the end.
+    """
     nid = str(uuid.uuid4())
     node = create_new_node(nid)
-    with nodes_lock:
-        nodes[nid] = node
+    add_node_to_cluster(node)
     save_node(node)
-    log_event_func(f"Auto-scaled: Added node {nid} - Reason: {reason}")
-    launch_node_container(node)
+    log_event_func(f"Auto-scaled: Added node {nid} - Reason: {reason}", "autoscale", node_id=nid)
+    launch_node_container(node, autoscaled=True)
+    if publish:
+        publish_snapshot()
     return nid
 
-def auto_scale_cluster():
-    while True:
-        time.sleep(HEALTH_CHECK_INTERVAL)
-        with nodes_lock:
-            active_nodes = [n for n in nodes.values() if n["status"] == "active"]
-            total_nodes = len(nodes)
-            active_count = len(active_nodes)
-
-        # Trigger auto-scaling if active nodes are low
-        if active_count < total_nodes / 2:  # If more than half nodes are down
-            print(f"Auto-scaling triggered: {active_count} active out of {total_nodes} total nodes")
-            reason = f"Low active node count ({active_count}/{total_nodes})"
-            trigger_auto_scaling(reason)
+def auto_scale_tick():
+    total_nodes, active_count, suspect_count = count_nodes()
 
-        time.sleep(15)  # Wait before next check
+    # Trigger auto-scaling if live nodes are low; a suspect node has not failed
+    # yet, so suspicion alone never adds capacity
+    live_count = active_count + suspect_count
+    if live_count < total_nodes / 2:  # If more than half nodes are down
+        print(f"Auto-scaling triggered: {live_count} live ({suspect_count} suspect) out of {total_nodes} total nodes")
+        reason = f"Low live node count ({live_count}/{total_nodes}, {suspect_count} suspect)"
+        trigger_auto_scaling(reason)
 
 def create_new_node(nid):
     return {
@@ -313,80 +844,274 @@ def create_new_node(nid):
         "simulate_heartbeat": True
     }
 
-def launch_node_container(node):
-    net = ensure_network(node["network_group"])
-    if docker_client and net:
-        try:
-            cont = docker_client.containers.run(
-                DOCKER_NODE_IMAGE,
-                command=[
-                    "--server", "http://host.docker.internal:5000",
-                    "--node_id", node["node_id"],
-                    "--interval", str(NODE_HEARTBEAT_INTERVAL)
-                ],
-                name=f"node_{node['node_id']}",
-                detach=True,
-                network=net.name,
-                cpu_count=node["cpu_total"],
-                mem_limit=f"{node['memory_total']}g",
-                labels={"sim-node": node["node_id"], "autoscaled": "true"},
-                remove=True
-            )
-            node["container_id"] = cont.id
-            save_node(node)
-            log_event_func(f"Container {cont.id[:12]} launched for auto‐scaled node {node['node_id']}")
-        except Exception as e:
-            log_event_func(f"Auto‐scale container error for {node['node_id']}: {e}")
+def launch_node_container(node, autoscaled=False):
+    """Bind a warm container to the node, or queue a cold launch whose result arrives as a container event."""
+    container_id = claim_warm_container(node)
+    if container_id:
+        node["container_id"] = container_id
+        node["container_state"] = "running"
+        save_node(node)
+        log_event_func(f"Warm container {container_id[:12]} claimed for node {node['node_id']}",
+                       "container", node_id=node["node_id"])
+    elif run_node_container_async(node, NODE_HEARTBEAT_INTERVAL, autoscaled=autoscaled):
+        node["container_state"] = "pending"
+        print(f"⚙️  Container launch queued for node {node['node_id']}")
     else:
-        log_event_func(f"Skipping container launch for auto‐scaled node {node['node_id']}")
+        node["container_state"] = None
+        log_event_func(f"Skipping container launch for node {node['node_id']} (no docker_client)",
+                       "container", "warning", node_id=node["node_id"])
+
+@on_container_event
+def handle_container_event(event):
+    """Apply a finished container run/stop/remove to the node and notify clients."""
+    nid, cid, action = event["node_id"], event.get("container_id"), event["action"]
+    orphaned = False
+    with locked_node(nid) as n:
+        if action == "run":
+            if n is None:
+                orphaned = event["status"] == "ok"
+            elif event["status"] == "ok":
+                n["container_id"] = cid
+                n["container_state"] = "running"
+                mark_dirty(n)
+                save_node(n)
+            else:
+                n["container_state"] = "error"
+                mark_dirty(n)
+    if action == "run" and event["status"] == "ok":
+        log_event_func(f"Container {cid[:12]} launched for node {nid}", "container", node_id=nid)
+    elif event["status"] == "ok":
+        log_event_func(f"Container {cid[:12]} {'removed' if action == 'remove' else 'stopped'} for node {nid}",
+                       "container", node_id=nid)
+    else:
+        log_event_func(f"ERROR during container {action} for node {nid}: {event.get('error')}",
+                       "container", "error", node_id=nid)
+    if orphaned:
+        # Node was removed while its container was starting
+        stop_container_async(cid, nid)
+    publish_snapshot()
+    emit_event("container_event", event)
+
+# ----------------------------------
+# Container Reconciliation
+# ----------------------------------
+def reconcile_containers():
+    """Diff simulator containers against node state and repair drift in batches."""
+    containers = list_sim_containers()
+    if containers is None:
+        return
+    by_id = {c["id"]: c for c in containers}
+    by_node = {c["node_id"]: c for c in containers if c["node_id"]}
+    owned = set()
+    changed, to_relaunch, to_fail = [], [], []
+
+    for shard in iter_shards():
+        with shard.lock:
+            for nid, n in shard.nodes.items():
+                cid = n.get("container_id")
+                c = by_id.get(cid) if cid else by_node.get(nid)
+                if c:
+                    owned.add(c["id"])
+                if n.get("container_state") == "pending":
+                    continue  # launch still in flight
+                if c and c["running"]:
+                    if cid != c["id"] or n.get("container_state") != "running":
+                        n["container_id"], n["container_state"] = c["id"], "running"
+                        shard.dirty = True
+                        changed.append(n)
+                    continue
+                if not cid and n.get("container_state") not in ("error", "lost"):
+                    continue  # node never had a container
+                # Container vanished or exited, or an earlier launch failed: drop the stale id and retry
+                if c:
+                    owned.discard(c["id"])
+                if cid:
+                    n["container_id"], n["container_state"] = None, "lost"
+                    shard.dirty = True
+                    changed.append(n)
+                if n["status"] == "failed":
+                    continue
+                if n["simulate_heartbeat"] or not cid:
+                    to_relaunch.append(n)
+                else:
+                    # The container was this node's only heartbeat source
+                    n["status"] = "failed"
+                    to_fail.append(nid)
+
+    warm_ids, warm_in_flight = warm_container_ids()
+    orphans = [
+        c for c in containers
+        if c["id"] not in owned and c["id"] not in warm_ids
+        and not (c["pool"] and warm_in_flight)
+    ]
+
+    save_nodes(changed)
+    for n in to_relaunch:
+        launch_node_container(n, autoscaled=True)
+    for c in orphans:
+        stop_container_async(c["id"], c["node_id"])
+    if changed or orphans:
+        log_event_func(
+            f"Reconciled containers: {len(changed)} nodes updated, {len(to_relaunch)} relaunched, "
+            f"{len(to_fail)} failed, {len(orphans)} orphans reaped",
+            "reconcile"
+        )
+    publish_snapshot()
+    handle_failed_nodes(to_fail, "container loss")
+
+def retention_tick():
+    """Prune history past its retention, a small batch at a time."""
+    deleted = prune_expired_rows()
+    if any(deleted.values()):
+        print(f"🧹 Retention pruned {', '.join(f'{n} {t}' for t, n in deleted.items() if n)} rows")
 
 # ----------------------------------
 # Chaos Monkey & Broadcast
 # ----------------------------------
+def new_incident(mode, target, status="failing"):
+    """Start recording a chaos run."""
+    incident = {
+        "id": next(chaos_incident_ids), "mode": mode, "target": target, "status": status,
+        "started": time.time(), "failed_nodes": 0, "displaced_pods": 0, "rescheduled": 0,
+        "unschedulable": 0, "replacements": 0, "detect_seconds": None,
+        "reschedule_seconds": 0.0, "autoscale_seconds": 0.0, "recovery_seconds": None,
+    }
+    with chaos_lock:
+        chaos_incidents.append(incident)
+    return incident
+
+def chaos_kill(mode, target, select, replace=True):
+    """Fail the nodes `select(active nodes)` picks, all at once, and recover with one bulk reschedule.
+
+    Every shard lock is held while the victims are picked and marked failed, so
+    no heartbeat or placement sees a half-applied failure; they are persisted
+    after the locks are released. Returns (incident, node ids).
+    """
+    incident = new_incident(mode, target)
+    with locked_shards() as held:
+        victims = select([n for shard in held for n in shard.nodes.values() if n["status"] == "active"])
+        for n in victims:
+            n["status"] = "failed"
+            mark_dirty(n)
+        failed = [dict(n) for n in victims]  # as marked, whatever heartbeats do once the locks are released
+    save_nodes(failed)
+    nids = [n["node_id"] for n in victims]
+    log_events([(f"Chaos Monkey killed node {nid}", "chaos", "warning", nid, None) for nid in nids])
+    with chaos_lock:
+        incident["detect_seconds"] = 0.0  # no detection needed: the failure is injected directly
+        if not nids:
+            incident["status"] = "no_targets"
+    handle_failed_nodes(nids, f"chaos {mode}", incident, replace)
+    return incident, nids
+
 def chaos_monkey(node_id=None):
-    with nodes_lock:
+    """Kill one named or random active node. Its pods are rescheduled; the node is not replaced."""
+    if node_id and node_id not in nodes:
+        return {"message": f"Node {node_id} not found"}
+
+    def select(active):
         if node_id:
-            # Target specific node
-            if node_id in nodes:
-                target = nodes[node_id]
-            else:
-                return {"message": f"Node {node_id} not found"}
-        else:
-            # Random node selection (original behavior)
-            active = [n for n in nodes.values() if n["status"] == "active"]
-            if not active:
-                return {"message": "No active nodes"}
-            target = random.choice(active)
-            
-    target["status"] = "failed"
-    save_node(target)
-    log_event_func(f"Chaos Monkey killed node {target['node_id']}")
-    reschedule_pods_from_failed_node(target["node_id"])
-    return {"message": f"Killed node {target['node_id']}"}
-
-def broadcast_state():
-    while True:
-        time.sleep(3)
-        with nodes_lock:
-            state = {
-                "nodes": list(nodes.values()),
-                "logs": event_log[-50:],
-                "history": [{"timestamp": ts, "utilization": util} for ts, util in utilization_history]
-            }
-        socketio.emit("state_update", state)
+            return [n for n in active if n["node_id"] == node_id]
+        return [random.choice(active)] if active else []
+
+    incident, nids = chaos_kill("node", node_id or "random", select, replace=False)
+    if not nids:
+        return {"message": f"Node {node_id} is not active" if node_id else "No active nodes"}
+    return {"message": f"Killed node {nids[0]}", "incident": incident_view(incident)}
+
+def chaos_kill_percent(percent, node_type=None, network_group=None):
+    """Kill `percent`% of the active nodes, optionally only of one node_type and/or network_group."""
+    def select(active):
+        pool = [n for n in active
+                if (not node_type or n["node_type"] == node_type)
+                and (not network_group or n["network_group"] == network_group)]
+        return random.sample(pool, min(len(pool), max(1, round(len(pool) * percent / 100)))) if pool else []
+
+    target = " ".join(filter(None, (f"{percent:g}%", node_type, network_group)))
+    incident, nids = chaos_kill("percent", target, select)
+    return {"message": f"Killed {len(nids)} nodes ({target})", "incident": incident_view(incident)}
+
+def chaos_kill_group(network_group):
+    """Kill every active node of a network group."""
+    incident, nids = chaos_kill("group", network_group,
+                                lambda active: [n for n in active if n["network_group"] == network_group])
+    return {"message": f"Killed {len(nids)} nodes in network group {network_group}", "incident": incident_view(incident)}
+
+def chaos_partition(network_group, duration):
+    """Drop every heartbeat from a network group for `duration` seconds.
+
+    Nothing is failed directly: the health check notices the silence and
+    recovers through its usual path, so the incident also times detection.
+    """
+    with chaos_lock:
+        if partition_of(network_group) is not None:
+            return None
+        incident = new_incident("partition", network_group, status="partitioned")
+        incident["duration"] = duration
+        incident["ends_at"] = incident["started"] + duration
+        active_partitions[network_group] = incident
+    log_event_func(f"Chaos Monkey partitioned network group {network_group} for {duration:g}s", "chaos", "warning")
+    return {"message": f"Partitioned network group {network_group} for {duration:g}s", "incident": incident_view(incident)}
+
+def partition_of(group):
+    """The partition incident in force for a network group, or None. Lapsed partitions are closed here."""
+    with chaos_lock:
+        incident = active_partitions.get(group)
+        if incident is None:
+            return None
+        if time.time() < incident["ends_at"]:
+            return incident
+        del active_partitions[group]
+        incident["status"] = "recovered" if incident["failed_nodes"] else "healed"
+        return None
+
+def incident_view(incident):
+    with chaos_lock:
+        return dict(incident)
+
+def request_broadcast():
+    """Wake the broadcaster; changes within BROADCAST_MIN_INTERVAL are coalesced into one update."""
+    broadcast_wakeup.set()
+
+def broadcast_state_tick():
+    """Wait for a change (or BROADCAST_INTERVAL), then broadcast it unless nothing changed."""
+    broadcast_wakeup.wait(BROADCAST_INTERVAL)
+    delay = last_broadcast["time"] + BROADCAST_MIN_INTERVAL - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    broadcast_wakeup.clear()
+
+    snap = publish_snapshot()  # also picks up heartbeats, which do not publish on their own
+    logs = recent_logs()
+    with event_log_lock:
+        log_seq = event_log_seq
+    with utilization_lock:
+        history = [{"timestamp": ts, "utilization": util} for ts, util in utilization_history]
+    state = {
+        "nodes": snap.nodes,
+        "logs": logs,
+        "history": history
+    }
+    key = (snap.revision, log_seq, history[-1]["timestamp"] if history else None)
+    if key == last_broadcast["key"]:
+        catch_up_lagging_clients(state)
+        return
+    last_broadcast.update(time=time.time(), key=key)
+    emit_state(state)
 
 # ----------------------------------
-# API Endpoints
+# API Handlers
 # ----------------------------------
-@app.route('/api/add_node', methods=['POST'])
-def add_node_endpoint():
-    data = request.get_json() or {}
+# Framework-neutral request handlers: each takes the parsed JSON body (or query
+# args) and returns (payload, status). Flask views below and the asyncio server
+# in asgi_server.py both dispatch to these.
+def handle_add_node(data):
     print("▶️  /add_node called with:", data)
 
     cpu = data.get("cpu")
     if cpu is None:
         print("❌  Missing cpu in payload")
-        return jsonify({"error": "Missing cpu"}), 400
+        return {"error": "Missing cpu"}, 400
     mem = data.get("memory", DEFAULT_NODE_MEMORY)
     nt = data.get("node_type", "balanced")
     ng = data.get("network_group", "default")
@@ -401,58 +1126,30 @@ def add_node_endpoint():
         "pods": [], "last_heartbeat": time.time(),
         "status": "active", "simulate_heartbeat": True
     }
-    with nodes_lock:
-        nodes[node_id] = node
+    add_node_to_cluster(node)
     save_node(node)
-    log_event_func(f"Added node {node_id} ({cpu} CPU, {mem}GB, {nt}/{ng})")
+    log_event_func(f"Added node {node_id} ({cpu} CPU, {mem}GB, {nt}/{ng})", "node_added", node_id=node_id)
 
-    # 2) launch container
-    if docker_client:
-        server_url = "http://host.docker.internal:5000"
-        print(f"⚙️  Launching container for {node_id} on network '{ng}' via {server_url}")
-        net = ensure_network(ng)
-        try:
-            container = docker_client.containers.run(
-                DOCKER_NODE_IMAGE,
-                command=[
-                    "--server", server_url,
-                    "--node_id", node_id,
-                    "--interval", str(NODE_HEARTBEAT_INTERVAL)
-                ],
-                name=f"node_{node_id}",
-                detach=True,
-                network=net.name if net else None,
-                cpu_count=cpu,
-                mem_limit=f"{mem}g",
-                labels={"sim-node": node_id},
-                auto_remove=False
-            )
-            print("✅ Container started:", container.id)
-            with nodes_lock:
-                nodes[node_id]["container_id"] = container.id
-            save_node(nodes[node_id])
-            log_event_func(f"Container {container.id[:12]} launched for node {node_id}")
-        except Exception as ex:
-            print("❌ Container launch error:", ex)
-            log_event_func(f"ERROR launching container for node {node_id}: {ex}")
-    else:
-        print("⚠️  Skipping container launch (no docker_client)")
+    # 2) queue container launch; the response does not wait for Docker
+    launch_node_container(node)
+    publish_snapshot()
 
-    return jsonify({"message": "Node added", "node_id": node_id}), 200
+    return {
+        "message": "Node added",
+        "node_id": node_id,
+        "container_state": node["container_state"]
+    }, 200
 
-@app.route('/api/toggle_simulation', methods=['POST'])
-def toggle_simulation():
-    data = request.get_json()
+def handle_toggle_simulation(data):
     print(f"[DEBUG] toggle_simulation called with data: {data}")
     nid, sim = data.get("node_id"), bool(data.get("simulate"))
     if not nid:
         print("[DEBUG] ❌ Missing node_id in request")
-        return jsonify({"error": "Missing node_id"}), 400
-    with nodes_lock:
-        n = nodes.get(nid)
+        return {"error": "Missing node_id"}, 400
+    with locked_node(nid) as n:
         if not n:
             print(f"[DEBUG] ❌ Node {nid} not found")
-            return jsonify({"error": "Not found"}), 404
+            return {"error": "Not found"}, 404
         old_val = n["simulate_heartbeat"]
         n["simulate_heartbeat"] = sim
         
@@ -464,66 +1161,90 @@ def toggle_simulation():
             n["last_heartbeat"] = current_time
         
         print(f"[DEBUG] ✅ Changed simulate_heartbeat for node {nid}: {old_val} -> {sim}")
+        mark_dirty(n)
         save_node(n)
-    log_event_func(f"Simulation for {nid} set to {sim}")
-    return jsonify({"message": "OK"}), 200
+    log_event_func(f"Simulation for {nid} set to {sim}", "simulation", node_id=nid)
+    publish_snapshot()
+    return {"message": "OK"}, 200
 
-@app.route('/api/remove_node', methods=['POST'])
-def remove_node_endpoint():
-    data = request.get_json()
+def handle_remove_node(data):
     nid = data.get("node_id")
     if not nid:
-        return jsonify({"error": "Missing node_id"}), 400
+        return {"error": "Missing node_id"}, 400
 
-    with nodes_lock:
-        if nid not in nodes:
-            return jsonify({"error": "Node not found"}), 404
+    with locked_node(nid) as n:
+        if not n:
+            return {"error": "Node not found"}, 404
+        container_id = n.get("container_id")
 
-        # Check if this node has a container running
-        container_id = nodes[nid].get("container_id")
-        if container_id and docker_client:
-            try:
-                container = docker_client.containers.get(container_id)
-                container.stop()
-                log_event_func(f"Container {container_id[:12]} stopped for node {nid}")
-            except Exception as e:
-                log_event_func(f"Error stopping container for node {nid}: {e}")
+    # Stop the container in the background; never hold a shard lock across Docker calls
+    if stop_container_async(container_id, nid):
+        log_event_func(f"Container {container_id[:12]} stop queued for node {nid}", "container", node_id=nid)
 
-        # Remove node and reschedule pods
-        reschedule_pods_from_failed_node(nid)
+    # Remove node and reschedule pods
+    reschedule_pods_from_failed_node(nid)
+    publish_snapshot()
 
-    return jsonify({"message": f"Node {nid} removed"}), 200
+    return {"message": f"Node {nid} removed", "container_state": "stopping" if container_id else None}, 200
 
-@app.route('/api/list_nodes', methods=['GET'])
-def list_nodes_api():
-    with nodes_lock:
-        return jsonify({"nodes": list(nodes.values())}), 200
+def handle_list_nodes(args, if_none_match=None, snap=None):
+    """(body, status, headers) for a list_nodes query against `snap` (default: the latest snapshot)."""
+    snap = snap or snapshot
+    return list_nodes_response(BOOT_ID, snap.revision, args, if_none_match,
+                               snap.nodes_json, snap.node_index)
 
-@app.route('/heartbeat', methods=['POST'])
-@app.route('/api/heartbeat', methods=['POST'])
-def heartbeat_api():
-    data = request.get_json() or {}
+def handle_warm_pool(data):
+    return {"pools": warm_pool_status()}, 200
+
+def warm_assignment_wait(args):
+    """Seconds a warm assignment request may long-poll for a claim (its ?wait=, capped)."""
+    try:
+        return min(max(float(args.get("wait", 0)), 0.0), WARM_ASSIGNMENT_MAX_WAIT)
+    except (TypeError, ValueError):
+        return 0.0
+
+def handle_warm_assignment(token, wait=0):
+    node_id = get_warm_assignment(token, wait)
+    if not node_id:
+        return {"error": "Not claimed"}, 404
+    return {"node_id": node_id}, 200
+
+def handle_heartbeat(data):
     nid = data.get("node_id")
-    with nodes_lock:
-        n = nodes.get(nid)
+    known = nodes.get(nid)
+    if known is not None and partition_of(known["network_group"]) is not None:
+        return {"error": f"Network group {known['network_group']} is partitioned"}, 503
+    with locked_node(nid) as n:
         if not n:
-            return jsonify({"error": "Unknown"}), 404
+            return {"error": "Unknown"}, 404
         n["last_heartbeat"] = time.time()
-        if n["status"] == "failed":
+        mark_dirty(n)
+        detector = shards[n["network_group"]].detector
+        status = n["status"]
+        if status == "failed":
+            detector.reset(nid)  # its old rhythm says nothing about the node that came back
+        detector.heartbeat(nid, n["last_heartbeat"])
+        if status != "active":
             n["status"] = "active"
             save_node(n)
-            log_event_func(f"Node {nid} reactivated")
-    return jsonify({"message": "OK"}), 200
+            if status == "failed":
+                log_event_func(f"Node {nid} reactivated", "node_reactivated", node_id=nid)
+            else:
+                log_event_func(f"Node {nid} no longer suspected - heartbeat received", "node_trusted", node_id=nid)
+    # The node's container is running as it, so a warm claim on it is no longer needed
+    forget_warm_assignment(nid)
+    if status != "active":
+        # Plain heartbeats are picked up by the next publish instead of forcing one
+        publish_snapshot()
+    return {"message": "OK"}, 200
 
-@app.route('/api/launch_pod', methods=['POST'])
-def launch_pod_endpoint():
-    data = request.get_json() or {}
+def handle_launch_pod(data):
     print("▶️  /launch_pod called with:", data)
 
     cpu_req = data.get("cpu_required")
     if cpu_req is None:
         print("❌  Missing cpu_required")
-        return jsonify({"error": "Missing cpu_required"}), 400
+        return {"error": "Missing cpu_required"}, 400
 
     mem_req = data.get("memory_required", DEFAULT_POD_MEMORY)
     algo = data.get("scheduling_algorithm", "first_fit").lower()
@@ -541,65 +1262,202 @@ def launch_pod_endpoint():
         "memory": mem_req,
         "network_group": ng,
         "cpu_usage": 0,
-        "node_id": None  # Will be assigned during scheduling
+        "node_id": None,  # Will be assigned during scheduling
+        "scheduling_algorithm": algo
     }
     if affinity:
         pod["node_affinity"] = affinity
 
     scheduled, assigned = schedule_pod(pod, algo)
+    publish_snapshot()
     if scheduled:
         pod["node_id"] = assigned
         save_pod(pod)
         print(f"✅ Pod {pid} scheduled on node {assigned} via {algo}")
-        return jsonify({
+        return {
             "message": "Pod launched",
             "pod_id": pid,
             "assigned_node": assigned,
             "scheduling_algorithm": algo
-        }), 200
+        }, 200
     else:
         print(f"❌ No capacity for pod {pid}")
-        return jsonify({"error": "No available node with sufficient resources"}), 400
+        return {"error": "No available node with sufficient resources"}, 400
+
+def handle_chaos_monkey(data):
+    """Chaos by mode: node (one named or random node), percent, group or partition."""
+    mode = data.get("mode", "node")
+    group = data.get("network_group")
+    if mode == "node":
+        return chaos_monkey(data.get("node_id")), 200
+    if mode == "percent":
+        try:
+            percent = float(data.get("percent", 0))
+        except (TypeError, ValueError):
+            percent = 0
+        if not 0 < percent <= 100:
+            return {"error": "percent must be a number in (0, 100]"}, 400
+        return chaos_kill_percent(percent, data.get("node_type"), group), 200
+    if mode not in ("group", "partition"):
+        return {"error": f"Unknown chaos mode {mode!r}; expected node, percent, group or partition"}, 400
+    if not group or get_shard(group) is None:
+        return {"error": f"Unknown network_group {group!r}"}, 400
+    if mode == "group":
+        return chaos_kill_group(group), 200
+    try:
+        duration = float(data.get("duration", 60))
+    except (TypeError, ValueError):
+        duration = 0
+    if duration <= 0:
+        return {"error": "duration must be a positive number of seconds"}, 400
+    result = chaos_partition(group, duration)
+    if result is None:
+        return {"error": f"Network group {group} is already partitioned"}, 409
+    return result, 200
+
+def handle_chaos_incidents(data):
+    """Recent chaos runs, newest first."""
+    for group in list(active_partitions):
+        partition_of(group)
+    with chaos_lock:
+        incidents = [dict(i) for i in reversed(chaos_incidents)]
+    return {"incidents": incidents}, 200
+
+def handle_logs(data):
+    """Newest-first events filtered by type, severity, node_id, pod_id and since/before timestamps.
+
+    Pass `next_before` back as `before` for the next page. Recent events come
+    from memory; older ones from storage.
+    """
+    try:
+        limit = min(int(data.get("limit") or 50), EVENT_QUERY_MAX_LIMIT)
+        since = float(data["since"]) if data.get("since") else None
+        before = float(data["before"]) if data.get("before") else None
+    except ValueError:
+        return {"error": "limit, since and before must be numbers"}, 400
+    filters = {f: data[f] for f in EVENT_FILTERS if data.get(f)}
+
+    def matches(entry):
+        return (all(entry[f] == v for f, v in filters.items())
+                and (since is None or entry["timestamp"] >= since)
+                and (before is None or entry["timestamp"] < before))
+
+    with event_log_lock:
+        oldest_in_memory = event_log[0]["timestamp"] if event_log else None
+        logs = list(islice((e for e in reversed(event_log) if matches(e)), limit))
+    if len(logs) < limit and (since is None or oldest_in_memory is None or since < oldest_in_memory):
+        older_than = oldest_in_memory if before is None else min(before, oldest_in_memory or before)
+        logs += get_logs(filters, since, older_than, limit - len(logs))
+    return {"logs": logs, "next_before": logs[-1]["timestamp"] if len(logs) == limit else None}, 200
+
+def handle_utilization_history(data):
+    """Legacy cluster history without args; otherwise a range query over one series.
+
+    Args: from/to (epoch seconds, default the last hour), step (raw, 1m, 1h or
+    seconds; default picked from the span) and group or node (default cluster).
+    """
+    if not any(data.get(arg) for arg in ("from", "to", "step", "group", "node")):
+        return {"history": get_utilization_history()}, 200
+    try:
+        end = float(data["to"]) if data.get("to") else get_current_timestamp()
+        start = float(data["from"]) if data.get("from") else end - 3600
+        resolution = pick_resolution(data.get("step"), start, end)
+    except ValueError:
+        return {"error": "from, to and step must be numbers (step may also be raw, 1m or 1h)"}, 400
+    if data.get("node"):
+        scope, scope_id = "node", data["node"]
+    elif data.get("group"):
+        scope, scope_id = "group", data["group"]
+    else:
+        scope, scope_id = "cluster", "all"
+
+    points, oldest = utilization_store.query(scope, scope_id, resolution, start, end)
+    if resolution != RAW and (oldest is None or oldest > start):
+        # Older than the ring buffers hold: fill in from persisted rollups
+        persisted = get_utilization_rollups(resolution, scope, scope_id, start, oldest or end)
+        points = [dict(r, samples=int(r["samples"])) for r in persisted] + points
+    return {"scope": scope, "id": scope_id, "step": resolution, "from": start, "to": end, "points": points}, 200
+
+# ----------------------------------
+# API Endpoints
+# ----------------------------------
+def respond(result):
+    body, status = result
+    return jsonify(body), status
+
+@app.route('/api/add_node', methods=['POST'])
+def add_node_endpoint():
+    return respond(handle_add_node(request.get_json() or {}))
+
+@app.route('/api/toggle_simulation', methods=['POST'])
+def toggle_simulation():
+    return respond(handle_toggle_simulation(request.get_json() or {}))
+
+@app.route('/api/remove_node', methods=['POST'])
+def remove_node_endpoint():
+    return respond(handle_remove_node(request.get_json() or {}))
+
+@app.route('/api/list_nodes', methods=['GET'])
+def list_nodes_api():
+    body, status, headers = handle_list_nodes(request.args, request.headers.get("If-None-Match"))
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
+@app.route('/api/startup_metrics', methods=['GET'])
+def startup_metrics_api():
+    return respond(handle_startup_metrics(request.args))
+
+@app.route('/api/warm_pool', methods=['GET'])
+def warm_pool_api():
+    return respond(handle_warm_pool(request.args))
+
+@app.route('/api/warm_pool/assignment/<token>', methods=['GET'])
+def warm_assignment_api(token):
+    return respond(handle_warm_assignment(token, warm_assignment_wait(request.args)))
+
+@app.route('/heartbeat', methods=['POST'])
+@app.route('/api/heartbeat', methods=['POST'])
+def heartbeat_api():
+    return respond(handle_heartbeat(request.get_json() or {}))
+
+@app.route('/api/launch_pod', methods=['POST'])
+def launch_pod_endpoint():
+    return respond(handle_launch_pod(request.get_json() or {}))
 
 @app.route('/api/chaos_monkey', methods=['POST'])
 def chaos_api():
-    data = request.get_json() or {}
-    node_id = data.get("node_id")
-    return jsonify(chaos_monkey(node_id)), 200
+    return respond(handle_chaos_monkey(request.get_json(silent=True) or {}))
+
+@app.route('/api/chaos_incidents', methods=['GET'])
+def chaos_incidents_api():
+    return respond(handle_chaos_incidents(request.args))
 
 @app.route('/api/download_report', methods=['GET'])
 def download_report():
-    out = io.StringIO(); w = csv.writer(out)
-    w.writerow(["Node", "CPU tot/avail", "Mem tot/avail", "Status", "Type", "Group", "Pods"])
-    with nodes_lock:
-        for n in nodes.values():
-            pods = ";".join(p["pod_id"] for p in n["pods"]) or "None"
-            w.writerow([
-                n["node_id"],
-                f"{n['cpu_total']}/{n['cpu_available']}",
-                f"{n['memory_total']}/{n['memory_available']}",
-                n["status"], n["node_type"], n["network_group"], pods
-            ])
-    out.seek(0)
-    return send_file(io.BytesIO(out.getvalue().encode()),
-                     mimetype="text/csv",
-                     as_attachment=True,
-                     download_name="cluster_report.csv")
+    try:
+        chunks, mimetype, filename = export_report(snapshot, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ReportSourceError as e:
+        return jsonify({"error": str(e)}), 503
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 @app.route('/api/logs', methods=['GET'])
 def logs_api():
-    logs = get_logs()
-    return jsonify({"logs": logs}), 200
+    return respond(handle_logs(request.args))
 
 @app.route('/api/utilization_history', methods=['GET'])
 def util_api():
-    history = get_utilization_history()
-    return jsonify({"history": history}), 200
+    return respond(handle_utilization_history(request.args))
 
 # Serve the React app
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
+    if path.startswith("api/"):
+        return jsonify({"error": "Not found"}), 404
     if path != "" and os.path.exists(app.static_folder + '/' + path):
         return send_from_directory(app.static_folder, path)
     else:
@@ -608,29 +1466,85 @@ def serve(path):
 # ----------------------------------
 # Background Tasks & Startup
 # ----------------------------------
+# (tick, interval in seconds, run once immediately at startup)
+BACKGROUND_TASKS = [
+    (health_check_tick, HEALTH_CHECK_INTERVAL, False),
+    (simulate_heartbeats_tick, NODE_HEARTBEAT_INTERVAL, False),
+    (auto_scale_tick, AUTO_SCALE_CHECK_INTERVAL, False),
+    (record_utilization_tick, UTILIZATION_RECORD_INTERVAL, False),
+    (broadcast_state_tick, 0, False),  # paced by broadcast_wakeup
+    (reconcile_containers, RECONCILE_INTERVAL, True),
+    (flush_events_tick, EVENT_FLUSH_INTERVAL, False),
+    (retention_tick, RETENTION_INTERVAL, True),
+    (snapshot_tick, STATE_SNAPSHOT_INTERVAL, True),
+]
+
+def run_tick(tick):
+    """Run one background tick; a failure is logged so the loop driving it keeps going."""
+    try:
+        tick()
+    except Exception as e:
+        print(f"❌ Background task {tick.__name__} failed: {e}")
+
+def run_periodically(tick, interval, run_first=False):
+    if run_first:
+        run_tick(tick)
+    while True:
+        time.sleep(interval)
+        run_tick(tick)
+
+def start_warm_pools():
+    groups = {shard.group for shard in iter_shards()} | {"default"}
+    start_warm_pool(groups, DEFAULT_NODE_CPU, DEFAULT_NODE_MEMORY, NODE_HEARTBEAT_INTERVAL)
+
 def background_tasks():
-    Thread(target=health_monitor, daemon=True).start()
-    Thread(target=simulate_heartbeat_thread, daemon=True).start()
-    Thread(target=auto_scale_cluster, daemon=True).start()
-    Thread(target=record_utilization_thread, daemon=True).start()
-    Thread(target=broadcast_state, daemon=True).start()
+    # Pre-warming is the first Docker use, so it must not hold up startup
+    Thread(target=start_warm_pools, daemon=True).start()
+    for tick, interval, run_first in BACKGROUND_TASKS:
+        Thread(target=run_periodically, args=(tick, interval, run_first), daemon=True).start()
+
+def timed_phase(phase, fn, *args):
+    """Run one startup phase, recording its duration in startup_metrics."""
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        startup_metrics[phase] = round(time.perf_counter() - started, 4)
+
+def report_startup():
+    startup_metrics["total"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    print("⏱️  Startup: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_metrics.items()))
+
+def handle_startup_metrics(data):
+    return {"phases": startup_metrics, "load": load_stats, "docker": docker_status}, 200
+
+startup_metrics["imports"] = round(time.perf_counter() - IMPORT_STARTED, 4)
 
 if __name__ == '__main__':
-    # Initialize MySQL database
-    if connect_to_mysql():
-        init_mysql_tables()
+    parser = argparse.ArgumentParser(description="Run the cluster simulator server")
+    parser.add_argument("--no-docker", action="store_true",
+                        help="Simulation only: never import or contact Docker")
+    args = parser.parse_args()
+    if args.no_docker:
+        disable_docker()
+
+    # Initialize storage (STORAGE_BACKEND; fails if the schema is newer than this code)
+    if timed_phase("storage_connect", connect_storage) and timed_phase("storage_init", init_storage):
         
-        # Load state from MySQL
-        load_cluster_state()
+        # Load state from storage
+        timed_phase("state_load", load_cluster_state)
         
         # Start background tasks
-        background_tasks()
+        timed_phase("thread_start", background_tasks)
+        report_startup()
         
         # Start server
         socketio.run(app, host="0.0.0.0", port=5000, debug=True)
         
-        # Close MySQL connection on exit
-        close_connection()
+        # Write outstanding events, snapshot the cluster and close storage on exit
+        flush_events_tick()
+        snapshot_tick()
+        close_storage()
     else:
-        print("Failed to initialize MySQL database. Exiting.")
+        print("Failed to initialize storage. Exiting.")
 
@@ -0,0 +1,89 @@
+import json
+import os
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # binary frames fall back to a columnar JSON body
+    msgpack = None
+
+# Encodings of `state_update` payloads, negotiated per Socket.IO client.
+#
+#   json            - the plain state dict, as before (default, and for old clients)
+#   binary          - one bytes frame: a flag byte followed by the columnar state,
+#                     MessagePack-encoded when msgpack is installed, UTF-8 JSON otherwise
+#   binary+deflate  - as binary, and bodies over COMPRESS_THRESHOLD bytes are
+#                     zlib-compressed (DecompressionStream("deflate") in browsers)
+#
+# Columnar state replaces the repeated per-record keys with one key list and one
+# value array per key; pods are flattened into their own table with the index of
+# the node that holds them.
+FORMATS = ("json", "binary", "binary+deflate")
+FLAG_DEFLATE = 0x01
+FLAG_MSGPACK = 0x02
+COMPRESS_THRESHOLD = int(os.environ.get("STATE_COMPRESS_THRESHOLD", 4096))  # bytes
+COMPRESS_LEVEL = 6
+
+def negotiate_format(encoding, compression):
+    """Pick the state format for a client from its `encoding` and `compression` query args."""
+    if encoding not in ("msgpack", "binary"):
+        return "json"
+    return "binary+deflate" if compression == "deflate" else "binary"
+
+def to_columns(records, skip=()):
+    """{"keys": [...], "columns": [[...], ...]} for a list of dicts; missing values become None."""
+    keys = []
+    for record in records:
+        for key in record:
+            if key not in skip and key not in keys:
+                keys.append(key)
+    return {"keys": keys, "columns": [[record.get(key) for record in records] for key in keys]}
+
+def from_columns(table):
+    keys, columns = table["keys"], table["columns"]
+    return [dict(zip(keys, row)) for row in zip(*columns)] if columns else []
+
+def encode_columnar(state):
+    """Columnar form of a {"nodes", "logs", "history"} state."""
+    nodes = state["nodes"]
+    pods = [dict(p, node_index=i) for i, n in enumerate(nodes) for p in n["pods"]]
+    return {
+        "nodes": to_columns(nodes, skip=("pods",)),
+        "pods": to_columns(pods),
+        "logs": list(state["logs"]),
+        "history": to_columns(state["history"]),
+    }
+
+def decode_columnar(doc):
+    """Inverse of encode_columnar (absent record fields come back as None)."""
+    nodes = from_columns(doc["nodes"])
+    for n in nodes:
+        n["pods"] = []
+    for pod in from_columns(doc["pods"]):
+        nodes[pod.pop("node_index")]["pods"].append(pod)
+    return {"nodes": nodes, "logs": doc["logs"], "history": from_columns(doc["history"])}
+
+def encode_frame(state, compress):
+    """Encode a state dict as a binary frame."""
+    doc = encode_columnar(state)
+    if msgpack is not None:
+        flags, body = FLAG_MSGPACK, msgpack.packb(doc, use_bin_type=True)
+    else:
+        flags, body = 0, json.dumps(doc, separators=(",", ":")).encode()
+    if compress and len(body) > COMPRESS_THRESHOLD:
+        flags, body = flags | FLAG_DEFLATE, zlib.compress(body, COMPRESS_LEVEL)
+    return bytes([flags]) + body
+
+def decode_frame(frame):
+    """Decode a frame produced by encode_frame back into a state dict."""
+    flags, body = frame[0], frame[1:]
+    if flags & FLAG_DEFLATE:
+        body = zlib.decompress(body)
+    doc = msgpack.unpackb(body, raw=False) if flags & FLAG_MSGPACK else json.loads(body)
+    return decode_columnar(doc)
+
+def encode_state(state, fmt):
+    """The `state_update` payload for a client format."""
+    if fmt == "json":
+        return state
+    return encode_frame(state, compress=fmt == "binary+deflate")
@@ -7,8 +7,52 @@ const {
   Tab, Tabs
 } = MaterialUI;
 
-// Socket.io client connection
-const socket = io();
+// Socket.io client connection. The state encoding is negotiated on connect:
+// with MessagePack available we ask for binary columnar frames, compressed
+// when the browser can inflate them; otherwise the server keeps sending JSON.
+const supportsBinaryState = typeof MessagePack !== 'undefined';
+const supportsDeflate = typeof DecompressionStream !== 'undefined';
+const socket = io({
+  query: {
+    encoding: supportsBinaryState ? 'msgpack' : 'json',
+    compression: supportsDeflate ? 'deflate' : 'none'
+  }
+});
+
+// Binary state frames: one flag byte, then the columnar state body
+const FLAG_DEFLATE = 0x01;
+const FLAG_MSGPACK = 0x02;
+
+const columnsToRecords = ({ keys, columns }) => {
+  const count = columns.length ? columns[0].length : 0;
+  const records = new Array(count);
+  for (let i = 0; i < count; i++) {
+    const record = {};
+    keys.forEach((key, k) => { record[key] = columns[k][i]; });
+    records[i] = record;
+  }
+  return records;
+};
+
+const decodeStateFrame = async (buffer) => {
+  const frame = new Uint8Array(buffer);
+  let body = frame.subarray(1);
+  if (frame[0] & FLAG_DEFLATE) {
+    const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream('deflate'));
+    body = new Uint8Array(await new Response(stream).arrayBuffer());
+  }
+  const doc = (frame[0] & FLAG_MSGPACK)
+    ? MessagePack.decode(body)
+    : JSON.parse(new TextDecoder().decode(body));
+
+  const nodes = columnsToRecords(doc.nodes);
+  nodes.forEach((node) => { node.pods = []; });
+  columnsToRecords(doc.pods).forEach((pod) => {
+    nodes[pod.node_index].pods.push(pod);
+    delete pod.node_index;
+  });
+  return { nodes, logs: doc.logs, history: columnsToRecords(doc.history) };
+};
 
 // Main App Component
 const App = () => {
@@ -20,6 +64,8 @@ const App = () => {
   const [notification, setNotification] = React.useState({ open: false, message: '' });
   const [drawerOpen, setDrawerOpen] = React.useState(false);
   const [currentTab, setCurrentTab] = React.useState(0);
+  const [groupFilter, setGroupFilter] = React.useState('');
+  const [knownGroups, setKnownGroups] = React.useState([]);
   const [nodeForm, setNodeForm] = React.useState({
     cpu: 8,
     memory: 16,
@@ -36,9 +82,22 @@ const App = () => {
 
   React.useEffect(() => {
     // Listen for state updates from socket
-    socket.on("state_update", (state) => {
-      setNodes(state.nodes || []);
-      setLogs(state.logs || []);
+    // Frames are decoded in arrival order so an older state never overwrites a newer one
+    let decoding = Promise.resolve();
+    socket.on("state_update", (payload) => {
+      const isFrame = payload instanceof ArrayBuffer || ArrayBuffer.isView(payload);
+      decoding = decoding
+        .then(() => (isFrame ? decodeStateFrame(payload) : payload))
+        .then((state) => {
+          setNodes(state.nodes || []);
+          setLogs(state.logs || []);
+          setKnownGroups((groups) => {
+            const seen = new Set(groups);
+            (state.nodes || []).forEach((node) => seen.add(node.network_group));
+            return seen.size === groups.length ? groups : Array.from(seen).sort();
+          });
+        })
+        .catch((error) => console.error('Failed to decode state update:', error));
     });
     
     // Listen for alerts
@@ -59,6 +118,17 @@ const App = () => {
     };
   }, [darkMode]);
 
+  // Only receive the selected network group; reconnects resubscribe through the query
+  const firstSubscription = React.useRef(true);
+  React.useEffect(() => {
+    socket.io.opts.query.network_group = groupFilter;
+    if (firstSubscription.current) {
+      firstSubscription.current = false;
+      return;
+    }
+    socket.emit('subscribe', groupFilter ? { network_group: groupFilter } : {});
+  }, [groupFilter]);
+
   const addNode = async () => {
     try {
       const response = await fetch('/api/add_node', {
@@ -174,6 +244,7 @@ const App = () => {
 
   const getClusterStats = () => {
     const activeNodes = nodes.filter(n => n.status === "active").length;
+    const suspectNodes = nodes.filter(n => n.status === "suspect").length;
     const totalCpu = nodes.reduce((acc, n) => acc + n.cpu_total, 0);
     const availableCpu = nodes.reduce((acc, n) => acc + n.cpu_available, 0);
     const usedCpu = totalCpu - availableCpu;
@@ -183,6 +254,7 @@ const App = () => {
     
     return {
       activeNodes,
+      suspectNodes,
       totalNodes: nodes.length,
       utilization: utilization.toFixed(1),
       totalPods
@@ -223,6 +295,20 @@ const App = () => {
           <Typography variant="h6" style={{ flexGrow: 1, marginLeft: '12px' }}>
             Distributed Cluster Management
           </Typography>
+          <TextField
+            select
+            value={groupFilter}
+            onChange={(e) => setGroupFilter(e.target.value)}
+            SelectProps={{ displayEmpty: true }}
+            style={{ minWidth: 160, marginRight: 16, background: 'rgba(255,255,255,0.85)', borderRadius: 4 }}
+            size="small"
+            variant="outlined"
+          >
+            <MenuItem value="">All groups</MenuItem>
+            {knownGroups.map((group) => (
+              <MenuItem key={group} value={group}>{group}</MenuItem>
+            ))}
+          </TextField>
           <FormControlLabel
             control={
               <Switch 
@@ -309,7 +395,9 @@ const App = () => {
                 <Paper className="resource-card card">
                   <span className="material-icons resource-icon">storage</span>
                   <Typography variant="h3" className="metric-value">{stats.activeNodes}</Typography>
-                  <Typography variant="subtitle1" className="metric-label">Active Nodes</Typography>
+                  <Typography variant="subtitle1" className="metric-label">
+                    Active Nodes{stats.suspectNodes > 0 && ` (${stats.suspectNodes} suspect)`}
+                  </Typography>
                 </Paper>
               </Grid>
               <Grid item xs={12} md={6} lg={3}>
@@ -451,8 +539,9 @@ const App = () => {
                         <div>
                           <Chip 
                             label={node.status.toUpperCase()} 
-                            color={node.status === "active" ? "primary" : "secondary"} 
+                            color={node.status === "active" ? "primary" : node.status === "suspect" ? "default" : "secondary"} 
                             size="small"
+                            className={`status-${node.status}`}
                             style={{ marginRight: 8 }}
                           />
                           <Chip 
@@ -0,0 +1,843 @@
+import os
+import sqlite3
+import time
+import uuid
+from bisect import insort
+from itertools import count
+from threading import Lock, RLock
+
+from journal import StateJournal
+
+# Persistence backends for the simulator, chosen with STORAGE_BACKEND:
+#
+#   mysql   mysql_db.py against MYSQL_* (default)
+#   sqlite  a local SQLite file (SQLITE_PATH) in WAL mode; single-row writes are
+#           committed in batches of SQLITE_BATCH_SIZE or every SQLITE_COMMIT_INTERVAL
+#           seconds, and on flush()/close
+#   memory  plain dicts; nothing survives a restart (benchmarks, simulations)
+#
+# Every backend implements Storage and passes test_storage.py. The module-level
+# functions at the bottom are bound to the selected backend, so callers import
+# them exactly as they used to import mysql_db's. Node and pod writes that the
+# mysql or sqlite backend accepted are also appended to a local journal in
+# STATE_DIR (see journal.py; set STATE_DIR= to disable), which lets a restart
+# skip reading the cluster back from the backend. A snapshot is only used with
+# the database it was taken against, and only if no backend write had failed.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mysql")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "cluster_sim.db")
+SQLITE_BATCH_SIZE = int(os.environ.get("SQLITE_BATCH_SIZE", 500))
+SQLITE_COMMIT_INTERVAL = float(os.environ.get("SQLITE_COMMIT_INTERVAL", 1.0))  # seconds
+STATE_DIR = os.environ.get("STATE_DIR", "cluster_state")
+
+# Days of history kept by prune_expired_rows
+EVENT_LOG_RETENTION_DAYS = float(os.environ.get("EVENT_LOG_RETENTION_DAYS", 30))
+UTILIZATION_RETENTION_DAYS = float(os.environ.get("UTILIZATION_RETENTION_DAYS", 30))
+HOURLY_ROLLUP_RETENTION_DAYS = float(os.environ.get("HOURLY_ROLLUP_RETENTION_DAYS", 365))
+
+NODE_COLUMNS = ("node_id", "cpu_total", "cpu_available", "memory_total", "memory_available",
+                "node_type", "network_group", "last_heartbeat", "status", "simulate_heartbeat", "container_id")
+POD_COLUMNS = ("pod_id", "node_id", "cpu", "memory", "network_group", "node_affinity", "scheduling_algorithm")
+OPTIONAL_POD_COLUMNS = ("node_affinity", "scheduling_algorithm")  # kept by updates that omit them
+EVENT_COLUMNS = ("timestamp", "type", "severity", "node_id", "pod_id", "event")
+EVENT_FILTER_COLUMNS = ("type", "severity", "node_id", "pod_id")
+ROLLUP_STATS = ("cpu_min", "cpu_max", "cpu_avg", "cpu_p95",
+                "memory_min", "memory_max", "memory_avg", "memory_p95", "samples")
+
+def retention_policies(now):
+    """[(table, rollup resolution or None, cutoff timestamp)] for prune_expired_rows."""
+    day = 86400
+    return [
+        ("event_logs", None, now - EVENT_LOG_RETENTION_DAYS * day),
+        ("utilization_history", None, now - UTILIZATION_RETENTION_DAYS * day),
+        ("utilization_rollups", "1m", now - UTILIZATION_RETENTION_DAYS * day),
+        ("utilization_rollups", "1h", now - HOURLY_ROLLUP_RETENTION_DAYS * day),
+    ]
+
+def group_pods_by_node(rows):
+    """(node row, [pod rows]) pairs from joined rows ordered by node_id."""
+    node, pods = None, []
+    for row in rows:
+        if node is None or row["node_id"] != node["node_id"]:
+            if node is not None:
+                yield node, pods
+            node, pods = {c: row[c] for c in NODE_COLUMNS}, []
+        if row["pod_id"] is not None:
+            pods.append({"pod_id": row["pod_id"], "node_id": row["node_id"], "cpu": row["cpu"],
+                         "memory": row["memory"], "network_group": row["pod_network_group"],
+                         "node_affinity": row["node_affinity"], "scheduling_algorithm": row["scheduling_algorithm"]})
+    if node is not None:
+        yield node, pods
+
+def check_event_filters(filters):
+    for column in filters or {}:
+        if column not in EVENT_FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter event logs by {column}")
+
+def node_row(node):
+    return {c: node.get(c) for c in NODE_COLUMNS}
+
+def pod_row(pod):
+    """Pod columns present in `pod`; missing OPTIONAL_POD_COLUMNS stay missing (save_pod keeps the stored ones)."""
+    return {c: pod[c] for c in POD_COLUMNS if c in pod}
+
+class Storage:
+    """What the simulator persists. Write methods return True on success."""
+
+    name = None
+
+    def connect(self):
+        """Open the backend; False if it is unreachable."""
+        return True
+
+    def init_tables(self):
+        """Create or migrate the schema; False if it cannot be used."""
+        return True
+
+    def close(self):
+        pass
+
+    def flush(self):
+        """Make buffered writes durable."""
+        return True
+
+    def identity(self):
+        """Backend, location and instance id of the database, recorded in local snapshots. Call after init_tables."""
+        return self.name
+
+    def get_nodes(self):
+        raise NotImplementedError
+
+    def get_pods(self):
+        raise NotImplementedError
+
+    def get_logs(self, filters=None, since=None, before=None, limit=50):
+        """Events newest first, filtered by EVENT_FILTER_COLUMNS and since <= timestamp < before."""
+        raise NotImplementedError
+
+    def get_utilization_history(self):
+        """The 50 newest utilization records, newest first."""
+        raise NotImplementedError
+
+    def iter_pods(self):
+        """Every pod, ordered by pod_id."""
+        raise NotImplementedError
+
+    def iter_utilization_history(self, since=None, until=None):
+        """Utilization records in time order with since <= timestamp <= until."""
+        raise NotImplementedError
+
+    def iter_nodes_with_pods(self):
+        """(node row, [pod rows]) for every node, ordered by node_id and streamed rather than loaded whole."""
+        raise NotImplementedError
+
+    def save_node(self, node):
+        raise NotImplementedError
+
+    def save_nodes(self, nodes):
+        raise NotImplementedError
+
+    def delete_node(self, node_id):
+        """Delete a node and the pods placed on it."""
+        raise NotImplementedError
+
+    def save_pod(self, pod):
+        """Insert or update a pod; an update without node_affinity or scheduling_algorithm keeps the stored one."""
+        raise NotImplementedError
+
+    def update_pod_node(self, pod_id, new_node_id):
+        raise NotImplementedError
+
+    def save_reschedule(self, removed_node_ids, moves, nodes):
+        """In one transaction: move pods to new nodes ([(pod_id, node_id)]), delete the removed
+        nodes and the pods left on them, and save the nodes that received pods."""
+        raise NotImplementedError
+
+    def save_events(self, events):
+        raise NotImplementedError
+
+    def record_utilization(self, utilization):
+        raise NotImplementedError
+
+    def save_utilization_rollups(self, rollups):
+        raise NotImplementedError
+
+    def get_utilization_rollups(self, resolution, scope, scope_id, start, end):
+        """Rollups of one series with start <= timestamp < end, oldest first."""
+        raise NotImplementedError
+
+    def prune_expired_rows(self, now=None):
+        """Delete history past its retention. Returns {table: rows deleted}."""
+        raise NotImplementedError
+
+class MySQLStorage(Storage):
+    """mysql_db.py behind the Storage interface."""
+
+    name = "mysql"
+
+    def __init__(self):
+        import mysql_db  # only this backend needs mysql-connector
+        self.db = mysql_db
+        self.instance_id = None
+        self.iter_nodes_with_pods = lambda: group_pods_by_node(mysql_db.iter_nodes_with_pods())
+        for method in ("get_nodes", "get_pods", "get_logs", "get_utilization_history", "iter_pods",
+                       "iter_utilization_history", "save_node", "save_nodes", "delete_node", "save_pod",
+                       "update_pod_node", "save_reschedule", "save_events", "record_utilization", "save_utilization_rollups",
+                       "get_utilization_rollups"):
+            setattr(self, method, getattr(mysql_db, method))
+
+    def connect(self):
+        return self.db.connect_to_mysql()
+
+    def init_tables(self):
+        if not self.db.init_mysql_tables():
+            return False
+        self.instance_id = self.db.get_instance_id()
+        return self.instance_id is not None
+
+    def close(self):
+        self.db.close_connection()
+
+    def identity(self):
+        config = self.db.DB_CONFIG
+        return f"mysql://{config['host']}/{config['database']}#{self.instance_id}"
+
+    def prune_expired_rows(self, now=None):
+        return self.db.prune_expired_rows(retention_policies(now or time.time()))
+
+SQLITE_SCHEMA_VERSION = 2  # PRAGMA user_version of the layout below
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    cpu_total INTEGER NOT NULL,
+    cpu_available INTEGER NOT NULL,
+    memory_total INTEGER NOT NULL,
+    memory_available INTEGER NOT NULL,
+    node_type TEXT NOT NULL,
+    network_group TEXT NOT NULL,
+    last_heartbeat REAL,
+    status TEXT NOT NULL,
+    simulate_heartbeat INTEGER NOT NULL,
+    container_id TEXT
+);
+CREATE TABLE IF NOT EXISTS pods (
+    pod_id TEXT PRIMARY KEY,
+    node_id TEXT NOT NULL,
+    cpu INTEGER NOT NULL,
+    memory INTEGER NOT NULL,
+    network_group TEXT NOT NULL,
+    node_affinity TEXT,
+    scheduling_algorithm TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pods_node ON pods (node_id);
+CREATE TABLE IF NOT EXISTS event_logs (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    type TEXT NOT NULL DEFAULT 'info',
+    severity TEXT NOT NULL DEFAULT 'info',
+    node_id TEXT,
+    pod_id TEXT,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_event_logs_timestamp ON event_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_event_logs_type ON event_logs (type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_event_logs_node ON event_logs (node_id, timestamp);
+CREATE TABLE IF NOT EXISTS utilization_history (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    utilization REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_utilization_history_timestamp ON utilization_history (timestamp);
+CREATE TABLE IF NOT EXISTS utilization_rollups (
+    id INTEGER PRIMARY KEY,
+    resolution TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    scope_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    cpu_min REAL NOT NULL,
+    cpu_max REAL NOT NULL,
+    cpu_avg REAL NOT NULL,
+    cpu_p95 REAL NOT NULL,
+    memory_min REAL NOT NULL,
+    memory_max REAL NOT NULL,
+    memory_avg REAL NOT NULL,
+    memory_p95 REAL NOT NULL,
+    samples INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_series ON utilization_rollups (resolution, scope, scope_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rollups_retention ON utilization_rollups (resolution, timestamp);
+CREATE TABLE IF NOT EXISTS storage_instance (
+    id INTEGER PRIMARY KEY,
+    instance_id TEXT NOT NULL
+);
+"""
+# Statements that bring a file at the previous user_version up to this one
+SQLITE_MIGRATIONS = [
+    (2, "ALTER TABLE pods ADD COLUMN scheduling_algorithm TEXT"),
+]
+# Columns of the unversioned (user_version 0) cluster.db the original server wrote
+LEGACY_EVENT_COLUMNS = ("id", "timestamp", "message")  # local-time text timestamps
+LEGACY_REQUIRED_COLUMNS = {
+    "nodes": set(NODE_COLUMNS),
+    "pods": set(POD_COLUMNS) - {"scheduling_algorithm"},
+    "utilization_history": {"timestamp", "utilization"},
+}
+
+class UnknownLayout(Exception):
+    """An unversioned SQLite file whose tables match neither this layout nor the legacy one."""
+
+class SQLiteStorage(Storage):
+    """One SQLite file in WAL mode, shared by all threads through a single connection."""
+
+    name = "sqlite"
+
+    def __init__(self, path=None, batch_size=None, commit_interval=None):
+        self.path = path or SQLITE_PATH
+        self.batch_size = batch_size or SQLITE_BATCH_SIZE
+        self.commit_interval = SQLITE_COMMIT_INTERVAL if commit_interval is None else commit_interval
+        self.connection = None
+        self.instance_id = None
+        self.lock = RLock()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def connect(self):
+        try:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.connection.row_factory = sqlite3.Row
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only risks the last commits on power loss, never corruption
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            print(f"✅ Opened SQLite database {self.path}")
+            return True
+        except sqlite3.Error as e:
+            print(f"❌ Failed to open SQLite database {self.path}: {e}")
+            return False
+
+    def init_tables(self):
+        with self.lock:
+            try:
+                version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+                if version > SQLITE_SCHEMA_VERSION:
+                    print(f"❌ SQLite schema version {version} is newer than this code supports ({SQLITE_SCHEMA_VERSION})")
+                    return False
+                if version:
+                    before, after = [statement for target, statement in SQLITE_MIGRATIONS if target > version], []
+                else:
+                    before, after = self.legacy_migrations()
+                # One transaction: a failed upgrade leaves the file as it was
+                self.connection.executescript(
+                    "".join(f"{statement};\n" for statement in ["BEGIN", *before])
+                    + SQLITE_SCHEMA
+                    + "".join(f"{statement};\n" for statement in
+                              [*after, f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}", "COMMIT"]))
+                # A random id per database file, so a recreated file is told apart from the old one
+                self.connection.execute("INSERT OR IGNORE INTO storage_instance (id, instance_id) VALUES (1, ?)",
+                                        (uuid.uuid4().hex,))
+                self.instance_id = self.connection.execute(
+                    "SELECT instance_id FROM storage_instance WHERE id = 1").fetchone()[0]
+            except UnknownLayout as e:
+                print(f"❌ {self.path} is not a cluster database this code can upgrade: {e}")
+                return False
+            except sqlite3.Error as e:
+                if self.connection.in_transaction:
+                    self.connection.execute("ROLLBACK")
+                print(f"❌ Failed to initialize SQLite tables in {self.path}: {e}")
+                return False
+        return True
+
+    def legacy_migrations(self):
+        """(before, after) statements around SQLITE_SCHEMA that upgrade an unversioned file.
+
+        A new file needs none. The original server's layout is upgraded: pods
+        gain scheduling_algorithm and event_logs is rebuilt with epoch timestamps.
+        """
+        tables = {row[0]: {col[1] for col in self.connection.execute(f"PRAGMA table_info({row[0]})")}
+                  for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        before, after = [], []
+        for table, required in LEGACY_REQUIRED_COLUMNS.items():
+            if table in tables and not required <= tables[table]:
+                raise UnknownLayout(f"table {table} lacks {', '.join(sorted(required - tables[table]))}")
+        if "pods" in tables and "scheduling_algorithm" not in tables["pods"]:
+            before.append("ALTER TABLE pods ADD COLUMN scheduling_algorithm TEXT")
+        events = tables.get("event_logs")
+        if events is not None and not set(EVENT_COLUMNS) <= events:
+            if not set(LEGACY_EVENT_COLUMNS) <= events:
+                raise UnknownLayout(f"table event_logs has columns {', '.join(sorted(events))}")
+            before.append("ALTER TABLE event_logs RENAME TO legacy_event_logs")
+            after += [
+                "INSERT INTO event_logs (id, timestamp, event) "
+                "SELECT id, COALESCE(CAST(strftime('%s', timestamp, 'utc') AS REAL), 0), COALESCE(message, '') "
+                "FROM legacy_event_logs",
+                "DROP TABLE legacy_event_logs",
+            ]
+        return before, after
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    def identity(self):
+        return f"sqlite://{os.path.abspath(self.path)}#{self.instance_id}"
+
+    def flush(self):
+        with self.lock:
+            if self.uncommitted:
+                self.connection.execute("COMMIT")
+                self.uncommitted = 0
+            self.last_commit = time.monotonic()
+        return True
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def write(self, sql, params_list):
+        """Run a statement per parameter tuple inside the open batch transaction."""
+        return self.write_all([(sql, params_list)])
+
+    def write_all(self, statements):
+        """Run [(sql, params_list)] inside the open batch transaction; a batch commit never splits them."""
+        statements = [(sql, params_list) for sql, params_list in statements if params_list]
+        if not statements:
+            return True
+        with self.lock:
+            if not self.uncommitted:
+                self.connection.execute("BEGIN")
+            # A savepoint undoes just these statements, not the other writes in the batch
+            self.connection.execute("SAVEPOINT write_all")
+            for sql, params_list in statements:
+                try:
+                    self.connection.executemany(sql, params_list)
+                except sqlite3.Error as e:
+                    print(f"Error writing to SQLite: {e}")
+                    print(f"Query: {sql}")
+                    self.connection.execute("ROLLBACK TO write_all")
+                    self.connection.execute("RELEASE write_all")
+                    if not self.uncommitted:
+                        self.connection.execute("ROLLBACK")
+                    return False
+            self.connection.execute("RELEASE write_all")
+            self.uncommitted += sum(len(params_list) for _, params_list in statements)
+            if (self.uncommitted >= self.batch_size
+                    or time.monotonic() - self.last_commit >= self.commit_interval):
+                self.flush()
+        return True
+
+    def iter_query(self, sql, params=(), batch_size=1000):
+        """Stream rows over a separate read connection; WAL readers never block the writer.
+
+        The query runs before this returns, so its failure raises sqlite3.Error here.
+        """
+        self.flush()
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        try:
+            cursor = connection.execute(sql, params)
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return self.fetch_rows(connection, cursor, batch_size)
+
+    @staticmethod
+    def fetch_rows(connection, cursor, batch_size):
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from (dict(row) for row in rows)
+        finally:
+            connection.close()
+
+    def get_nodes(self):
+        return self.query("SELECT * FROM nodes")
+
+    def get_pods(self):
+        return self.query("SELECT * FROM pods")
+
+    def get_logs(self, filters=None, since=None, before=None, limit=50):
+        check_event_filters(filters)
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            conditions.append(f"{column} = ?")
+            params.append(value)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if before is not None:
+            conditions.append("timestamp < ?")
+            params.append(before)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.query(f"SELECT {', '.join(EVENT_COLUMNS)} FROM event_logs{where} "
+                          "ORDER BY timestamp DESC LIMIT ?", (*params, limit))
+
+    def get_utilization_history(self):
+        return self.query("SELECT * FROM utilization_history ORDER BY timestamp DESC LIMIT 50")
+
+    def iter_pods(self):
+        return self.iter_query(f"SELECT {', '.join(POD_COLUMNS)} FROM pods ORDER BY pod_id")
+
+    def iter_nodes_with_pods(self):
+        return group_pods_by_node(self.iter_query(
+            f"SELECT {', '.join('n.' + c for c in NODE_COLUMNS)}, p.pod_id, p.cpu, p.memory, "
+            "p.network_group AS pod_network_group, p.node_affinity, p.scheduling_algorithm "
+            "FROM nodes n LEFT JOIN pods p ON p.node_id = n.node_id ORDER BY n.node_id, p.pod_id"))
+
+    def iter_utilization_history(self, since=None, until=None):
+        return self.iter_query("SELECT timestamp, utilization FROM utilization_history "
+                               "WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp",
+                               (since or 0, until or time.time()))
+
+    def save_node(self, node):
+        return self.save_nodes([node])
+
+    def save_nodes(self, nodes):
+        updates = ", ".join(f"{c} = excluded.{c}" for c in NODE_COLUMNS[1:])
+        sql = (f"INSERT INTO nodes ({', '.join(NODE_COLUMNS)}) VALUES ({', '.join('?' * len(NODE_COLUMNS))}) "
+               f"ON CONFLICT(node_id) DO UPDATE SET {updates}")
+        return self.write(sql, [tuple(node_row(n).values()) for n in nodes])
+
+    def delete_node(self, node_id):
+        return (self.write("DELETE FROM pods WHERE node_id = ?", [(node_id,)])
+                and self.write("DELETE FROM nodes WHERE node_id = ?", [(node_id,)]))
+
+    def save_pod(self, pod):
+        updated = [c for c in POD_COLUMNS[1:] if c not in OPTIONAL_POD_COLUMNS or c in pod]
+        sql = (f"INSERT INTO pods ({', '.join(POD_COLUMNS)}) VALUES ({', '.join('?' * len(POD_COLUMNS))}) "
+               f"ON CONFLICT(pod_id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updated)}")
+        return self.write(sql, [tuple(pod.get(c) for c in POD_COLUMNS)])
+
+    def update_pod_node(self, pod_id, new_node_id):
+        return self.write("UPDATE pods SET node_id = ? WHERE pod_id = ?", [(new_node_id, pod_id)])
+
+    def save_reschedule(self, removed_node_ids, moves, nodes):
+        updates = ", ".join(f"{c} = excluded.{c}" for c in NODE_COLUMNS[1:])
+        removed = [(node_id,) for node_id in removed_node_ids]
+        return self.write_all([
+            ("UPDATE pods SET node_id = ? WHERE pod_id = ?", [(node_id, pod_id) for pod_id, node_id in moves]),
+            ("DELETE FROM pods WHERE node_id = ?", removed),
+            ("DELETE FROM nodes WHERE node_id = ?", removed),
+            (f"INSERT INTO nodes ({', '.join(NODE_COLUMNS)}) VALUES ({', '.join('?' * len(NODE_COLUMNS))}) "
+             f"ON CONFLICT(node_id) DO UPDATE SET {updates}", [tuple(node_row(n).values()) for n in nodes]),
+        ])
+
+    def save_events(self, events):
+        sql = f"INSERT INTO event_logs ({', '.join(EVENT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)"
+        return self.write(sql, [tuple(e[c] for c in EVENT_COLUMNS) for e in events])
+
+    def record_utilization(self, utilization):
+        return self.write("INSERT INTO utilization_history (timestamp, utilization) VALUES (?, ?)",
+                          [(time.time(), utilization)])
+
+    def save_utilization_rollups(self, rollups):
+        columns = ("resolution", "scope", "scope_id", "timestamp") + ROLLUP_STATS
+        sql = f"INSERT INTO utilization_rollups ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        return self.write(sql, [tuple(r[c] for c in columns) for r in rollups])
+
+    def get_utilization_rollups(self, resolution, scope, scope_id, start, end):
+        return self.query(f"SELECT timestamp, {', '.join(ROLLUP_STATS)} FROM utilization_rollups "
+                          "WHERE resolution = ? AND scope = ? AND scope_id = ? AND timestamp >= ? AND timestamp < ? "
+                          "ORDER BY timestamp", (resolution, scope, scope_id, start, end))
+
+    def prune_expired_rows(self, now=None):
+        deleted = {}
+        for table, resolution, cutoff in retention_policies(now or time.time()):
+            condition, params = ("resolution = ? AND timestamp < ?", (resolution, cutoff)) if resolution \
+                else ("timestamp < ?", (cutoff,))
+            # Batches by rowid range so no single transaction holds the write lock for long
+            while True:
+                with self.lock:
+                    self.flush()
+                    cursor = self.connection.execute(
+                        f"DELETE FROM {table} WHERE rowid IN "
+                        f"(SELECT rowid FROM {table} WHERE {condition} ORDER BY timestamp LIMIT ?)",
+                        (*params, self.batch_size))
+                deleted[table] = deleted.get(table, 0) + cursor.rowcount
+                if cursor.rowcount < self.batch_size:
+                    break
+        return deleted
+
+class MemoryStorage(Storage):
+    """Everything in process memory; for benchmarks and throwaway simulations."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.lock = Lock()
+        self.nodes = {}
+        self.pods = {}
+        self.events = []  # sorted by timestamp
+        self.utilization = []  # sorted by timestamp
+        self.rollups = {}  # (resolution, scope, scope_id) -> rows sorted by timestamp
+        self.ids = count(1)
+
+    def get_nodes(self):
+        with self.lock:
+            return [dict(n) for n in self.nodes.values()]
+
+    def get_pods(self):
+        with self.lock:
+            return [dict(p) for p in self.pods.values()]
+
+    def get_logs(self, filters=None, since=None, before=None, limit=50):
+        check_event_filters(filters)
+        filters = filters or {}
+        logs = []
+        with self.lock:
+            for _, _, e in reversed(self.events):
+                if len(logs) == limit:
+                    break
+                if ((since is None or e["timestamp"] >= since) and (before is None or e["timestamp"] < before)
+                        and all(e[c] == v for c, v in filters.items())):
+                    logs.append(dict(e))
+        return logs
+
+    def get_utilization_history(self):
+        with self.lock:
+            return [dict(r) for _, _, r in reversed(self.utilization[-50:])]
+
+    def iter_pods(self):
+        with self.lock:
+            pods = sorted(self.pods.values(), key=lambda p: p["pod_id"])
+        return (dict(p) for p in pods)
+
+    def iter_nodes_with_pods(self):
+        with self.lock:
+            nodes = sorted(self.nodes.values(), key=lambda n: n["node_id"])
+            pods = {}
+            for p in self.pods.values():
+                pods.setdefault(p["node_id"], []).append(dict(p))
+        return ((dict(n), sorted(pods.get(n["node_id"], []), key=lambda p: p["pod_id"])) for n in nodes)
+
+    def iter_utilization_history(self, since=None, until=None):
+        since, until = since or 0, until or time.time()
+        with self.lock:
+            records = [r for _, _, r in self.utilization if since <= r["timestamp"] <= until]
+        return ({"timestamp": r["timestamp"], "utilization": r["utilization"]} for r in records)
+
+    def save_node(self, node):
+        return self.save_nodes([node])
+
+    def save_nodes(self, nodes):
+        with self.lock:
+            for n in nodes:
+                self.nodes[n["node_id"]] = node_row(n)
+        return True
+
+    def delete_node(self, node_id):
+        with self.lock:
+            self.pods = {pid: p for pid, p in self.pods.items() if p["node_id"] != node_id}
+            self.nodes.pop(node_id, None)
+        return True
+
+    def save_pod(self, pod):
+        with self.lock:
+            row = {c: pod.get(c) for c in POD_COLUMNS}
+            stored = self.pods.get(pod["pod_id"])
+            if stored is not None:
+                for column in OPTIONAL_POD_COLUMNS:
+                    if column not in pod:
+                        row[column] = stored[column]
+            self.pods[pod["pod_id"]] = row
+        return True
+
+    def update_pod_node(self, pod_id, new_node_id):
+        with self.lock:
+            if pod_id in self.pods:
+                self.pods[pod_id]["node_id"] = new_node_id
+        return True
+
+    def save_reschedule(self, removed_node_ids, moves, nodes):
+        with self.lock:
+            for pod_id, node_id in moves:
+                if pod_id in self.pods:
+                    self.pods[pod_id]["node_id"] = node_id
+            removed = set(removed_node_ids)
+            self.pods = {pid: p for pid, p in self.pods.items() if p["node_id"] not in removed}
+            for node_id in removed:
+                self.nodes.pop(node_id, None)
+            for n in nodes:
+                self.nodes[n["node_id"]] = node_row(n)
+        return True
+
+    def save_events(self, events):
+        with self.lock:
+            for e in events:
+                # (timestamp, insertion id) keeps equal timestamps in insertion order
+                insort(self.events, (e["timestamp"], next(self.ids), {c: e[c] for c in EVENT_COLUMNS}))
+        return True
+
+    def record_utilization(self, utilization):
+        with self.lock:
+            record_id = next(self.ids)
+            ts = time.time()
+            insort(self.utilization, (ts, record_id, {"id": record_id, "timestamp": ts, "utilization": utilization}))
+        return True
+
+    def save_utilization_rollups(self, rollups):
+        with self.lock:
+            for r in rollups:
+                series = self.rollups.setdefault((r["resolution"], r["scope"], r["scope_id"]), [])
+                insort(series, (r["timestamp"], next(self.ids), {c: r[c] for c in ("timestamp",) + ROLLUP_STATS}))
+        return True
+
+    def get_utilization_rollups(self, resolution, scope, scope_id, start, end):
+        with self.lock:
+            series = self.rollups.get((resolution, scope, scope_id), [])
+            return [dict(r) for ts, _, r in series if start <= ts < end]
+
+    def prune_expired_rows(self, now=None):
+        deleted = {}
+        with self.lock:
+            for table, resolution, cutoff in retention_policies(now or time.time()):
+                if table == "utilization_rollups":
+                    for key, series in self.rollups.items():
+                        if key[0] == resolution:
+                            kept = [r for r in series if r[0] >= cutoff]
+                            deleted[table] = deleted.get(table, 0) + len(series) - len(kept)
+                            self.rollups[key] = kept
+                    continue
+                rows = self.events if table == "event_logs" else self.utilization
+                kept = [r for r in rows if r[0] >= cutoff]
+                deleted[table] = len(rows) - len(kept)
+                rows[:] = kept
+        return deleted
+
+BACKENDS = {"mysql": MySQLStorage, "sqlite": SQLiteStorage, "memory": MemoryStorage}
+
+def create_storage(name=None):
+    name = name or STORAGE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+storage = create_storage()
+# Nothing in the memory backend outlives the process, so neither may a journal of it
+state_journal = StateJournal(STATE_DIR) if STATE_DIR and storage.name != "memory" else None
+backend_diverged = False  # a journaled write failed in the backend; memory now holds changes it lacks
+
+# Storage writes mirrored to the journal, with how their arguments are recorded
+JOURNALED_WRITES = {
+    "save_node": ("save_nodes", lambda node: [[node_row(node)]]),
+    "save_nodes": ("save_nodes", lambda nodes: [[node_row(n) for n in nodes]]),
+    "delete_node": ("delete_node", lambda node_id: [node_id]),
+    "save_pod": ("save_pod", lambda pod: [pod_row(pod)]),
+    "update_pod_node": ("update_pod_node", lambda pod_id, node_id: [pod_id, node_id]),
+    "save_reschedule": ("save_reschedule", lambda removed_node_ids, moves, nodes: [
+        list(removed_node_ids), [list(move) for move in moves], [node_row(n) for n in nodes]]),
+}
+
+def journaled(name):
+    write = getattr(storage, name)
+    if state_journal is None:
+        return write
+    op, to_args = JOURNALED_WRITES[name]
+
+    def journaled_write(*args):
+        global backend_diverged
+        ok = write(*args)
+        # Journal only what the backend accepted, so snapshot + journal never runs ahead of it
+        if ok:
+            state_journal.append(op, to_args(*args))
+        else:
+            backend_diverged = True
+        return ok
+    return journaled_write
+
+def init_storage():
+    """Create or migrate the backend schema, then start the local journal."""
+    if not storage.init_tables():
+        return False
+    if state_journal is not None:
+        state_journal.open()
+    return True
+
+def flush_storage():
+    if state_journal is not None:
+        state_journal.flush()
+    return storage.flush()
+
+def close_storage():
+    if state_journal is not None:
+        state_journal.close()
+    storage.close()
+
+class StaleSnapshot(Exception):
+    """The local snapshot does not describe the backend's current contents."""
+
+def load_journaled_state():
+    """(iterator of (node row, [pod rows]), snapshot meta, pod_ids saved since the snapshot)
+    from the local snapshot and journal, or None when there is no usable snapshot.
+
+    A snapshot taken against another backend or database, or after a backend
+    write failed, is discarded along with its journals.
+    """
+    if state_journal is None or not os.path.isdir(state_journal.directory):
+        return None
+    replica = MemoryStorage()
+    meta, tail_pod_ids = {}, []
+
+    def apply(op, args):
+        if op == "load_snapshot":
+            node_rows, pod_rows, snapshot_meta = args
+            if snapshot_meta.get("backend") != storage.identity():
+                raise StaleSnapshot(f"taken against {snapshot_meta.get('backend') or 'an unknown backend'}")
+            if not snapshot_meta.get("backend_in_sync"):
+                raise StaleSnapshot("taken after a backend write failed")
+            replica.save_nodes(node_rows)
+            for pod in pod_rows:
+                replica.save_pod(pod)
+            meta.update(snapshot_meta)
+        elif op in ("save_nodes", "delete_node", "save_pod", "update_pod_node", "save_reschedule"):
+            if op == "save_pod":
+                tail_pod_ids.append(args[0]["pod_id"])
+            getattr(replica, op)(*args)
+
+    try:
+        if state_journal.load(apply) is None:
+            return None
+    except StaleSnapshot as e:
+        print(f"⚠️  Ignoring local state snapshot ({e}); loading from {storage.name}")
+        state_journal.discard_older()
+        return None
+    return replica.iter_nodes_with_pods(), meta, tail_pod_ids
+
+def snapshot_state(capture):
+    """Start a new journal and write a snapshot of `capture()` -> (node rows, pod rows, meta).
+
+    Skipped when nothing changed since the last snapshot. Returns True if one was written.
+    """
+    if state_journal is None or not state_journal.dirty:
+        return False
+    number = state_journal.rotate()
+    try:
+        node_rows, pod_rows, meta = capture()
+        # Checked after the capture: a failure before it may have left memory ahead of the backend
+        meta = dict(meta, backend=storage.identity(), backend_in_sync=not backend_diverged)
+        state_journal.write_snapshot(number, node_rows, pod_rows, meta)
+    except Exception:
+        state_journal.dirty = True  # the older snapshot and journals are still intact
+        raise
+    return True
+
+connect_storage = storage.connect
+get_nodes = storage.get_nodes
+get_pods = storage.get_pods
+get_logs = storage.get_logs
+get_utilization_history = storage.get_utilization_history
+iter_pods = storage.iter_pods
+iter_utilization_history = storage.iter_utilization_history
+iter_nodes_with_pods = storage.iter_nodes_with_pods
+save_node = journaled("save_node")
+save_nodes = journaled("save_nodes")
+delete_node = journaled("delete_node")
+save_pod = journaled("save_pod")
+update_pod_node = journaled("update_pod_node")
+save_reschedule = journaled("save_reschedule")
+save_events = storage.save_events
+record_utilization = storage.record_utilization
+save_utilization_rollups = storage.save_utilization_rollups
+get_utilization_rollups = storage.get_utilization_rollups
+prune_expired_rows = storage.prune_expired_rows
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+def add_nodes(cluster, count, **fields):
+    return [cluster.handle_add_node({"cpu": 4, "memory": 8, **fields})[0]["node_id"] for _ in range(count)]
+
+def launch_pods(cluster, count, group="default"):
+    for _ in range(count):
+        body, status = cluster.handle_launch_pod({"cpu_required": 1, "memory_required": 1, "network_group": group})
+        assert status == 200, body
+
+def chaos(cluster, **data):
+    body, status = cluster.handle_chaos_monkey(data)
+    assert status == 200, body
+    return body
+
+def incidents(cluster):
+    return cluster.handle_chaos_incidents({})[0]["incidents"]
+
+def check_timings(incident):
+    for field in ("reschedule_seconds", "autoscale_seconds", "recovery_seconds", "detect_seconds"):
+        assert incident[field] is not None and incident[field] >= 0, field
+    assert incident["recovery_seconds"] >= incident["reschedule_seconds"]
+
+def test_node_mode_kills_the_named_node_without_replacing_it(cluster):
+    victim, survivor = add_nodes(cluster, 2)
+    launch_pods(cluster, 2)
+    body = chaos(cluster, mode="node", node_id=victim)
+    assert body["message"] == f"Killed node {victim}"
+    assert set(cluster.nodes) == {survivor}
+    incident = body["incident"]
+    assert (incident["mode"], incident["target"], incident["status"]) == ("node", victim, "recovered")
+    assert incident["failed_nodes"] == 1 and incident["replacements"] == 0
+    assert incident["displaced_pods"] == incident["rescheduled"] + incident["unschedulable"]
+    assert incident["detect_seconds"] == 0.0
+    check_timings(incident)
+
+def test_node_mode_reports_unknown_and_empty_targets(cluster):
+    assert "not found" in chaos(cluster, mode="node", node_id="nope")["message"]
+    assert chaos(cluster, mode="node")["message"] == "No active nodes"
+    assert incidents(cluster)[0]["status"] == "no_targets"
+
+def test_percent_mode_picks_a_share_of_the_matching_nodes(cluster):
+    edge = add_nodes(cluster, 4, network_group="edge", node_type="high_cpu")
+    add_nodes(cluster, 4, network_group="edge", node_type="high_mem")
+    default = add_nodes(cluster, 4, node_type="high_cpu")
+    incident = chaos(cluster, mode="percent", percent=50, node_type="high_cpu", network_group="edge")["incident"]
+    assert incident["target"] == "50% high_cpu edge"
+    assert incident["failed_nodes"] == incident["replacements"] == 2
+    assert len([nid for nid in edge if nid not in cluster.nodes]) == 2
+    assert all(nid in cluster.nodes for nid in default)
+    check_timings(incident)
+
+def test_percent_mode_kills_at_least_one_node(cluster):
+    add_nodes(cluster, 3)
+    assert chaos(cluster, mode="percent", percent=1)["incident"]["failed_nodes"] == 1
+
+@pytest.mark.parametrize("data", [{"mode": "percent", "percent": 0}, {"mode": "percent", "percent": "x"},
+                                  {"mode": "group", "network_group": "nowhere"}, {"mode": "meteor"},
+                                  {"mode": "partition", "network_group": "default", "duration": -1}])
+def test_bad_requests_are_rejected(cluster, data):
+    add_nodes(cluster, 1)
+    assert cluster.handle_chaos_monkey(data)[1] == 400
+    assert incidents(cluster) == []
+
+def test_group_mode_fails_every_active_node_of_the_group(cluster):
+    edge = add_nodes(cluster, 3, network_group="edge")
+    default = add_nodes(cluster, 2)
+    launch_pods(cluster, 3, group="edge")
+    incident = chaos(cluster, mode="group", network_group="edge")["incident"]
+    assert (incident["mode"], incident["target"], incident["status"]) == ("group", "edge", "recovered")
+    assert incident["failed_nodes"] == incident["replacements"] == 3
+    assert incident["displaced_pods"] == 3
+    # Pods stay in their group, which has no live node left
+    assert incident["unschedulable"] == 3 and incident["rescheduled"] == 0
+    assert not set(edge) & set(cluster.nodes) and set(default) <= set(cluster.nodes)
+    check_timings(incident)
+
+    # Nothing left to kill in the group
+    assert chaos(cluster, mode="group", network_group="edge")["incident"]["status"] == "no_targets"
+
+def test_partition_drops_heartbeats_until_it_expires_and_then_heals(cluster):
+    nid, = add_nodes(cluster, 1, network_group="edge")
+    body = chaos(cluster, mode="partition", network_group="edge", duration=30)
+    assert body["incident"]["status"] == "partitioned" and body["incident"]["duration"] == 30
+    assert cluster.handle_heartbeat({"node_id": nid})[1] == 503
+    assert cluster.handle_chaos_monkey({"mode": "partition", "network_group": "edge"})[1] == 409
+
+    cluster.active_partitions["edge"]["ends_at"] = time.time() - 1  # let it lapse
+    assert incidents(cluster)[0]["status"] == "healed"  # nothing failed while it lasted
+    assert cluster.partition_of("edge") is None
+    assert cluster.handle_heartbeat({"node_id": nid})[1] == 200
+
+def test_partition_failures_are_detected_by_the_health_check(cluster):
+    edge = add_nodes(cluster, 2, network_group="edge")
+    add_nodes(cluster, 1)
+    chaos(cluster, mode="partition", network_group="edge", duration=30)
+    for nid in edge:
+        with cluster.locked_node(nid) as n:
+            n["last_heartbeat"] = time.time() - 600
+    cluster.health_check_tick()
+    incident = incidents(cluster)[0]
+    assert incident["status"] == "partitioned"  # still in force
+    assert incident["failed_nodes"] == incident["replacements"] == 2
+    assert incident["detect_seconds"] is not None
+    check_timings(incident)
+
+    cluster.active_partitions["edge"]["ends_at"] = time.time() - 1
+    assert incidents(cluster)[0]["status"] == "recovered"
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+import pytest
+
+from failure_detector import HeartbeatHistory, PhiAccrualDetector, phi
+
+def test_phi_grows_as_heartbeats_stop():
+    detector = PhiAccrualDetector(first_estimate=5.0, acceptable_pause=0.0)
+    for i in range(20):
+        detector.heartbeat("n1", i * 5.0)
+    levels = [detector.phi("n1", elapsed) for elapsed in (1, 5, 8, 12, 20, 60)]
+    assert levels == sorted(levels)
+    assert levels[0] < 0.1 and levels[-1] > 12
+    assert phi(5.0, 5.0, 1.0) == pytest.approx(np.log10(2), abs=0.01)  # on time: even odds
+
+def test_jittery_nodes_get_more_slack():
+    steady, jittery = PhiAccrualDetector(), PhiAccrualDetector()
+    for i in range(50):
+        steady.heartbeat("n", i * 7.0)
+        jittery.heartbeat("n", i * 7.0 + (3.0 if i % 2 else 0.0))
+    assert jittery.phi("n", 15) < steady.phi("n", 15)
+
+def test_reset_forgets_the_old_rhythm():
+    detector = PhiAccrualDetector(first_estimate=7.0)
+    for i in range(30):
+        detector.heartbeat("n1", i * 1.0)
+    fast = detector.phi("n1", 6)
+    detector.reset("n1")
+    assert detector.phi("n1", 6) < fast
+    assert detector.history("n1").last is None
+
+def test_history_keeps_bounded_running_sums():
+    history = HeartbeatHistory(window=4, first_estimate=8.0)
+    assert history.count == 2 and history.mean_std() == pytest.approx((8.0, 2.0))
+    for interval in (1.0, 2.0, 3.0, 4.0, 5.0, 6.0):
+        history.add(interval)
+    assert history.count == 4 and len(history.intervals) == 4
+    assert sorted(history.intervals) == [3.0, 4.0, 5.0, 6.0]
+    assert history.total == pytest.approx(18.0)
+    assert history.total_sq == pytest.approx(9 + 16 + 25 + 36)
+    assert history.mean_std() == pytest.approx((4.5, np.std([3, 4, 5, 6])))
+
+def test_out_of_order_heartbeats_add_no_interval():
+    detector = PhiAccrualDetector()
+    detector.heartbeat("n1", 10.0)
+    detector.heartbeat("n1", 9.0)
+    assert detector.history("n1").count == 2  # only the two seed intervals
+
+def silence_for(cluster, nid, seconds):
+    """Make a node's last heartbeat `seconds` old and run one health check."""
+    with cluster.locked_node(nid) as n:
+        n["last_heartbeat"] = time.time() - seconds
+    cluster.health_check_tick()
+
+def first_silence(detector, nid, threshold):
+    return next(s for s in range(1, 600) if detector.phi(nid, s) >= threshold)
+
+def test_nodes_go_active_suspect_failed(cluster):
+    nid = cluster.handle_add_node({"cpu": 4})[0]["node_id"]
+    detector = cluster.shards["default"].detector
+    suspect_after = first_silence(detector, nid, cluster.PHI_SUSPECT_THRESHOLD)
+    fail_after = first_silence(detector, nid, cluster.PHI_FAIL_THRESHOLD)
+    assert suspect_after < fail_after
+
+    silence_for(cluster, nid, suspect_after - 1)
+    assert cluster.nodes[nid]["status"] == "active"
+    silence_for(cluster, nid, suspect_after + 0.5)
+    assert cluster.nodes[nid]["status"] == "suspect"
+    assert cluster.count_nodes()[1:] == (0, 1)
+
+    # A heartbeat clears the suspicion
+    assert cluster.handle_heartbeat({"node_id": nid})[1] == 200
+    assert cluster.nodes[nid]["status"] == "active"
+
+    silence_for(cluster, nid, fail_after + 0.5)
+    assert nid not in cluster.nodes  # failed: its pods were rescheduled and the node dropped
+    failed = cluster.handle_logs({"node_id": nid, "type": "node_failed"})[0]["logs"]
+    assert len(failed) == 1
+    assert cluster.count_nodes() == (1, 1, 0)  # the replacement
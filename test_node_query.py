@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from node_query import NodeIndex, list_nodes_response
+
+def make_node(i, **overrides):
+    node = {"node_id": f"n{i:02d}", "status": "active", "network_group": "default", "node_type": "balanced",
+            "cpu_total": 8, "cpu_available": i % 8, "memory_total": 16, "memory_available": 2 * (i % 8),
+            "pods": [{"pod_id": f"pod_{i}"}]}
+    node.update(overrides)
+    return node
+
+NODES = [make_node(i, status="failed" if i % 5 == 0 else "active",
+                   network_group="edge" if i % 2 else "default",
+                   node_type=("balanced", "high_cpu", "high_mem")[i % 3])
+         for i in range(23)]
+
+def query(args, nodes=NODES, revision=7, if_none_match=None):
+    full = json.dumps({"nodes": nodes})
+    body, status, headers = list_nodes_response("boot", revision, args, if_none_match,
+                                                lambda: full, lambda: NodeIndex(nodes))
+    return (json.loads(body) if body else None), status, headers
+
+def test_plain_request_returns_the_whole_cluster():
+    body, status, headers = query({})
+    assert status == 200 and body == {"nodes": NODES}
+    assert headers["X-Cluster-Revision"] == "7"
+
+def test_cursor_pages_cover_every_node_once_in_order():
+    seen, cursor = [], None
+    for _ in range(10):
+        args = {"limit": "5", **({"cursor": cursor} if cursor else {})}
+        body, status, _ = query(args)
+        assert status == 200 and body["revision"] == 7 and len(body["nodes"]) <= 5
+        seen += [n["node_id"] for n in body["nodes"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(n["node_id"] for n in NODES)
+
+def test_cursor_survives_nodes_removed_between_pages():
+    body, _, _ = query({"limit": "3"})
+    remaining = [n for n in NODES if n["node_id"] != body["next_cursor"]]
+    page, _, _ = query({"limit": "3", "cursor": body["next_cursor"]}, nodes=remaining)
+    assert [n["node_id"] for n in page["nodes"]] == ["n03", "n04", "n05"]
+
+@pytest.mark.parametrize("args, expected", [
+    ({"status": "failed"}, lambda n: n["status"] == "failed"),
+    ({"network_group": "edge"}, lambda n: n["network_group"] == "edge"),
+    ({"node_type": "high_mem"}, lambda n: n["node_type"] == "high_mem"),
+    ({"min_cpu": "6"}, lambda n: n["cpu_available"] >= 6),
+    ({"min_memory": "10.5"}, lambda n: n["memory_available"] >= 10.5),
+    ({"status": "active", "network_group": "default", "min_cpu": "2"},
+     lambda n: n["status"] == "active" and n["network_group"] == "default" and n["cpu_available"] >= 2),
+])
+def test_filters(args, expected):
+    body, status, _ = query(args)
+    assert status == 200
+    assert [n["node_id"] for n in body["nodes"]] == [n["node_id"] for n in NODES if expected(n)]
+    assert body["next_cursor"] is None
+
+def test_fields_projection_and_pods():
+    body, _, _ = query({"fields": "status,cpu_available", "limit": "2"})
+    assert body["nodes"] == [{"node_id": "n00", "status": "failed", "cpu_available": 0},
+                             {"node_id": "n01", "status": "active", "cpu_available": 1}]
+    body, _, _ = query({"include_pods": "false"})
+    assert all("pods" not in n and n["cpu_total"] == 8 for n in body["nodes"])
+    body, _, _ = query({"include_pods": "true", "limit": "1"})
+    assert body["nodes"][0]["pods"] == [{"pod_id": "pod_0"}]
+
+@pytest.mark.parametrize("args", [{"min_cpu": "lots"}, {"limit": "0"}, {"limit": "x"}])
+def test_bad_queries_are_400(args):
+    body, status, _ = query(args)
+    assert status == 400 and body["error"].startswith("Invalid query")
+
+def test_etag_gives_304_until_the_revision_changes():
+    _, _, headers = query({})
+    etag = headers["ETag"]
+    assert query({}, if_none_match=etag)[1] == 304
+    assert query({"limit": "2"}, if_none_match=f'W/{etag}, "other"')[1] == 304
+    assert query({}, revision=8, if_none_match=etag)[1] == 200
+
+def test_list_nodes_endpoint_revalidates(cluster):
+    client = cluster.app.test_client()
+    cluster.handle_add_node({"cpu": 4, "network_group": "edge"})
+    first = client.get("/api/list_nodes?network_group=edge")
+    assert first.status_code == 200 and len(first.json["nodes"]) == 1
+    etag = first.headers["ETag"]
+    assert client.get("/api/list_nodes", headers={"If-None-Match": etag}).status_code == 304
+    cluster.handle_add_node({"cpu": 4})
+    changed = client.get("/api/list_nodes", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and len(changed.json["nodes"]) == 2
+    assert changed.headers["ETag"] != etag
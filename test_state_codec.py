@@ -0,0 +1,101 @@
+import json
+import zlib
+
+import pytest
+
+import state_codec
+from state_codec import (FLAG_DEFLATE, FLAG_MSGPACK, FORMATS, decode_frame, encode_state, negotiate_format)
+
+def make_state(node_count=3, pods_per_node=2):
+    nodes = tuple(
+        {"node_id": f"n{i}", "cpu_total": 8, "cpu_available": 8 - pods_per_node, "memory_total": 16,
+         "memory_available": 16 - 2 * pods_per_node, "node_type": ("balanced", "high_cpu")[i % 2],
+         "network_group": ("default", "edge")[i % 2], "status": "active", "last_heartbeat": 1000.5 + i,
+         "simulate_heartbeat": True, "container_id": None,
+         "pods": [{"pod_id": f"pod_{i}_{j}", "node_id": f"n{i}", "cpu": 1, "memory": 2,
+                   "network_group": ("default", "edge")[i % 2], "node_affinity": None} for j in range(pods_per_node)]}
+        for i in range(node_count)
+    )
+    return {"nodes": nodes, "logs": ["[t] Added node n0", "[t] Added node n1"],
+            "history": [{"timestamp": 1000.0 + i, "utilization": 12.5 * i} for i in range(4)]}
+
+def as_decoded(state):
+    """A state as decode_frame returns it (lists instead of tuples)."""
+    return json.loads(json.dumps(state))
+
+@pytest.fixture(params=["msgpack", "json"])
+def body_codec(request, monkeypatch):
+    """Run each test with and without msgpack installed."""
+    if request.param == "msgpack":
+        pytest.importorskip("msgpack")
+    else:
+        monkeypatch.setattr(state_codec, "msgpack", None)
+    return request.param
+
+def test_negotiation():
+    assert negotiate_format(None, None) == "json"
+    assert negotiate_format("json", "deflate") == "json"
+    assert negotiate_format("msgpack", None) == "binary"
+    assert negotiate_format("binary", "deflate") == "binary+deflate"
+    assert set(FORMATS) == {"json", "binary", "binary+deflate"}
+
+def test_json_format_is_the_plain_state():
+    state = make_state()
+    assert encode_state(state, "json") is state
+
+@pytest.mark.parametrize("fmt", ["binary", "binary+deflate"])
+def test_binary_round_trip(fmt, body_codec):
+    state = make_state()
+    frame = encode_state(state, fmt)
+    assert isinstance(frame, bytes)
+    assert frame[0] & FLAG_MSGPACK == (FLAG_MSGPACK if body_codec == "msgpack" else 0)
+    assert not frame[0] & FLAG_DEFLATE  # small bodies are never compressed
+    assert decode_frame(frame) == as_decoded(state)
+
+def test_large_bodies_are_deflated_only_when_asked(body_codec):
+    state = make_state(node_count=200)
+    plain, deflated = encode_state(state, "binary"), encode_state(state, "binary+deflate")
+    assert len(plain) - 1 > state_codec.COMPRESS_THRESHOLD
+    assert not plain[0] & FLAG_DEFLATE and deflated[0] & FLAG_DEFLATE
+    assert len(deflated) < len(plain)
+    assert zlib.decompress(deflated[1:]) == plain[1:]  # the browser inflates the body after the flag byte
+    assert decode_frame(deflated) == decode_frame(plain) == as_decoded(state)
+
+def test_columnar_layout_the_dashboard_decodes(body_codec):
+    state = make_state(node_count=2, pods_per_node=1)
+    frame = encode_state(state, "binary")
+    if body_codec == "msgpack":
+        doc = state_codec.msgpack.unpackb(frame[1:], raw=False)
+    else:
+        doc = json.loads(frame[1:])
+    assert set(doc) == {"nodes", "pods", "logs", "history"}
+    assert "pods" not in doc["nodes"]["keys"]
+    assert doc["nodes"]["columns"][doc["nodes"]["keys"].index("node_id")] == ["n0", "n1"]
+    assert doc["pods"]["columns"][doc["pods"]["keys"].index("node_index")] == [0, 1]
+    assert doc["history"]["keys"] == ["timestamp", "utilization"]
+    assert doc["logs"] == state["logs"]
+
+def test_missing_fields_come_back_as_none(body_codec):
+    state = make_state(node_count=2, pods_per_node=0)
+    state["nodes"][1]["container_state"] = "running"
+    decoded = decode_frame(encode_state(state, "binary"))
+    assert decoded["nodes"][0]["container_state"] is None
+    assert decoded["nodes"][1]["container_state"] == "running"
+
+def test_empty_state_round_trips(body_codec):
+    state = {"nodes": (), "logs": [], "history": []}
+    assert decode_frame(encode_state(state, "binary+deflate")) == {"nodes": [], "logs": [], "history": []}
+
+@pytest.mark.parametrize("scope, node_ids", [
+    ("all", ["n0", "n1", "n2", "n3"]),
+    ("network_group=edge", ["n1", "n3"]),
+    ("node_id=n2", ["n2"]),
+    ("logs", []),
+])
+def test_scoped_slices_round_trip(cluster, scope, node_ids, body_codec):
+    state = make_state(node_count=4)
+    sliced = cluster.state_slice(state, scope)
+    decoded = decode_frame(encode_state(sliced, "binary+deflate"))
+    assert [n["node_id"] for n in decoded["nodes"]] == node_ids
+    assert decoded == as_decoded(sliced)
+    assert decoded["logs"] == state["logs"]
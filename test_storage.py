@@ -0,0 +1,257 @@
+import os
+import time
+
+import pytest
+
+from journal import StateJournal
+from storage import SQLITE_SCHEMA_VERSION, MemoryStorage, MySQLStorage, SQLiteStorage
+
+# Conformance suite every storage backend must pass. MySQL runs only with
+# TEST_MYSQL=1, against the MYSQL_* database, which must be a scratch one.
+DAY = 86400
+
+def make_node(node_id, **overrides):
+    node = {
+        "node_id": node_id, "cpu_total": 8, "cpu_available": 8, "memory_total": 16, "memory_available": 16,
+        "node_type": "balanced", "network_group": "default", "last_heartbeat": 1000.5, "status": "active",
+        "simulate_heartbeat": True, "container_id": None, "pods": [], "container_state": None,
+    }
+    node.update(overrides)
+    return node
+
+def make_pod(pod_id, node_id, **overrides):
+    pod = {"pod_id": pod_id, "node_id": node_id, "cpu": 1, "memory": 2, "network_group": "default"}
+    pod.update(overrides)
+    return pod
+
+def make_event(ts, event, event_type="info", node_id=None):
+    return {"timestamp": ts, "type": event_type, "severity": "info", "node_id": node_id, "pod_id": None, "event": event}
+
+def make_rollup(resolution, ts, scope_id="all"):
+    return {"resolution": resolution, "scope": "cluster", "scope_id": scope_id, "timestamp": ts,
+            "cpu_min": 1.0, "cpu_max": 2.0, "cpu_avg": 1.5, "cpu_p95": 1.9,
+            "memory_min": 3.0, "memory_max": 4.0, "memory_avg": 3.5, "memory_p95": 3.9, "samples": 6}
+
+@pytest.fixture(params=["memory", "sqlite", "mysql"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryStorage()
+    elif request.param == "sqlite":
+        backend = SQLiteStorage(str(tmp_path / "cluster.db"))
+    else:
+        if os.environ.get("TEST_MYSQL") != "1":
+            pytest.skip("set TEST_MYSQL=1 to run against MySQL")
+        backend = MySQLStorage()
+    assert backend.connect()
+    assert backend.init_tables()
+    if request.param == "mysql":
+        for table in ("pods", "nodes", "event_logs", "utilization_history", "utilization_rollups"):
+            backend.db.execute_query(f"DELETE FROM {table}", fetch=False)
+    yield backend
+    backend.close()
+
+def test_nodes_insert_update_and_delete(store):
+    assert store.save_node(make_node("n1"))
+    assert store.save_node(make_node("n1", cpu_available=3, status="failed", container_id="abc"))
+    assert store.save_nodes([make_node("n2"), make_node("n3", simulate_heartbeat=False)])
+    nodes = {n["node_id"]: n for n in store.get_nodes()}
+    assert set(nodes) == {"n1", "n2", "n3"}
+    assert (nodes["n1"]["cpu_available"], nodes["n1"]["status"], nodes["n1"]["container_id"]) == (3, "failed", "abc")
+    assert bool(nodes["n3"]["simulate_heartbeat"]) is False
+    assert "pods" not in nodes["n1"]
+
+    store.save_pod(make_pod("pod_1", "n2"))
+    store.save_pod(make_pod("pod_2", "n1"))
+    assert store.delete_node("n2")
+    assert {n["node_id"] for n in store.get_nodes()} == {"n1", "n3"}
+    assert [p["pod_id"] for p in store.get_pods()] == ["pod_2"]
+
+def test_pods_keep_affinity_and_stream_in_order(store):
+    store.save_nodes([make_node("n1"), make_node("n2")])
+    store.save_pod(make_pod("pod_2", "n1", node_affinity="high_cpu"))
+    store.save_pod(make_pod("pod_1", "n1"))
+    store.save_pod(make_pod("pod_2", "n1", cpu=3))  # no node_affinity: keep the stored one
+    assert store.update_pod_node("pod_1", "n2")
+    pods = list(store.iter_pods())
+    assert [p["pod_id"] for p in pods] == ["pod_1", "pod_2"]
+    assert pods[0]["node_id"] == "n2" and pods[0]["node_affinity"] is None
+    assert pods[1]["cpu"] == 3 and pods[1]["node_affinity"] == "high_cpu"
+
+def test_scheduling_algorithm_is_kept_like_affinity(store):
+    store.save_node(make_node("n1"))
+    store.save_pod(make_pod("pod_1", "n1", scheduling_algorithm="best_fit"))
+    store.save_pod(make_pod("pod_1", "n1", cpu=2))
+    assert [(p["cpu"], p["scheduling_algorithm"]) for p in store.iter_pods()] == [(2, "best_fit")]
+    pods = next(iter(store.iter_nodes_with_pods()))[1]
+    assert pods[0]["scheduling_algorithm"] == "best_fit"
+
+def test_save_reschedule_moves_pods_before_removing_nodes(store):
+    store.save_nodes([make_node("n1"), make_node("n2"), make_node("n3")])
+    for pod_id, node_id in (("pod_1", "n1"), ("pod_2", "n1"), ("pod_3", "n2"), ("pod_4", "n3")):
+        store.save_pod(make_pod(pod_id, node_id))
+    # n1 and n2 failed: pod_1 and pod_3 moved to n3, pod_2 could not be placed
+    assert store.save_reschedule(["n1", "n2"], [("pod_1", "n3"), ("pod_3", "n3")],
+                                 [make_node("n3", cpu_available=6, memory_available=12)])
+    assert [n["node_id"] for n in store.get_nodes()] == ["n3"]
+    assert store.get_nodes()[0]["cpu_available"] == 6
+    assert [(p["pod_id"], p["node_id"]) for p in store.iter_pods()] == [("pod_1", "n3"), ("pod_3", "n3"), ("pod_4", "n3")]
+
+def test_nodes_stream_with_their_pods(store):
+    store.save_nodes([make_node("n2"), make_node("n1"), make_node("n3")])
+    store.save_pod(make_pod("pod_2", "n1", node_affinity="high_mem"))
+    store.save_pod(make_pod("pod_1", "n1", network_group="edge"))
+    store.save_pod(make_pod("pod_3", "n3"))
+    store.save_pod(make_pod("pod_9", "gone"))  # pods of unknown nodes are not loaded
+    streamed = [(n["node_id"], [(p["pod_id"], p["network_group"], p["node_affinity"]) for p in pods])
+                for n, pods in store.iter_nodes_with_pods()]
+    assert streamed == [
+        ("n1", [("pod_1", "edge", None), ("pod_2", "default", "high_mem")]),
+        ("n2", []),
+        ("n3", [("pod_3", "default", None)]),
+    ]
+    node = next(iter(store.iter_nodes_with_pods()))[0]
+    assert set(node) == set(make_node("n1")) - {"pods", "container_state"}
+
+def test_logs_are_newest_first_filtered_and_paged(store):
+    store.save_events([make_event(100 + i, f"e{i}", "node_failed" if i % 2 else "info", f"n{i % 3}")
+                       for i in range(10)])
+    assert [e["event"] for e in store.get_logs(limit=3)] == ["e9", "e8", "e7"]
+    assert [e["event"] for e in store.get_logs({"type": "node_failed"}, limit=3)] == ["e9", "e7", "e5"]
+    assert [e["event"] for e in store.get_logs({"node_id": "n0"})] == ["e9", "e6", "e3", "e0"]
+    assert [e["event"] for e in store.get_logs(since=107)] == ["e9", "e8", "e7"]
+    assert [e["event"] for e in store.get_logs(before=102)] == ["e1", "e0"]
+    entry = store.get_logs(limit=1)[0]
+    assert {k: entry[k] for k in ("timestamp", "type", "severity", "node_id", "pod_id")} == \
+        {"timestamp": 109, "type": "node_failed", "severity": "info", "node_id": "n0", "pod_id": None}
+    with pytest.raises(ValueError):
+        store.get_logs({"event": "e1"})
+
+def test_utilization_history(store):
+    start = time.time()
+    for value in range(55):
+        assert store.record_utilization(float(value))
+        time.sleep(0.001)  # distinct timestamps on coarse clocks
+    history = store.get_utilization_history()
+    assert len(history) == 50
+    assert history[0]["utilization"] == 54.0
+    assert [r["timestamp"] for r in history] == sorted((r["timestamp"] for r in history), reverse=True)
+    streamed = list(store.iter_utilization_history(since=start - 1))
+    assert [r["utilization"] for r in streamed] == [float(v) for v in range(55)]
+    assert list(store.iter_utilization_history(until=start - 1)) == []
+
+def test_rollups_range_query(store):
+    store.save_utilization_rollups([make_rollup("1m", 60 * i) for i in range(5)] + [make_rollup("1h", 0)])
+    rows = store.get_utilization_rollups("1m", "cluster", "all", 60, 240)
+    assert [r["timestamp"] for r in rows] == [60, 120, 180]
+    assert rows[0]["cpu_p95"] == pytest.approx(1.9) and int(rows[0]["samples"]) == 6
+    assert store.get_utilization_rollups("1m", "cluster", "other", 0, 1000) == []
+
+def test_prune_expired_rows(store):
+    now = time.time()
+    store.save_events([make_event(now - 40 * DAY, "old"), make_event(now, "new")])
+    store.save_utilization_rollups([make_rollup("1m", now - 40 * DAY), make_rollup("1h", now - 40 * DAY)])
+    store.record_utilization(50.0)
+    deleted = store.prune_expired_rows(now)
+    assert deleted["event_logs"] == 1
+    assert deleted["utilization_rollups"] == 1
+    assert deleted["utilization_history"] == 0
+    assert [e["event"] for e in store.get_logs()] == ["new"]
+    assert len(store.get_utilization_rollups("1h", "cluster", "all", 0, now)) == 1
+
+def test_sqlite_batches_survive_reopen(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    store = SQLiteStorage(path, batch_size=1000, commit_interval=3600)
+    assert store.connect() and store.init_tables()
+    for i in range(10):
+        store.save_node(make_node(f"n{i}"))
+    assert len(store.get_nodes()) == 10  # uncommitted writes are visible to the writer
+    store.close()
+    reopened = SQLiteStorage(path)
+    assert reopened.connect() and reopened.init_tables()
+    assert len(reopened.get_nodes()) == 10
+    reopened.close()
+
+def test_sqlite_refuses_newer_schema(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    store = SQLiteStorage(path)
+    assert store.connect()
+    store.connection.execute("PRAGMA user_version = 99")
+    assert not store.init_tables()
+    store.close()
+
+def test_sqlite_upgrades_version_1_files(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    store = SQLiteStorage(path)
+    assert store.connect()
+    store.connection.executescript("CREATE TABLE pods (pod_id TEXT PRIMARY KEY, node_id TEXT NOT NULL, "
+                                   "cpu INTEGER NOT NULL, memory INTEGER NOT NULL, network_group TEXT NOT NULL, "
+                                   "node_affinity TEXT); PRAGMA user_version = 1;")
+    store.connection.execute("INSERT INTO pods VALUES ('pod_1', 'n1', 1, 2, 'default', NULL)")
+    assert store.init_tables()
+    assert [p["scheduling_algorithm"] for p in store.iter_pods()] == [None]
+    store.close()
+
+def test_sqlite_upgrades_the_legacy_unversioned_layout(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    store = SQLiteStorage(path)
+    assert store.connect()
+    store.connection.executescript(
+        "CREATE TABLE event_logs (id INTEGER PRIMARY KEY, timestamp TEXT, message TEXT);"
+        "CREATE TABLE utilization_history (id INTEGER PRIMARY KEY, timestamp REAL, utilization REAL);"
+        "CREATE TABLE pods (pod_id TEXT PRIMARY KEY, node_id TEXT, cpu INTEGER, memory INTEGER, "
+        "network_group TEXT, node_affinity TEXT);"
+        "INSERT INTO event_logs (timestamp, message) VALUES ('2025-04-22 22:16:58', 'Added node n1');")
+    assert store.init_tables()
+    assert [e["event"] for e in store.get_logs()] == ["Added node n1"]
+    assert isinstance(store.get_logs()[0]["timestamp"], float)
+    assert store.connection.execute("PRAGMA user_version").fetchone()[0] == SQLITE_SCHEMA_VERSION
+    store.close()
+
+def test_sqlite_reports_unknown_or_broken_layouts(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "unknown.db"))
+    assert store.connect()
+    store.connection.execute("CREATE TABLE nodes (node_id TEXT PRIMARY KEY)")
+    assert not store.init_tables()
+    store.close()
+    store = SQLiteStorage(str(tmp_path / "broken.db"))
+    assert store.connect()
+    store.connection.executescript("CREATE TABLE event_logs (id INTEGER PRIMARY KEY, timestamp REAL);"
+                                   f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION};")
+    assert not store.init_tables()  # the schema's indexes name columns the table lacks
+    assert not store.connection.in_transaction
+    store.close()
+
+def test_sqlite_identity_survives_reopen_but_not_recreation(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    identities = []
+    for _ in range(2):
+        store = SQLiteStorage(path)
+        assert store.connect() and store.init_tables()
+        identities.append(store.identity())
+        store.close()
+    os.remove(path)
+    store = SQLiteStorage(path)
+    assert store.connect() and store.init_tables()
+    assert identities[0] == identities[1] != store.identity()
+    assert store.identity().startswith(f"sqlite://{path}#")
+    store.close()
+
+def test_journal_replays_snapshot_then_tail(tmp_path):
+    journal = StateJournal(str(tmp_path))
+    journal.open()
+    journal.append("save_nodes", [[{"node_id": "old"}]])
+    number = journal.rotate()
+    journal.write_snapshot(number, [{"node_id": "n1"}], [{"pod_id": "pod_1", "node_id": "n1"}], {"pod_id_counter": 1})
+    journal.append("save_pod", [{"pod_id": "pod_2", "node_id": "n1"}])
+    journal.append("delete_node", ["n1"])
+    journal.close()
+    with open(journal.path("journal", number), "ab") as f:
+        f.write(b"\x00\x00\x00\x40partial")  # torn record from a crash
+
+    applied = []
+    assert StateJournal(str(tmp_path)).load(lambda op, args: applied.append((op, args))) == 2
+    assert applied == [
+        ("load_snapshot", [[{"node_id": "n1"}], [{"pod_id": "pod_1", "node_id": "n1"}], {"pod_id_counter": 1}]),
+        ("save_pod", [{"pod_id": "pod_2", "node_id": "n1"}]),
+        ("delete_node", ["n1"]),
+    ]
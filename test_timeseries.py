@@ -0,0 +1,35 @@
+from timeseries import HOUR, MINUTE, RAW, UtilizationStore, utilization_samples
+
+def test_buckets_close_when_the_next_sample_arrives():
+    store = UtilizationStore()
+    assert store.record(0, {("cluster", "all"): (10.0, 20.0)}) == []
+    store.record(30, {("cluster", "all"): (30.0, 40.0)})
+    rows = store.record(60, {("cluster", "all"): (50.0, 60.0)})
+    assert [(r["resolution"], r["timestamp"], r["samples"]) for r in rows] == [(MINUTE, 0, 2)]
+    assert (rows[0]["cpu_min"], rows[0]["cpu_max"], rows[0]["cpu_avg"]) == (10.0, 30.0, 20.0)
+    points, oldest = store.query("cluster", "all", RAW, 0, 61)
+    assert [p["timestamp"] for p in points] == [0, 30, 60] and oldest == 0
+
+def test_buckets_of_series_that_stop_reporting_still_close():
+    store = UtilizationStore()
+    store.record(0, {("node", "n1"): (10.0, 10.0), ("node", "n2"): (50.0, 50.0)})
+    rows = store.record(60, {("node", "n2"): (50.0, 50.0)})  # n1 was removed
+    assert [(r["scope_id"], r["resolution"]) for r in rows] == [("n1", MINUTE), ("n2", MINUTE)]
+    assert store.record(120, {}) != []  # n2's minute closes without a sample too
+    rows = store.record(3600, {})
+    assert sorted((r["scope_id"], r["resolution"]) for r in rows) == [("n1", HOUR), ("n2", HOUR)]
+    assert [p["samples"] for p in store.query("node", "n1", HOUR, 0, 3600)[0]] == [1]
+    assert store.record(3600, {}) == []  # closed once
+
+def test_samples_cover_live_nodes_only():
+    nodes = [
+        {"node_id": "a", "status": "active", "network_group": "g", "cpu_total": 4, "cpu_available": 1,
+         "memory_total": 8, "memory_available": 8},
+        {"node_id": "b", "status": "suspect", "network_group": "g", "cpu_total": 4, "cpu_available": 3,
+         "memory_total": 8, "memory_available": 0},
+        {"node_id": "c", "status": "failed", "network_group": "g", "cpu_total": 4, "cpu_available": 4,
+         "memory_total": 8, "memory_available": 8},
+    ]
+    samples = utilization_samples(nodes)
+    assert set(samples) == {("node", "a"), ("node", "b"), ("group", "g"), ("cluster", "all")}
+    assert samples[("cluster", "all")] == (50.0, 50.0)
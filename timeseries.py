@@ -0,0 +1,217 @@
+from threading import Lock
+
+import numpy as np
+
+# In-memory utilization time series.
+#
+# Every record tick adds one CPU/memory sample (percent in use over live
+# nodes, i.e. active or suspect) per node, per network_group and for the
+# whole cluster. Each series keeps fixed-size NumPy ring buffers at three
+# resolutions:
+#
+#   raw  the samples themselves
+#   1m   per-minute min/max/avg/p95, computed from raw samples when a minute closes
+#   1h   per-hour rollups computed from the minute rollups (p95 is the p95 of
+#        the minute p95s, so it is approximate)
+#
+# A bucket closes when a later sample arrives or, for a series that stopped
+# reporting (a removed or failed node), when a record tick passes its end.
+# Closed rollups are returned to the caller for bulk persistence; ranges older
+# than the ring buffers hold are served from the database.
+RAW, MINUTE, HOUR = "raw", "1m", "1h"
+RESOLUTION_SECONDS = {RAW: 0, MINUTE: 60, HOUR: 3600}
+METRICS = ("cpu", "memory")
+STATS = ("min", "max", "avg", "p95")
+COLUMNS = tuple(f"{m}_{s}" for m in METRICS for s in STATS) + ("samples",)
+
+# Ring buffer capacity per series kind and resolution. Node series are kept
+# short so memory stays small with many nodes; history beyond that is in MySQL.
+CAPACITY = {
+    "cluster": {RAW: 512, MINUTE: 1440, HOUR: 24 * 90},
+    "group": {RAW: 512, MINUTE: 1440, HOUR: 24 * 90},
+    "node": {RAW: 16, MINUTE: 120, HOUR: 48},
+}
+
+class RingBuffer:
+    """Fixed-capacity (timestamp, row) buffer in NumPy arrays, oldest entries overwritten."""
+
+    def __init__(self, capacity, width):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((capacity, width))
+        self.appended = 0
+
+    def append(self, ts, row):
+        i = self.appended % self.capacity
+        self.times[i] = ts
+        self.values[i] = row
+        self.appended += 1
+
+    def ordered(self):
+        """(times, values) oldest first."""
+        if self.appended <= self.capacity:
+            return self.times[:self.appended], self.values[:self.appended]
+        i = self.appended % self.capacity
+        return (np.concatenate((self.times[i:], self.times[:i])),
+                np.concatenate((self.values[i:], self.values[:i])))
+
+    def range(self, start, end):
+        """Entries with start <= timestamp < end."""
+        times, values = self.ordered()
+        lo, hi = np.searchsorted(times, start, "left"), np.searchsorted(times, end, "left")
+        return times[lo:hi], values[lo:hi]
+
+    def oldest(self):
+        if not self.appended:
+            return None
+        return self.times[self.appended % self.capacity if self.appended > self.capacity else 0]
+
+def summarize_samples(values):
+    """Rollup row from raw (cpu, memory) samples."""
+    row = []
+    for col in range(len(METRICS)):
+        v = values[:, col]
+        row += [v.min(), v.max(), v.mean(), np.percentile(v, 95)]
+    return row + [len(values)]
+
+def summarize_rollups(values):
+    """Rollup row from finer rollup rows."""
+    weights = values[:, -1]
+    row = []
+    for m in range(len(METRICS)):
+        base = m * len(STATS)
+        row += [values[:, base].min(), values[:, base + 1].max(),
+                np.average(values[:, base + 2], weights=weights),
+                np.percentile(values[:, base + 3], 95)]
+    return row + [weights.sum()]
+
+class Series:
+    """Ring buffers of one node, group or the cluster."""
+
+    def __init__(self, kind):
+        capacity = CAPACITY[kind]
+        self.raw = RingBuffer(capacity[RAW], len(METRICS))
+        self.rollups = {
+            MINUTE: RingBuffer(capacity[MINUTE], len(COLUMNS)),
+            HOUR: RingBuffer(capacity[HOUR], len(COLUMNS)),
+        }
+        self.open_bucket = {MINUTE: None, HOUR: None}  # start of the bucket being filled
+        self.last = None
+
+    def close_buckets(self, ts):
+        """Close the open buckets that end by `ts`. Returns [(resolution, bucket start, row)]."""
+        closed = []
+        for resolution, source, summarize in ((MINUTE, self.raw, summarize_samples),
+                                              (HOUR, self.rollups[MINUTE], summarize_rollups)):
+            seconds = RESOLUTION_SECONDS[resolution]
+            opened = self.open_bucket[resolution]
+            if opened is not None and ts >= opened + seconds:
+                _, values = source.range(opened, opened + seconds)
+                if len(values):
+                    row = summarize(values)
+                    self.rollups[resolution].append(opened, row)
+                    closed.append((resolution, opened, row))
+                self.open_bucket[resolution] = None
+        return closed
+
+    def add(self, ts, cpu, memory):
+        """Append a sample. Returns [(resolution, bucket start, row)] for buckets it closed."""
+        closed = self.close_buckets(ts)
+        for resolution in (MINUTE, HOUR):
+            seconds = RESOLUTION_SECONDS[resolution]
+            self.open_bucket[resolution] = ts - ts % seconds
+        self.raw.append(ts, (cpu, memory))
+        self.last = ts
+        return closed
+
+    def points(self, resolution, start, end):
+        """Points in [start, end) as dicts of COLUMNS plus timestamp."""
+        if resolution == RAW:
+            times, values = self.raw.range(start, end)
+            return [
+                {"timestamp": float(t), **{f"{m}_{s}": float(v[i]) for i, m in enumerate(METRICS) for s in STATS},
+                 "samples": 1}
+                for t, v in zip(times, values)
+            ]
+        times, values = self.rollups[resolution].range(start, end)
+        return [
+            {"timestamp": float(t), **{c: float(x) for c, x in zip(COLUMNS, v)}, "samples": int(v[-1])}
+            for t, v in zip(times, values)
+        ]
+
+    def oldest(self, resolution):
+        return self.raw.oldest() if resolution == RAW else self.rollups[resolution].oldest()
+
+def utilization_samples(nodes):
+    """{(scope, id): (cpu %, memory %)} in use over live nodes, per node, group and cluster."""
+    samples, totals = {}, {}
+    for n in nodes:
+        if n["status"] == "failed":
+            continue
+        used = (n["cpu_total"] - n["cpu_available"], n["cpu_total"],
+                n["memory_total"] - n["memory_available"], n["memory_total"])
+        samples[("node", n["node_id"])] = percent(used)
+        for key in (("group", n["network_group"]), ("cluster", "all")):
+            acc = totals.setdefault(key, [0, 0, 0, 0])
+            for i, x in enumerate(used):
+                acc[i] += x
+    samples.update((key, percent(acc)) for key, acc in totals.items())
+    return samples
+
+def percent(used):
+    cpu_used, cpu_total, mem_used, mem_total = used
+    return (100.0 * cpu_used / cpu_total if cpu_total else 0.0,
+            100.0 * mem_used / mem_total if mem_total else 0.0)
+
+def pick_resolution(step, start, end):
+    """Resolution for a query: the coarsest one not exceeding `step`, or by span when step is absent."""
+    if step in RESOLUTION_SECONDS:
+        return step
+    if step is not None:
+        seconds = float(step)
+        return HOUR if seconds >= 3600 else MINUTE if seconds >= 60 else RAW
+    span = end - start
+    return RAW if span <= 3600 else MINUTE if span <= 2 * 86400 else HOUR
+
+def rollup_rows(key, closed):
+    """Closed buckets of series `key` as dicts ready for persistence."""
+    return [{"resolution": resolution, "scope": key[0], "scope_id": key[1], "timestamp": start,
+             **dict(zip(COLUMNS, map(float, row))), "samples": int(row[-1])}
+            for resolution, start, row in closed]
+
+class UtilizationStore:
+    """All utilization series, keyed by (scope, id)."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.series = {}
+
+    def record(self, ts, samples):
+        """Add one sample per series. Returns closed rollups as dicts ready for persistence.
+
+        Series without a sample this time still have their finished buckets closed.
+        """
+        rows = []
+        with self.lock:
+            for key, series in self.series.items():
+                if key not in samples:
+                    rows += rollup_rows(key, series.close_buckets(ts))
+            for key, (cpu, memory) in samples.items():
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = Series(key[0])
+                rows += rollup_rows(key, series.add(ts, cpu, memory))
+            # Forget nodes that have been gone for over an hour
+            stale = [k for k, s in self.series.items()
+                     if k[0] == "node" and k not in samples and s.last < ts - RESOLUTION_SECONDS[HOUR]]
+            for key in stale:
+                del self.series[key]
+        return rows
+
+    def query(self, scope, scope_id, resolution, start, end):
+        """(points, oldest in-memory timestamp) for a series; the timestamp is None if unknown."""
+        with self.lock:
+            series = self.series.get((scope, scope_id))
+            if series is None:
+                return [], None
+            return series.points(resolution, start, end), series.oldest(resolution)